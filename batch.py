@@ -0,0 +1,76 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+
+import argparse
+import logging
+import os
+import sys
+
+from dwca import TableParameters, DEFAULT_COMPRESSION_LEVEL, PLACEMENT_STRATEGIES
+from dwca.batch import read_manifest, build_all, summary
+from dwca.checksum import SHA256, MD5
+
+logger = logging.getLogger("dwca")
+logger.setLevel(logging.WARNING)
+console = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(process)d - %(levelname)s - %(message)s')
+console.setFormatter(formatter)
+logger.addHandler(console)
+
+parser = argparse.ArgumentParser(description='Build a Darwin Core Archive for each dataset listed in a CSV or JSON manifest')
+parser.add_argument('manifest', type=str, help='The manifest, with output, files, title and creator for each dataset')
+parser.add_argument('-j', '--jobs', type=int, help='The number of datasets built at once', default=os.cpu_count() or 1)
+parser.add_argument('--encoding', type=str, help='The default file encoding', default='UTF-8')
+parser.add_argument('-t', '--tabs', help='Expect tab separation by default', action='store_true')
+parser.add_argument('-z', '--zip', help='Write each DwCA as a zip file, rather than a directory', action='store_true')
+parser.add_argument('--compression-level', type=int, help='The zip compression level (0-9)', default=DEFAULT_COMPRESSION_LEVEL)
+parser.add_argument('-p', '--placement', type=str, choices=PLACEMENT_STRATEGIES, help='How tables are placed in the output directories', default='copy')
+parser.add_argument('-f', '--force', help='Ignore the build manifests and rebuild everything', action='store_true')
+parser.add_argument('-s', '--stats', help='Profile the tables, adding coverage to the metadata and writing a statistics file', action='store_true')
+parser.add_argument('-r', '--rewrite', help='Rewrite the tables as trimmed UTF-8 CSV with short term names in the header and without empty columns', action='store_true')
+parser.add_argument('-c', '--checksums', help='Compute SHA-256 checksums of the files as they are written and write a checksums.sha256 manifest', action='store_true')
+parser.add_argument('--md5', help='Also compute MD5 checksums and write a checksums.md5 manifest', action='store_true')
+parser.add_argument('--sniff', help='Detect the encoding and dialect of each file from a sample at the start of the file', action='store_true')
+parser.add_argument('--validate', help='Check the links between the core and extensions, skipping datasets with problems', action='store_true')
+parser.add_argument('-v', '--verbose', help='Verbose information', action='store_true')
+args = parser.parse_args()
+
+if args.verbose:
+    logger.setLevel(logging.INFO)
+
+defaultParameters = TableParameters(
+    encoding=args.encoding,
+    fieldsTerminatedBy='\t' if args.tabs else ',',
+    linesTerminatedBy=os.linesep,
+    fieldsEnclosedBy='"',
+    ignoreHeaderLines=1
+)
+
+datasets = read_manifest(args.manifest)
+results = build_all(
+    datasets,
+    defaultParameters,
+    args.jobs,
+    zip=args.zip,
+    compresslevel=args.compression_level,
+    placement=args.placement,
+    force=args.force,
+    profile=args.stats,
+    rewrite=args.rewrite,
+    sniff=args.sniff,
+    validate=args.validate,
+    checksums=[SHA256] + ([MD5] if args.md5 else []) if args.checksums or args.md5 else None
+)
+print(summary(results))
+sys.exit(0 if all(result.ok for result in results) else 1)
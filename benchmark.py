@@ -0,0 +1,154 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from dwca import TableParameters, Table, DwCA, PLACEMENT_STRATEGIES
+from dwca.synthetic import TABLE_COLUMNS, TABLE_RATIOS, generate_archive
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger("dwca")
+logger.setLevel(logging.WARNING)
+console = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console.setFormatter(formatter)
+logger.addHandler(console)
+
+def peak_rss():
+    """The peak resident set size of this process and its children, in bytes"""
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale
+
+def timed(stages, name, action, size=None, rows=None):
+    """Time a stage, with its throughput if it streams the tables, whose total size and rows are given"""
+    start = time.perf_counter()
+    action()
+    seconds = time.perf_counter() - start
+    stages[name] = {
+        'seconds': seconds,
+        'bytesPerSecond': size / seconds if size is not None and seconds > 0 else None,
+        'rowsPerSecond': rows / seconds if rows is not None and seconds > 0 else None
+    }
+
+def run(sources, output, args):
+    params = TableParameters(encoding=args.encoding, fieldsTerminatedBy=args.delimiter, linesTerminatedBy='\n', fieldsEnclosedBy='"', ignoreHeaderLines=1)
+    sniff = args.delimiter not in (',', '\t')
+    tables = [Table(path, params, sniff) for path in sources]
+    dwca = DwCA(*tables, workers=args.jobs)
+    size = sum(os.path.getsize(path) for path in sources)
+    rows = sum(args.row_counts.values())
+    stages = dict()
+    # Field mapping and index detection only read the header and a sample of rows, so they have no throughput
+    timed(stages, 'field mapping', lambda: dwca.map_tables())
+    timed(stages, 'index detection', lambda: setattr(dwca, 'index', dwca.find_index_field()))
+    timed(stages, 'table placement', lambda: [dwca.write_table(table, output, args.placement) for table in dwca.tables], size, rows)
+    timed(stages, 'meta generation', lambda: dwca.write_meta(output))
+    timed(stages, 'eml generation', lambda: dwca.write_eml(output))
+    return stages
+
+def compare(results, baseline, tolerance):
+    """Report stages that are slower than the baseline by more than the tolerance"""
+    regressions = []
+    for name, stage in results['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if previous is None or previous['seconds'] <= 0:
+            continue
+        ratio = stage['seconds'] / previous['seconds']
+        status = 'REGRESSION' if ratio > 1.0 + tolerance else 'ok'
+        print(f"{name:20s} {previous['seconds']:10.3f}s {stage['seconds']:10.3f}s {ratio:6.2f}x {status}")
+        if status != 'ok':
+            regressions.append(name)
+    return regressions
+
+parser = argparse.ArgumentParser(description='Benchmark building a Darwin Core Archive from synthetic data')
+parser.add_argument('-r', '--rows', type=int, help='The number of occurrence rows; other tables are scaled from this', default=100000)
+parser.add_argument('-c', '--columns', type=int, help='The number of columns in each table', default=0)
+parser.add_argument('-d', '--delimiter', type=str, help='The field delimiter', default=',')
+parser.add_argument('-q', '--quoting', type=float, help='The fraction of free-text values that need quoting', default=0.05)
+parser.add_argument('--encoding', type=str, help='The file encoding', default='UTF-8')
+parser.add_argument('-k', '--kinds', type=str, help='The tables to generate, core first', default=','.join(TABLE_COLUMNS.keys()))
+parser.add_argument('-p', '--placement', type=str, choices=PLACEMENT_STRATEGIES, help='How tables are placed in the output directory', default='copy')
+parser.add_argument('-j', '--jobs', type=int, help='The number of worker processes for per-table work', default=1)
+parser.add_argument('--seed', type=int, help='The random seed', default=0)
+parser.add_argument('--keep', type=str, help='Generate into this directory and keep the data')
+parser.add_argument('-o', '--output', type=str, help='Write the results to this JSON file')
+parser.add_argument('--compare', type=str, help='Compare the results with a previous JSON results file')
+parser.add_argument('--tolerance', type=float, help='The fractional slowdown allowed before a stage counts as a regression', default=0.2)
+args = parser.parse_args()
+args.delimiter = args.delimiter.replace('\\t', '\t')
+
+workdir = args.keep if args.keep is not None else tempfile.mkdtemp()
+sourcedir = os.path.join(workdir, 'source')
+outputdir = os.path.join(workdir, 'dwca')
+os.makedirs(sourcedir, exist_ok=True)
+os.makedirs(outputdir, exist_ok=True)
+try:
+    kinds = args.kinds.split(',')
+    start = time.perf_counter()
+    sources = generate_archive(sourcedir, args.rows, kinds, args.columns, args.delimiter, args.quoting, args.encoding, args.seed)
+    generation = time.perf_counter() - start
+    args.row_counts = {kind: max(1, int(args.rows * TABLE_RATIOS[kind])) for kind in kinds}
+    stages = run(sources, outputdir, args)
+    results = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'rows': args.rows,
+            'columns': args.columns,
+            'delimiter': args.delimiter,
+            'quoting': args.quoting,
+            'encoding': args.encoding,
+            'kinds': kinds,
+            'placement': args.placement,
+            'jobs': args.jobs
+        },
+        'tables': {os.path.basename(path): {'bytes': os.path.getsize(path), 'rows': args.row_counts[kind]} for kind, path in zip(kinds, sources)},
+        'generationSeconds': generation,
+        'stages': stages,
+        'peakRSS': peak_rss()
+    }
+finally:
+    if args.keep is None:
+        shutil.rmtree(workdir)
+
+for name, stage in results['stages'].items():
+    throughput = f"{stage['bytesPerSecond'] / 1e6:10.1f} MB/s" if stage['bytesPerSecond'] is not None else ''
+    print(f"{name:20s} {stage['seconds']:10.3f}s {throughput}".rstrip())
+if results['peakRSS'] is not None:
+    print(f"{'peak RSS':20s} {results['peakRSS'] / 1e6:10.1f} MB")
+if args.output is not None:
+    with open(args.output, 'w') as dest:
+        json.dump(results, dest, indent=2)
+if args.compare is not None:
+    with open(args.compare) as src:
+        baseline = json.load(src)
+    if compare(results, baseline, args.tolerance):
+        sys.exit(1)
@@ -12,10 +12,19 @@
 #  rights and limitations under the License.
 
 import argparse
+import cProfile
+import json
 import logging
 import os
+import pstats
+import shutil
+import sys
+import tempfile
 
-from dwca import TableParameters, Table, DwCA
+from dwca import TableParameters, Table, DwCA, DEFAULT_COMPRESSION_LEVEL, PLACEMENT_STRATEGIES, Sharding
+from dwca.checksum import SHA256, MD5, verify_checksums
+from dwca.instrument import log_hook
+from dwca.split import split
 
 CSV_PARAMS = TableParameters(fieldsTerminatedBy=',', linesTerminatedBy=os.linesep, fieldsEnclosedBy='"', ignoreHeaderLines=1)
 TSV_PARAMS = TableParameters(fieldsTerminatedBy='\t', linesTerminatedBy=os.linesep, fieldsEnclosedBy='"', ignoreHeaderLines=1)
@@ -29,12 +38,33 @@ console.setFormatter(formatter)
 logger.addHandler(console)
 
 parser = argparse.ArgumentParser(description='Convert a collection of CSV/TSV files into a Darwin Core Archive')
-parser.add_argument('-o', '--output', type=str, help='Directory that contains the resulting DwCA', default='./dwca')
+parser.add_argument('-o', '--output', type=str, help='Directory that contains the resulting DwCA (or the zip file with --zip)', default='./dwca')
 parser.add_argument('--encoding', type=str, help='The default file encoding', default='UTF-8')
 parser.add_argument('--title', type=str, help='The metadata title')
 parser.add_argument('--creator', type=str, help='The metadata creator')
+parser.add_argument('-z', '--zip', help='Write the DwCA as a zip file, rather than a directory', action='store_true')
+parser.add_argument('--compression-level', type=int, help='The zip compression level (0-9)', default=DEFAULT_COMPRESSION_LEVEL)
+parser.add_argument('-p', '--placement', type=str, choices=PLACEMENT_STRATEGIES, help='How tables are placed in the output directory', default='copy')
+parser.add_argument('--validate', help='Check the links between the core and extensions before writing', action='store_true')
+parser.add_argument('--hierarchy', help='Check the parentEventID hierarchy of the core for missing parents, cycles and multiple roots before writing', action='store_true')
+parser.add_argument('--check-duplicates', type=str, metavar='COLUMN', action='append', help='Check the tables with this column for duplicate values before writing; may be repeated')
+parser.add_argument('--check-duplicate-rows', help='Check the tables for duplicated rows before writing', action='store_true')
+parser.add_argument('-j', '--jobs', type=int, help='The number of worker processes for per-table work', default=1)
+parser.add_argument('-f', '--force', help='Ignore the build manifest and rebuild everything', action='store_true')
+parser.add_argument('-s', '--stats', help='Profile the tables, adding coverage to the metadata and writing a statistics file', action='store_true')
+parser.add_argument('-r', '--rewrite', help='Rewrite the tables as trimmed UTF-8 CSV with short term names in the header and without empty columns', action='store_true')
+parser.add_argument('--shard-rows', type=int, metavar='ROWS', help='Split each table into files of at most this many rows')
+parser.add_argument('--shard-size', type=int, metavar='BYTES', help='Split each table into files of at most this many bytes')
+parser.add_argument('--shard-keys', type=int, metavar='SHARDS', help='Split each table into this many files by the hash of the id or coreid')
+parser.add_argument('-c', '--checksums', help='Compute SHA-256 checksums of the files as they are written and write a checksums.sha256 manifest', action='store_true')
+parser.add_argument('--md5', help='Also compute MD5 checksums and write a checksums.md5 manifest', action='store_true')
+parser.add_argument('--verify', type=str, metavar='DIR', help='Check the files in an existing archive directory against its checksum manifests, rather than building an archive')
+parser.add_argument('--sniff', help='Detect the encoding and dialect of each file from a sample at the start of the file', action='store_true')
+parser.add_argument('--report', type=str, metavar='REPORT', help='Write the time, bytes and rows used by each stage and table to a JSON file')
+parser.add_argument('--profile', help='Run under cProfile and print the profile statistics', action='store_true')
+parser.add_argument('--split', help='Split a single flat file into an event core with occurrence and measurement extensions', action='store_true')
 parser.add_argument('-t', '--tabs', help='Expect tab separation by default', action='store_true')
-parser.add_argument('files', type=str, metavar='FILE', nargs='+', help='The list of source files (core file first)')
+parser.add_argument('files', type=str, metavar='FILE', nargs='*', help='The list of source files (core file first)')
 parser.add_argument('-v', '--verbose', help='Verbose information', action='store_true')
 args = parser.parse_args()
 
@@ -49,14 +79,102 @@ defaultParameters = TableParameters(
 if args.verbose:
     logger.setLevel(logging.DEBUG)
 
+if args.verify is not None:
+    try:
+        report = verify_checksums(args.verify, args.jobs)
+    except ValueError as err:
+        logger.error(str(err))
+        sys.exit(1)
+    for problem in report.problems:
+        logger.error(str(problem))
+    if report.valid:
+        logger.info("All checksums match")
+    sys.exit(0 if report.valid else 1)
+if len(args.files) == 0:
+    parser.error('the following arguments are required: FILE')
+
+sharding = None
+if args.shard_rows is not None or args.shard_size is not None or args.shard_keys is not None:
+    try:
+        sharding = Sharding(args.shard_rows, args.shard_size, args.shard_keys)
+    except ValueError as err:
+        parser.error(str(err))
+
+checksums = None
+if args.checksums or args.md5:
+    checksums = [SHA256] + ([MD5] if args.md5 else [])
+
 logger.debug(f"Default parameters {defaultParameters}")
-tables = [Table(f, defaultParameters) for f in args.files]
-dwca = DwCA(*tables)
-if args.title is not None:
-    dwca.metadata['title'] = args.title
-if args.creator is not None:
-    dwca.metadata['creator'] = args.creator
-logger.debug(f"Writing to {output_dir}")
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir, exist_ok=True)
-dwca.write(output_dir)
+
+def write(dwca: DwCA):
+    if args.verbose:
+        dwca.instrumentation.add_hook(log_hook)
+    if args.title is not None:
+        dwca.metadata['title'] = args.title
+    if args.creator is not None:
+        dwca.metadata['creator'] = args.creator
+    if args.validate:
+        report = dwca.validate(hierarchy=args.hierarchy)
+        for problem in report.problems:
+            logger.error(str(problem))
+        if not report.valid:
+            return dwca, 1
+        logger.info("Validation found no problems")
+    checks = list(args.check_duplicates or []) + ([None] if args.check_duplicate_rows else [])
+    duplicated = False
+    for column in checks:
+        report = dwca.check_duplicates(column)
+        for problem in report.problems:
+            logger.error(str(problem))
+        duplicated = duplicated or not report.valid
+    if duplicated:
+        return dwca, 1
+    if args.hierarchy and not args.validate:
+        hierarchy = dwca.analyse_hierarchy()
+        if hierarchy is not None:
+            for problem in hierarchy.report.problems:
+                logger.error(str(problem))
+            if not hierarchy.valid:
+                return dwca, 1
+    if args.zip:
+        output_zip = output_dir if output_dir.endswith('.zip') else output_dir.rstrip('/' + os.sep) + '.zip'
+        logger.debug(f"Writing to {output_zip}")
+        output_parent = os.path.dirname(output_zip)
+        if output_parent and not os.path.exists(output_parent):
+            os.makedirs(output_parent, exist_ok=True)
+        dwca.write_zip(output_zip, args.compression_level, args.stats, args.rewrite, sharding, checksums)
+    else:
+        logger.debug(f"Writing to {output_dir}")
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+        dwca.write(output_dir, args.placement, args.force, args.stats, args.rewrite, sharding, checksums)
+    return dwca, 0
+
+def build():
+    if args.split:
+        if len(args.files) != 1:
+            parser.error('--split needs exactly one flat file')
+        flat = Table(args.files[0], defaultParameters, args.sniff)
+        split_dir = tempfile.mkdtemp() if args.zip else output_dir
+        os.makedirs(split_dir, exist_ok=True)
+        try:
+            dwca = split(flat, split_dir, defaultParameters, workers=args.jobs)
+            return write(dwca)
+        finally:
+            if args.zip:
+                shutil.rmtree(split_dir)
+    tables = [Table(f, defaultParameters, args.sniff) for f in args.files]
+    return write(DwCA(*tables, workers=args.jobs))
+
+if args.profile:
+    profiler = cProfile.Profile()
+    try:
+        dwca, status = profiler.runcall(build)
+    finally:
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(30)
+else:
+    dwca, status = build()
+if args.report is not None:
+    with open(args.report, 'w') as report_file:
+        json.dump(dwca.instrumentation.report(), report_file, indent=2)
+sys.exit(status)
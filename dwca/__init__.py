@@ -11,25 +11,55 @@
 #  implied. See the License for the specific language governing
 #  rights and limitations under the License.
 
+import codecs
 import csv
 import datetime
 import importlib.resources
+import io
+import json
 import os
 import re
 import shutil
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple, Dict
 import logging
 
+from .instrument import Instrumentation, Measurement, count, measuring, roll_up
+from .placement import COPY_BUFFER_SIZE, PLACEMENT_STRATEGIES, COPY, HARDLINK, SYMLINK, REFLINK, place_file
+from .sniff import DEFAULT_SAMPLE_SIZE, sniff as sniff_table
+from .compression import detect_compression, inner_filename, open_input
+from .keys import DEFAULT_KEY_SAMPLE, score_fields
+from .profile import TableProfile, STATS_NAME, profile_table, coverage
+from .manifest import BuildManifest, content_key, source_state, source_digest
+from .validate import ValidationReport, DEFAULT_INDEX_LIMIT, index_core, check_extension
+from .reader import DEFAULT_JOIN_LIMIT, TableDescription, parse_meta, star_join
+from .rewrite import rewrite_table
+from .shard import Sharding, shard_table, sharded_name
+from .duplicates import find_duplicates
+from .checksum import CHECKSUM_ALGORITHMS, SHA256, checksum_name, format_checksums, hash_bytes, hash_file, hashing, hashing_copy, hashing_opener, write_checksums
+from .hierarchy import EventHierarchy, EVENT_ID, PARENT_EVENT_ID, analyse_hierarchy
+
 logger = logging.getLogger("dwca")
 
+"""The default zip compression level"""
+DEFAULT_COMPRESSION_LEVEL = 6
+
 """Lookup table mapping a column header onto a term. Loaded from terms.csv"""
 _TERMS: Dict[str, str] = dict()
 
+"""Lookup table mapping a term onto the row type of the class it belongs to, where it has one. Loaded from terms.csv"""
+_ROW_TYPES: Dict[str, str] = dict()
+
 with importlib.resources.open_text(__package__, 'terms.csv') as csvfile:
     reader = csv.reader(csvfile)
     next(reader)
     for row in reader:
         _TERMS[row[0]] = row[1]
+        if len(row) > 2 and row[2]:
+            _ROW_TYPES[row[1]] = row[2]
 
 def _normalise_csv(value: str) -> str:
     if value is None:
@@ -83,9 +113,18 @@ class TableParameters:
             self.ignoreHeaderLines if self.ignoreHeaderLines is not None else other.ignoreHeaderLines
         )
 
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
     def csv_reader(self, file):
+        if self.fieldsEnclosedBy == '':
+            # An explicitly empty enclosure, as read from meta.xml, means that fields are not quoted
+            return csv.reader(file, delimiter=self.fieldsTerminatedBy, lineterminator=self.linesTerminatedBy, quoting=csv.QUOTE_NONE)
         return csv.reader(file, delimiter=self.fieldsTerminatedBy, lineterminator=self.linesTerminatedBy, quotechar=self.fieldsEnclosedBy, doublequote=True)
 
+    def csv_writer(self, file):
+        return csv.writer(file, delimiter=self.fieldsTerminatedBy, lineterminator=self.linesTerminatedBy, quotechar=self.fieldsEnclosedBy, doublequote=True, quoting=csv.QUOTE_MINIMAL)
+
     def __str__(self):
         return f"TableParameters(rowType={self.rowType}, encoding={self.encoding}, fieldsTerminatedBy={_attr_translate(self.fieldsTerminatedBy)}, linesTerminatedBy={_attr_translate(self.linesTerminatedBy)}, fieldsEnclosedBy={_attr_translate(self.fieldsEnclosedBy)}, ignoreHeaderLines={self.ignoreHeaderLines})"
 
@@ -98,6 +137,9 @@ class TableParameters:
         logger.debug(f"Parameters for {filename} are {parameters}")
         return parameters
 
+"""The dialect that tables are rewritten into, apart from the row type"""
+REWRITE_PARAMS = TableParameters(encoding='UTF-8', fieldsTerminatedBy=',', linesTerminatedBy='\n', fieldsEnclosedBy='"', ignoreHeaderLines=1)
+
 with importlib.resources.open_text(__package__, 'files.csv') as csvfile:
     reader = csv.reader(csvfile)
     next(reader)
@@ -115,100 +157,987 @@ with importlib.resources.open_text(__package__, 'files.csv') as csvfile:
         ))
 
 class Table:
-    def __init__(self, path: str, defaultParams: TableParameters):
+    def __init__(self, path: str, defaultParams: TableParameters, sniff: bool = False, sample_size: int = DEFAULT_SAMPLE_SIZE, archive = None):
+        """
+        Create a table.
+
+        :param path: The path to the table file, which may be compressed with gzip, bzip2 or xz, or the name of an entry in a zip archive
+        :param defaultParams: The default table parameters, overridden by any rules in files.csv
+        :param sniff: Detect the encoding and dialect from a sample at the start of the file; detected values override the file name rules
+        :param sample_size: The number of bytes sampled when sniffing
+        :param archive: The zip file (a path or a seekable binary file object) holding the table, if any
+        """
         self.path = path;
-        self.filename = os.path.basename(path)
+        # A zip entry is not a file that can be checked for compression
+        self.compression = detect_compression(path) if archive is None else None
+        # The table is named after the file inside any compression, for the file name rules and the output
+        self.filename = inner_filename(os.path.basename(path), self.compression)
         self.params = TableParameters.from_filename(self.filename, defaultParams)
+        if sniff:
+            self.params = TableParameters(**sniff_table(path, sample_size, self.compression)).merge(self.params)
+            logger.debug(f"Parameters for {self.filename} after sniffing are {self.params}")
+        self.fields = None
+        self.archive = archive
+        self.key = None
+        self.columns = None
+        self.locations = None
+        self.checksums = None
+        self.parts = None
+
+    @classmethod
+    def from_description(cls, description: TableDescription, locations: List[str], archive = None):
+        """
+        Create a table from its description in the meta.xml of an existing archive.
+        The parameters given in meta.xml take precedence over any rules in files.csv.
+        A table in several files, such as the shards written by sharding, is read as one table, named after the shards.
+
+        :param description: The table description
+        :param locations: The paths to the table files, or the names of the entries in a zip archive
+        :param archive: The zip file (a path or a seekable binary file object) holding the table, if any
+        :return: The table
+        """
+        params = TableParameters(**description.params)
+        table = cls(locations[0], params, archive=archive)
+        if len(locations) > 1:
+            table.parts = locations
+            table.filename = sharded_name([os.path.basename(location) for location in locations])
+        table.params = params.merge(table.params)
+        table.fields = description.fields
+        table.key = description.key
+        return table
+
+    @property
+    def text_encoding(self) -> str:
+        """
+        The encoding used to decode the table, with UTF-8 decoded so that any byte order mark is skipped.
+        """
+        encoding = self.params.encoding
+        if encoding is not None and codecs.lookup(encoding).name == 'utf-8':
+            encoding = 'utf-8-sig'
+        return encoding
+
+    @property
+    def output_params(self) -> TableParameters:
+        """
+        The parameters of the table as written, which differ from the source if the table has been rewritten.
+        """
+        if self.columns is None:
+            return self.params
+        return TableParameters(rowType=self.params.rowType).merge(REWRITE_PARAMS)
+
+    @property
+    def output_locations(self) -> List[str]:
+        """
+        The names of the files the table is written to, which are shards of the table if it has been sharded.
+        """
+        return self.locations if self.locations is not None else [self.filename]
+
+    @property
+    def output_fields(self) -> List[str]:
+        """
+        The fields of the table as written, without any columns dropped by rewriting.
+        """
+        if self.columns is None:
+            return self.fields
+        return [self.fields[column] for column in self.columns]
+
+    @property
+    def sources(self) -> List[str]:
+        """
+        The files, or zip entries, the table is read from: more than one for a table in several parts, each with its own header lines.
+        """
+        return self.parts if self.parts is not None else [self.path]
+
+    @property
+    def placeable(self) -> bool:
+        """
+        Is the table a single uncompressed file, which can be placed in an output directory as it is?
+        Other tables, in a zip archive, compressed or in several parts, are streamed from open_binary.
+        """
+        return self.archive is None and self.compression is None and self.parts is None
+
+    @property
+    def source(self) -> str:
+        """
+        Where the table is read from: the absolute path of the file, or of the first of its parts,
+        or the zip entry after the archive it is in.
+        """
+        if self.archive is None:
+            return os.path.abspath(self.path)
+        archive = os.path.abspath(self.archive) if isinstance(self.archive, (str, os.PathLike)) else '<stream>'
+        return f"{archive}!{self.path}"
+
+    def source_stat(self) -> Tuple[int, int]:
+        """
+        The total size of the sources of the table and the latest time any of them was modified, in nanoseconds.
+        The sources of a table in a zip archive have the uncompressed sizes of the entries and the modification time of the archive,
+        or None if the archive is not a file.
+        """
+        if self.archive is None:
+            stats = [os.stat(source) for source in self.sources]
+            return sum(stat.st_size for stat in stats), max(stat.st_mtime_ns for stat in stats)
+        with zipfile.ZipFile(self.archive) as archive:
+            size = sum(archive.getinfo(source).file_size for source in self.sources)
+        return size, os.stat(self.archive).st_mtime_ns if isinstance(self.archive, (str, os.PathLike)) else None
+
+    def output_name(self, source: str) -> str:
+        """
+        The name of the file a source of the table is streamed to, without any compression.
+
+        :param source: One of sources
+        """
+        if self.parts is None:
+            return self.filename
+        return inner_filename(os.path.basename(source), self._compression(source))
+
+    def _compression(self, source: str) -> str:
+        if self.archive is not None:
+            return None
+        return self.compression if source == self.path else detect_compression(source)
+
+    def open_binary(self, source: str = None):
+        """
+        Open the table as bytes, either from a file, decompressing it if necessary, or from an entry in a zip archive.
+
+        :param source: The part of the table to open, one of sources; by default the first
+        """
+        source = self.path if source is None else source
+        if self.archive is None:
+            return open_input(source, self._compression(source))
+        with zipfile.ZipFile(self.archive) as archive:
+            # The entry keeps the underlying file open after the archive is closed
+            return archive.open(source)
+
+    def open(self, source: str = None):
+        """
+        Open the table as text in its encoding.
+        Any UTF-8 byte order mark is skipped.
+
+        :param source: The part of the table to open, one of sources; by default the first
+        """
+        source = self.path if source is None else source
+        if self.archive is None and self._compression(source) is None:
+            return open(source, encoding=self.text_encoding, newline='')
+        return io.TextIOWrapper(self.open_binary(source), encoding=self.text_encoding, newline='')
+
+    def records(self):
+        """
+        Iterate through the data rows of the table, skipping any header lines.
+        The rows of a table in several parts are read in order, with the line numbers counted on from one part to the next.
+
+        :return: An iterator of (line number, row) pairs
+        """
+        lines = 0
+        for source in self.sources:
+            rows = 0
+            with self.open(source) as csvfile:
+                reader = self.params.csv_reader(csvfile)
+                try:
+                    for i in range(self.params.ignoreHeaderLines or 0):
+                        next(reader, None)
+                    for row in reader:
+                        rows += 1
+                        yield lines + reader.line_num, row
+                finally:
+                    count(bytes_read=csvfile.buffer.tell(), rows=rows)
+                lines += reader.line_num
 
     def map_fields(self, core: bool):
-        with open(self.path) as csvfile:
+        with self.open() as csvfile:
             reader = self.params.csv_reader(csvfile)
             row = next(reader)
             self.fields = [_TERMS.get(f, f) for f in row]
+            count(bytes_read=csvfile.buffer.tell())
         logger.debug(f"Mapped fields for {self.filename} to {self.fields}")
 
+    def profile(self) -> TableProfile:
+        """
+        Collect statistics about the columns of the table in a single pass:
+        value and empty counts, approximate distinct counts, the event date range and the coordinate bounding box.
+
+        :return: The table profile
+        """
+        if self.fields is None:
+            self.map_fields(False)
+        return profile_table(self)
+
+
+class DwCAError(Exception):
+    """
+    An error raised while processing one of the tables in an archive.
+    """
+    def __init__(self, table: str, cause: BaseException):
+        super().__init__(f"{table}: {cause}")
+        self.table = table
+        self.cause = cause
+
+def _map_fields(table: Table, core: bool):
+    table.map_fields(core)
+    return table.fields
+
+def _shard(table: Table, open_shard, keep: set, sharding: Sharding, key_column: int, tempdir: str = None):
+    """
+    Shard a table, rewriting it to a temporary file first if it is to be rewritten.
+
+    :return: The columns kept by rewriting, or None, and the shard names
+    """
+    if keep is None:
+        return None, shard_table(table, open_shard, sharding, key_column)
+    fd, temp = tempfile.mkstemp(suffix='.csv', dir=tempdir)
+    try:
+        with os.fdopen(fd, 'wb', buffering=COPY_BUFFER_SIZE) as dest:
+            columns = rewrite_table(table, dest, REWRITE_PARAMS, keep)
+        rewritten = Table(temp, REWRITE_PARAMS)
+        rewritten.filename = table.filename
+        rewritten.params = TableParameters(rowType=table.params.rowType).merge(REWRITE_PARAMS)
+        key_column = columns.index(key_column) if key_column is not None else None
+        return columns, shard_table(rewritten, open_shard, sharding, key_column)
+    finally:
+        os.remove(temp)
+
+def _write_table(table: Table, destpath: str, placement: str, keep: set = None, sharding: Sharding = None, key_column: int = None,
+                 algorithms: List[str] = None, known: dict = None):
+    """
+    Write a table into an output directory, computing any checksums of the output as it is written.
+    When the SHA-256 of the source is wanted for the build manifest and is not already known, a source that is copied is hashed as it is copied
+    and one that is rewritten, sharded or streamed is hashed once it has been read; a linked source is not read at all.
+    Otherwise copies are made by the kernel unless there are checksums to compute.
+
+    :param known: Digests of the source that are already known, which are used when the table is linked rather than copied,
+        or None if the SHA-256 of the source is not wanted
+    :return: The columns kept by rewriting, or None, the shard names, or None, the digests of each output file, or None,
+        and the SHA-256 of the source, or None if it was not wanted or was linked without being hashed
+    """
+    wanted = known is not None
+    known = known or dict()
+
+    def source_sha256():
+        return known.get(SHA256) or (source_digest(table) if wanted else None)
+
+    if sharding is not None:
+        writers = dict()
+        open_shard = hashing_opener(lambda name: open(os.path.join(destpath, name), 'wb', buffering=COPY_BUFFER_SIZE), algorithms, writers)
+        columns, locations = _shard(table, open_shard, keep, sharding, key_column, destpath)
+        logger.info(f"Split {table.filename} into {len(locations)} shards in {destpath}")
+        count(bytes_written=sum(os.path.getsize(os.path.join(destpath, location)) for location in locations))
+        return columns, locations, {name: writer.digests() for name, writer in writers.items()} if algorithms else None, source_sha256()
+    destpath = os.path.join(destpath, table.filename)
+    if keep is not None:
+        # The rewrite goes through a temporary file, so a source that is already in the output directory can be replaced
+        temp = destpath + '.tmp'
+        with hashing(open(temp, 'wb', buffering=COPY_BUFFER_SIZE), algorithms) as dest:
+            columns = rewrite_table(table, dest, REWRITE_PARAMS, keep)
+        os.replace(temp, destpath)
+        logger.info(f"Rewrote {table.filename} to {destpath}")
+        count(bytes_written=os.path.getsize(destpath))
+        return columns, None, {table.filename: dest.digests()} if algorithms else None, source_sha256()
+    if not table.placeable:
+        return _stream_table(table, os.path.dirname(destpath), algorithms) + (source_sha256(),)
+    if _is_source(table.path, destpath):
+        logger.debug(f"{table.filename} is already in place")
+        digests = _source_digests(table, algorithms, known) if algorithms else known
+        return None, None, {table.filename: digests} if algorithms else None, digests.get(SHA256)
+    digests = None
+    if placement == COPY and (algorithms or wanted and SHA256 not in known):
+        # Copy through user space rather than with the kernel, so the copy itself is hashed as it is made
+        source = hashing_copy(table.path, destpath, list(dict.fromkeys(([SHA256] if wanted else []) + (algorithms or []))))
+        known = dict(known, **source)
+        digests = {algorithm: source[algorithm] for algorithm in algorithms} if algorithms else None
+        method = 'hashing copy'
+    else:
+        method = place_file(table.path, destpath, placement)
+    logger.info(f"Placed {table.filename} at {destpath} using {method}")
+    if method not in (HARDLINK, SYMLINK, REFLINK):
+        size = os.path.getsize(table.path)
+        count(bytes_read=size, bytes_written=size)
+    if algorithms and digests is None:
+        digests = _source_digests(table, algorithms, known)
+        known = dict(known, **digests)
+    return None, None, {table.filename: digests} if algorithms else None, known.get(SHA256)
+
+def _is_source(source: str, output: str) -> bool:
+    """
+    Is an output file the source itself, rather than a link to it or a copy of it left by an earlier build?
+    The directory entries are compared, so a hardlink or symlink to the source is not the source.
+    """
+    return os.path.lexists(output) and os.path.basename(source) == os.path.basename(output) and \
+        os.path.samefile(os.path.dirname(os.path.abspath(source)), os.path.dirname(os.path.abspath(output)))
+
+def _stream_table(table: Table, destpath: str, algorithms: List[str] = None):
+    """
+    Write a table that cannot be placed as it is, because it is in a zip archive, compressed or in several parts,
+    by streaming each of its sources to a file of its own.
+
+    :return: None, the names of the files if there is more than one, and the digests of each file, or None
+    """
+    digests = dict()
+    for source in table.sources:
+        name = table.output_name(source)
+        output = os.path.join(destpath, name)
+        if table.archive is None and _is_source(source, output):
+            logger.debug(f"{name} is already in place")
+            digests[name] = hash_file(output, algorithms) if algorithms else None
+            continue
+        if os.path.lexists(output):
+            # Replace rather than write through a link left by an earlier build
+            os.remove(output)
+        with table.open_binary(source) as src, hashing(open(output, 'wb', buffering=COPY_BUFFER_SIZE), algorithms) as dest:
+            shutil.copyfileobj(src, dest, COPY_BUFFER_SIZE)
+        digests[name] = dest.digests() if algorithms else None
+        count(bytes_written=os.path.getsize(output))
+    logger.info(f"Streamed {table.filename} to {destpath}")
+    count(bytes_read=table.source_stat()[0])
+    return None, list(digests.keys()) if table.parts is not None else None, digests if algorithms else None
+
+def _source_digests(table: Table, algorithms: List[str], known: dict) -> dict:
+    """
+    The digests of a source table placed as it is, hashing the source only for algorithms whose digests are not already known.
+    """
+    missing = [algorithm for algorithm in algorithms if algorithm not in known]
+    digests = hash_file(table.path, missing) if missing else dict()
+    return {algorithm: known[algorithm] if algorithm in known else digests[algorithm] for algorithm in algorithms}
+
+def _source_state(table: Table, previous: dict):
+    return source_state(table, previous)
+
+def _profile_table(table: Table):
+    return table.profile().to_dict()
+
+def _measured(task, stage: str, table: Table, args: tuple):
+    with measuring(stage, table.filename) as measurement:
+        result = task(table, *args)
+    return result, measurement
+
+def _find_duplicates(table: Table, field: str, limit: int):
+    logger.debug(f"Checking {table.filename} for {'duplicate rows' if field is None else 'duplicate ' + field}")
+    return find_duplicates(table, field, limit)
+
+def _check_extension(table: Table, field: str, index, limit: int):
+    logger.debug(f"Checking {field} in {table.filename}")
+    return check_extension(table, field, index, limit)
 
 class DwCA:
-    def __init__(self, core: Table, *extensions):
+    def __init__(self, core: Table, *extensions, workers: int = 1):
+        """
+        Create an archive.
+
+        :param core: The core table
+        :param extensions: The extension tables
+        :param workers: The number of processes used for independent per-table work
+        """
         self.core = core
         self.extensions = extensions
         self.metadata = dict()
+        self.workers = workers
+        self.profiles = None
+        self.index = None
+        self.instrumentation = Instrumentation()
 
-    def write(self, destpath: str):
-        self.core.map_fields(True)
-        for ext in self.extensions:
-            ext.map_fields(False)
+    @classmethod
+    def open(cls, source, workers: int = 1):
+        """
+        Open an existing archive, either a directory or a zip file.
+        The tables are described by meta.xml and their rows are read lazily, straight from the zip entries
+        for a zip file.
+        The title and creator are read from the metadata file, if there is one.
+
+        :param source: The archive directory, the path of the zip file or a seekable binary file object
+        :param workers: The number of processes used for independent per-table work
+        :return: The archive
+        """
+        directory = isinstance(source, (str, os.PathLike)) and os.path.isdir(source)
+        if directory:
+            with open(os.path.join(source, "meta.xml"), "rb") as meta:
+                descriptions = parse_meta(meta.read())
+        else:
+            with zipfile.ZipFile(source) as archive:
+                descriptions = parse_meta(archive.read("meta.xml"))
+        tables = []
+        for description in descriptions:
+            if len(description.locations) == 0:
+                raise ValueError(f"meta.xml gives no location for a {description.params.get('rowType')} table")
+            locations = [os.path.join(source, location) if directory else location for location in description.locations]
+            tables.append(Table.from_description(description, locations, None if directory else source))
+        dwca = cls(*tables, workers=workers)
+        core = tables[0]
+        if core.key is not None and core.key < len(core.fields):
+            dwca.index = core.fields[core.key]
+        dwca.metadata = cls.read_metadata(source, directory)
+        logger.debug(f"Opened {source} with core {core.filename} and extensions {[ext.filename for ext in dwca.extensions]}")
+        return dwca
+
+    @staticmethod
+    def read_metadata(source, directory: bool) -> dict:
+        try:
+            if directory:
+                with open(os.path.join(source, "eml.xml"), "rb") as eml:
+                    data = eml.read()
+            else:
+                with zipfile.ZipFile(source) as archive:
+                    data = archive.read("eml.xml")
+            # eml.xml may be written with leading whitespace before the declaration
+            root = ElementTree.fromstring(data.strip())
+        except (OSError, KeyError, ElementTree.ParseError) as err:
+            logger.warning(f"Unable to read metadata from {source}: {err}")
+            return dict()
+        metadata = dict()
+        title = root.find('dataset/title')
+        if title is not None and title.text:
+            metadata['title'] = title.text.strip()
+        creator = root.find('dataset/creator/organizationName')
+        if creator is not None and creator.text:
+            metadata['creator'] = creator.text.strip()
+        return metadata
+
+    @property
+    def tables(self) -> List[Table]:
+        return [self.core] + list(self.extensions)
+
+    def run_tables(self, task, jobs: List[Tuple[Table, tuple]], stage: str) -> list:
+        """
+        Run a task for each table, using a process pool if there is more than one worker.
+        The results are returned in the same order as the jobs.
+        Each task is measured and recorded in the instrumentation under the stage name.
+
+        :param task: A module-level function called as task(table, *args)
+        :param jobs: A list of (table, args) pairs
+        :param stage: The stage name for the instrumentation
+        :return: The list of results
+        :raise DwCAError: if any task fails, naming the first table (in job order) that failed
+        """
+        if self.workers <= 1 or len(jobs) <= 1:
+            results = []
+            for table, args in jobs:
+                try:
+                    result, measurement = _measured(task, stage, table, args)
+                except Exception as err:
+                    raise DwCAError(table.filename, err) from err
+                self.instrumentation.record(measurement)
+                results.append(result)
+            return results
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+            futures = [executor.submit(_measured, task, stage, table, args) for table, args in jobs]
+            results = []
+            failure = None
+            for (table, args), future in zip(jobs, futures):
+                try:
+                    result, measurement = future.result()
+                    roll_up(measurement)
+                    self.instrumentation.record(measurement)
+                    results.append(result)
+                except Exception as err:
+                    logger.error(f"Error processing {table.filename}: {err}")
+                    if failure is None:
+                        failure = DwCAError(table.filename, err)
+                        failure.__cause__ = err
+            if failure is not None:
+                raise failure
+            return results
+
+    def map_tables(self, tables: List[Table] = None):
+        """
+        Map the fields of each table.
+
+        :param tables: The tables that need mapping, if not all of them
+        """
+        tables = self.tables if tables is None else tables
+        jobs = [(table, (table is self.core,)) for table in tables]
+        for table, fields in zip(tables, self.run_tables(_map_fields, jobs, 'map_fields')):
+            table.fields = fields
+
+    def prepare(self):
+        """
+        Map the fields of each table and work out the index field linking the core to the extensions.
+        """
+        self.map_tables()
         self.index = self.find_index_field()
         logger.debug(f"Index field is {self.index}")
-        self.write_table(self.core, destpath)
-        for ext in self.extensions:
-            self.write_table(ext, destpath)
-        self.write_meta(destpath)
-        self.write_eml(destpath)
 
-    def find_index_field(self):
+    def profile(self, tables: List[Table] = None) -> Dict[str, dict]:
+        """
+        Profile the tables in the archive.
+        The results are used to add coverage information to eml.xml and to write a statistics file.
+
+        :param tables: The tables to profile, if not all of them
+        :return: The table profiles, by table file name
+        """
+        tables = self.tables if tables is None else tables
+        profiles = self.run_tables(_profile_table, [(table, ()) for table in tables], 'profile')
+        if self.profiles is None:
+            self.profiles = dict()
+        for table, profile in zip(tables, profiles):
+            self.profiles[table.filename] = profile
+        return self.profiles
+
+    def write(self, destpath: str, placement: str = COPY, force: bool = False, profile: bool = False, rewrite: bool = False, sharding: Sharding = None,
+              checksums: List[str] = None):
+        """
+        Write the archive into a directory.
+
+        A build manifest is kept in the directory.
+        Tables that have not changed since the last build are skipped and
+        the metadata files are only regenerated when something they depend on has changed.
+
+        :param destpath: The output directory
+        :param placement: How tables are placed in the output directory, one of PLACEMENT_STRATEGIES
+        :param force: Ignore the build manifest and rebuild everything
+        :param profile: Profile the tables, adding coverage to eml.xml and writing a statistics file
+        :param rewrite: Rewrite the tables as trimmed UTF-8 CSV with short term names in the header and no empty columns, rather than placing them as they are
+        :param sharding: Split the tables into several files, rather than placing them as they are
+        :param checksums: The algorithms, from CHECKSUM_ALGORITHMS, used to compute checksums of the tables as they are written and to write checksum manifests
+        """
+        with self.instrumentation.measure('write'):
+            manifest = BuildManifest(destpath) if force else BuildManifest.load(destpath)
+            options = {'placement': placement, 'rewrite': rewrite, 'sharding': sharding.to_dict() if sharding is not None else None, 'checksums': checksums}
+            states = self.run_tables(_source_state, [(table, (manifest.tables.get(table.filename),)) for table in self.tables], 'source_state')
+            states = {table.filename: state for table, state in zip(self.tables, states)}
+            unchanged = []
+            for table in self.tables:
+                if manifest.unchanged(table, states[table.filename], options):
+                    table.fields = manifest.tables[table.filename]['fields']
+                    unchanged.append(table)
+            self.map_tables([table for table in self.tables if table not in unchanged])
+            if len(unchanged) == len(self.tables) and manifest.index is not None:
+                self.index = manifest.index['field']
+            else:
+                self.index = self.find_index_field()
+            logger.debug(f"Index field is {self.index}")
+            manifest.index = {'field': self.index}
+            layouts = [self.write_layout(table, rewrite, sharding) for table in self.tables]
+            changed = []
+            for table, layout in zip(self.tables, layouts):
+                if table in unchanged and manifest.tables[table.filename].get('layout') == layout:
+                    logger.info(f"{table.filename} is unchanged since the last build")
+                    table.columns = manifest.tables[table.filename].get('columns')
+                    table.locations = manifest.tables[table.filename].get('locations')
+                    table.checksums = manifest.tables[table.filename].get('checksums')
+                else:
+                    if table in unchanged:
+                        logger.info(f"{table.filename} is unchanged, but the index field it is written with has changed")
+                    changed.append(table)
+            known = {filename: {SHA256: state['sha256']} if 'sha256' in state else dict() for filename, state in states.items()}
+            jobs = [(table, self.write_table_args(table, destpath, placement, rewrite, sharding, checksums, known[table.filename])) for table in changed]
+            for table, (columns, locations, digests, source) in zip(changed, self.run_tables(_write_table, jobs, 'write_table')):
+                table.columns = columns
+                table.locations = locations
+                table.checksums = digests
+                if source is not None:
+                    # The source was hashed as it was copied
+                    states[table.filename]['sha256'] = source
+            if profile:
+                self.profiles = dict()
+                for table in self.tables:
+                    previous = manifest.tables.get(table.filename, dict()).get('profile')
+                    if table not in changed and previous is not None:
+                        self.profiles[table.filename] = previous
+                self.profile([table for table in self.tables if table.filename not in self.profiles])
+                self.profiles = {table.filename: self.profiles[table.filename] for table in self.tables}
+                self.write_stats(destpath)
+            for table, layout in zip(self.tables, layouts):
+                manifest.record(table, states[table.filename], self.profiles.get(table.filename) if self.profiles is not None else None, options, layout)
+            manifest.remove_stale(self.tables)
+            meta_key = content_key({
+                'tables': [[table.filename, table.output_params.to_dict(), table.output_fields, table.output_locations] for table in self.tables],
+                'index': self.index
+            })
+            if meta_key != manifest.meta or not os.path.exists(os.path.join(destpath, "meta.xml")):
+                self.write_meta(destpath)
+                manifest.meta = meta_key
+            eml_key = content_key({
+                'metadata': self.metadata,
+                'coverage': coverage(self.profiles) if self.profiles is not None else None
+            })
+            if eml_key != manifest.eml or not os.path.exists(os.path.join(destpath, "eml.xml")):
+                self.write_eml(destpath)
+                manifest.eml = eml_key
+            self.write_checksums(destpath, checksums, profile)
+            manifest.save()
+
+    def write_zip(self, target, compresslevel: int = DEFAULT_COMPRESSION_LEVEL, profile: bool = False, rewrite: bool = False, sharding: Sharding = None,
+                  checksums: List[str] = None):
+        """
+        Write the archive as a single zip file.
+        Each table is streamed into its zip entry and the metadata is generated in memory,
+        so nothing is staged on disk.
+
+        :param target: The path of the zip file or a writable binary file object
+        :param compresslevel: The deflate compression level, 0-9
+        :param profile: Profile the tables, adding coverage to eml.xml and writing a statistics file
+        :param rewrite: Rewrite the tables as trimmed UTF-8 CSV with short term names in the header and no empty columns
+        :param sharding: Split the tables into several zip entries
+        :param checksums: The algorithms, from CHECKSUM_ALGORITHMS, used to compute checksums of the entries as they are written and to add checksum manifests
+        """
+        with self.instrumentation.measure('write'):
+            self.prepare()
+            if profile:
+                self.profiles = None
+                self.profile()
+            logger.debug(f"Writing zip archive {target}")
+            with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as archive:
+                self.write_zip_table(self.core, archive, rewrite, sharding, checksums)
+                for ext in self.extensions:
+                    self.write_zip_table(ext, archive, rewrite, sharding, checksums)
+                metadata = dict()
+                with self.instrumentation.measure('write_meta'):
+                    meta = io.StringIO()
+                    self.generate_meta(meta)
+                    metadata["meta.xml"] = meta.getvalue().encode('utf-8')
+                    archive.writestr("meta.xml", metadata["meta.xml"])
+                    count(bytes_written=archive.getinfo("meta.xml").compress_size)
+                with self.instrumentation.measure('write_eml'):
+                    eml = io.StringIO()
+                    self.generate_eml(eml)
+                    metadata["eml.xml"] = eml.getvalue().encode('utf-8')
+                    archive.writestr("eml.xml", metadata["eml.xml"])
+                    count(bytes_written=archive.getinfo("eml.xml").compress_size)
+                if self.profiles is not None:
+                    stats = io.StringIO()
+                    self.generate_stats(stats)
+                    metadata[STATS_NAME] = stats.getvalue().encode('utf-8')
+                    archive.writestr(STATS_NAME, metadata[STATS_NAME])
+                if checksums:
+                    digests = self.table_checksums()
+                    for name, data in metadata.items():
+                        digests[name] = hash_bytes(data, checksums)
+                    for algorithm in checksums:
+                        archive.writestr(checksum_name(algorithm), format_checksums(digests, algorithm))
+
+    def key_column(self, table: Table) -> int:
+        """
+        Get the column of the id (for the core) or coreid (for an extension) in a table.
+
+        :param table: The table
+        :return: The column, or None if there is no index field
+        """
+        if table.key is not None:
+            return table.key
+        if self.index is None:
+            return None
+        return table.fields.index(self.index)
+
+    def star(self, merge: bool = None, limit: int = DEFAULT_JOIN_LIMIT, tempdir: str = None):
+        """
+        Iterate through the core records, each with the extension rows that refer to it.
+
+        Where the core and an extension are both sorted by id the extension is merge joined,
+        otherwise an on-disk index of extension record offsets is built, so memory use does not grow with the
+        size of the extension.
+
+        :param merge: True to assume the tables are sorted and merge join, False to always index; by default the tables are checked
+        :param limit: The maximum number of extension records indexed in memory before spilling to disk
+        :param tempdir: The directory for temporary index files
+        :return: An iterator of (core row, {extension file name: [extension rows]}) pairs
+        """
+        if self.core.fields is None:
+            self.prepare()
+        column = self.key_column(self.core)
+        if column is None:
+            raise ValueError("No index field linking the core to the extensions")
+        extensions = [(ext, self.key_column(ext)) for ext in self.extensions]
+        return star_join(self.core, column, extensions, merge, limit, tempdir)
+
+    def analyse_hierarchy(self) -> EventHierarchy:
+        """
+        Analyse the hierarchy of events in the core formed by parentEventID.
+        Finds parentEventIDs with no matching eventID, cycles of parents and multiple root events,
+        along with the number of events at each depth.
+
+        :return: The hierarchy, or None if the core does not have both eventID and parentEventID
+        """
+        if self.core.fields is None:
+            self.map_tables([self.core])
+        if EVENT_ID not in self.core.fields or PARENT_EVENT_ID not in self.core.fields:
+            logger.warning(f"{self.core.filename} has no event hierarchy to analyse")
+            return None
+        with self.instrumentation.measure('hierarchy', self.core.filename):
+            hierarchy = analyse_hierarchy(self.core)
+        logger.info(str(hierarchy))
+        return hierarchy
+
+    def validate(self, index_limit: int = DEFAULT_INDEX_LIMIT, hierarchy: bool = False) -> ValidationReport:
+        """
+        Check the links between the core and the extensions.
+        Reports empty or duplicate core ids and extension coreids that are empty or have no matching core id.
+
+        :param index_limit: The maximum number of core ids to hold in memory before using an on-disk index
+        :param hierarchy: Also check the event hierarchy of the core, see analyse_hierarchy
+        :return: A report of any problems found
+        """
+        self.prepare()
+        report = ValidationReport()
+        if hierarchy:
+            events = self.analyse_hierarchy()
+            if events is not None:
+                report.extend(events.report)
+        if self.index is None:
+            logger.warning("No index field, unable to validate links")
+            return report
+        logger.debug(f"Indexing {self.index} in {self.core.filename}")
+        with self.instrumentation.measure('validate', self.core.filename):
+            index = index_core(self.core, self.index, index_limit, report)
+        try:
+            jobs = [(ext, (self.index, index, index_limit)) for ext in self.extensions]
+            for result in self.run_tables(_check_extension, jobs, 'validate'):
+                report.extend(result)
+        finally:
+            index.close()
+        return report
+
+    def check_duplicates(self, field: str = None, limit: int = DEFAULT_INDEX_LIMIT) -> ValidationReport:
+        """
+        Check the tables for duplicate values of a field, or for duplicated rows.
+        A term that belongs to a class, such as occurrenceID, is only checked in the tables of that row type, or the core if there are none,
+        as other tables repeat it to link to their rows.
+
+        :param field: The column name or term to check, or None to check whole rows in every table
+        :param limit: The maximum number of values to sort in memory before using on-disk sorted runs
+        :return: A report of any duplicates found
+        """
+        if any(table.fields is None for table in self.tables):
+            self.map_tables([table for table in self.tables if table.fields is None])
+        term = _TERMS.get(field, field) if field is not None else None
+        tables = [table for table in self.tables if term is None or term in table.fields]
+        owner = _ROW_TYPES.get(term)
+        if owner is not None:
+            owned = [table for table in tables if table.params.rowType == owner]
+            tables = owned if len(owned) > 0 else [table for table in tables if table is self.core]
+        if len(tables) == 0:
+            logger.warning(f"No table has a {field} column to check for duplicates")
+        report = ValidationReport()
+        for result in self.run_tables(_find_duplicates, [(table, (term, limit)) for table in tables], 'duplicates'):
+            report.extend(result)
+        return report
+
+    def find_index_field(self, sample_size: int = DEFAULT_KEY_SAMPLE):
+        """
+        Find the field that links the core to the extensions.
+
+        Candidates are the core fields that appear in every extension.
+        If there is only one candidate (or there are no extensions) the first candidate is used.
+        Otherwise the candidates are scored by sampling the data for uniqueness in the core
+        and containment of the extension values in the core.
+
+        :param sample_size: The maximum number of rows sampled from each table when scoring
+        :return: The index field, or None for no index field
+        """
         fields = set(self.core.fields)
         for ext in self.extensions:
             fields = fields.intersection(set(ext.fields))
         if len(fields) == 0:
             return None
         logger.debug(f"Potential index fields: {fields}")
-        for field in self.core.fields:
-            if field in fields:
-                return field
-        return None
+        candidates = [field for field in self.core.fields if field in fields]
+        if len(candidates) == 1 or len(self.extensions) == 0:
+            return candidates[0]
+        with self.instrumentation.measure('find_index_field'):
+            scores = score_fields(self.core, self.extensions, candidates, sample_size)
+        for score in scores:
+            logger.debug(f"Index candidate {score}")
+        # max keeps the first of any equal scores, so ties go to the earliest core field
+        best = max(scores, key=lambda score: score.score)
+        logger.info(f"Chose index field {best}")
+        return best.field
+
+    def rewrite_keep(self, table: Table) -> set:
+        """
+        The columns of a table that are kept when it is rewritten, even if they are empty.
+
+        :param table: The table
+        :return: The set of columns, containing the id or coreid column if there is one
+        """
+        return {table.fields.index(self.index)} if self.index is not None else set()
 
-    def write_table(self, table: Table, destpath: str):
-        destpath = os.path.join(destpath, table.filename)
-        if table.path != destpath:
-            logger.debug(f"Copying {table.filename} to {destpath}")
-            shutil.copy(table.path, destpath)
+    def write_table_args(self, table: Table, destpath: str, placement: str, rewrite: bool, sharding: Sharding,
+                         checksums: List[str] = None, known: dict = None) -> tuple:
+        """
+        The arguments to _write_table for a table: the columns to keep when rewriting, the key column when sharding by key,
+        and the checksums to compute along with any digests of the source that are already known.
+        """
+        keep = self.rewrite_keep(table) if rewrite else None
+        key_column = self.key_column(table) if sharding is not None and sharding.keys is not None else None
+        return destpath, placement, keep, sharding, key_column, checksums, known
+
+    def write_layout(self, table: Table, rewrite: bool, sharding: Sharding) -> dict:
+        """
+        The parts of how a table is written that depend on the index field, which may change when other tables change:
+        the columns kept when rewriting and the key column when sharding by key.
+
+        :return: A JSON-able description, kept in the build manifest
+        """
+        keep, sharding, key_column = self.write_table_args(table, None, None, rewrite, sharding)[2:5]
+        return {'keep': sorted(keep) if keep is not None else None, 'key_column': key_column}
+
+    def write_table(self, table: Table, destpath: str, placement: str = COPY, rewrite: bool = False, sharding: Sharding = None, checksums: List[str] = None):
+        with self.instrumentation.measure('write_table', table.filename):
+            table.columns, table.locations, table.checksums = _write_table(table, *self.write_table_args(table, destpath, placement, rewrite, sharding, checksums))[:3]
+
+    def table_checksums(self) -> Dict[str, Dict[str, str]]:
+        """
+        The digests of every file the tables were written to, by file name and then algorithm.
+        """
+        digests = dict()
+        for table in self.tables:
+            digests.update(table.checksums or dict())
+        return digests
+
+    def write_checksums(self, destpath: str, checksums: List[str], profile: bool):
+        """
+        Write the checksum manifests, using the digests computed as the tables were written.
+        The metadata files are small, so they are simply hashed again.
+
+        :param destpath: The output directory
+        :param checksums: The algorithms, or None to remove any manifests left by earlier builds
+        :param profile: Whether a statistics file was written
+        """
+        digests = None
+        if checksums:
+            with self.instrumentation.measure('write_checksums'):
+                digests = self.table_checksums()
+                for name in ["meta.xml", "eml.xml"] + ([STATS_NAME] if profile else []):
+                    digests[name] = hash_file(os.path.join(destpath, name), checksums)
+        write_checksums(destpath, digests, checksums)
+
+    def write_zip_table(self, table: Table, archive: zipfile.ZipFile, rewrite: bool = False, sharding: Sharding = None, checksums: List[str] = None):
+        logger.debug(f"Adding {table.filename} to zip")
+        with self.instrumentation.measure('write_table', table.filename):
+            size = table.source_stat()[0]
+            # The size of a compressed table once decompressed is not known in advance
+            large = size > zipfile.ZIP64_LIMIT // 2 or table.compression is not None
+            table.locations = None
+            table.checksums = None
+            if sharding is not None:
+                keep, sharding, key_column = self.write_table_args(table, None, None, rewrite, sharding)[2:5]
+                writers = dict()
+                open_shard = hashing_opener(lambda name: archive.open(name, "w", force_zip64=large), checksums, writers)
+                table.columns, table.locations = _shard(table, open_shard, keep, sharding, key_column)
+                logger.debug(f"Split {table.filename} into {len(table.locations)} zip entries")
+                count(bytes_read=size, bytes_written=sum(archive.getinfo(location).compress_size for location in table.locations))
+                if checksums:
+                    table.checksums = {name: writer.digests() for name, writer in writers.items()}
+                return
+            if rewrite:
+                with hashing(archive.open(table.filename, "w", force_zip64=large), checksums) as dest:
+                    table.columns = rewrite_table(table, dest, REWRITE_PARAMS, self.rewrite_keep(table))
+                count(bytes_written=archive.getinfo(table.filename).compress_size)
+                if checksums:
+                    table.checksums = {table.filename: dest.digests()}
+            else:
+                # A table in several parts is copied to an entry for each part
+                table.columns = None
+                digests = dict()
+                for source in table.sources:
+                    name = table.output_name(source)
+                    with table.open_binary(source) as src, hashing(archive.open(name, "w", force_zip64=large), checksums) as dest:
+                        shutil.copyfileobj(src, dest, COPY_BUFFER_SIZE)
+                    digests[name] = dest.digests() if checksums else None
+                    count(bytes_written=archive.getinfo(name).compress_size)
+                count(bytes_read=size)
+                table.locations = list(digests.keys()) if table.parts is not None else None
+                if checksums:
+                    table.checksums = digests
 
     def write_meta(self, destpath: str):
         destpath = os.path.join(destpath, "meta.xml")
         logger.debug(f"Writing metafile {destpath}")
-        with open(destpath, "w") as meta:
-            meta.write('<archive xmlns="http://rs.tdwg.org/dwc/text/" metadata="eml.xml">\n')
-            meta.write('  <!-- Generated on {timestamp} -->\n'.format(timestamp=str(datetime.datetime.now())))
-            self.write_table_meta(self.core, meta, True)
-            for ext in self.extensions:
-                self.write_table_meta(ext, meta, False)
-            meta.write('</archive>')
+        with self.instrumentation.measure('write_meta'):
+            with open(destpath, "w") as meta:
+                self.generate_meta(meta)
+            count(bytes_written=os.path.getsize(destpath))
+
+    def generate_meta(self, meta):
+        meta.write('<archive xmlns="http://rs.tdwg.org/dwc/text/" metadata="eml.xml">\n')
+        meta.write('  <!-- Generated on {timestamp} -->\n'.format(timestamp=str(datetime.datetime.now())))
+        self.write_table_meta(self.core, meta, True)
+        for ext in self.extensions:
+            self.write_table_meta(ext, meta, False)
+        meta.write('</archive>')
 
     def write_table_meta(self, table: Table, meta, core: bool):
         element = 'core' if core else 'extension'
         idelement = 'id' if core else 'coreid'
-        idindex = table.fields.index(self.index) if self.index is not None else None
+        params = table.output_params
+        fields = table.output_fields
+        idindex = fields.index(self.index) if self.index is not None else None
         logger.debug(f"Writing {element} meta description for {table.filename}")
         meta.write('  <{element} rowType="{rowType}" encoding="{encoding}" fieldsTerminatedBy="{fieldsTerminatedBy}" linesTerminatedBy="{linesTerminatedBy}" fieldsEnclosedBy="{fieldsEnclosedBy}" ignoreHeaderLines="{ignoreHeaderLines}">\n'.format(
             element=element,
-            rowType=table.params.rowType,
-            encoding=table.params.encoding,
-            fieldsTerminatedBy=_attr_translate(table.params.fieldsTerminatedBy),
-            linesTerminatedBy=_attr_translate(table.params.linesTerminatedBy),
-            fieldsEnclosedBy=_attr_translate(table.params.fieldsEnclosedBy),
-            ignoreHeaderLines=table.params.ignoreHeaderLines
+            rowType=params.rowType,
+            encoding=params.encoding,
+            fieldsTerminatedBy=_attr_translate(params.fieldsTerminatedBy),
+            linesTerminatedBy=_attr_translate(params.linesTerminatedBy),
+            fieldsEnclosedBy=_attr_translate(params.fieldsEnclosedBy),
+            ignoreHeaderLines=params.ignoreHeaderLines
         ))
         meta.write('    <files>\n')
-        meta.write('      <location>{filename}</location>\n'.format(filename=table.filename))
+        for location in table.output_locations:
+            meta.write('      <location>{filename}</location>\n'.format(filename=location))
         meta.write('    </files>\n')
         if idindex is not None:
             meta.write('    <{idelement} index="{idindex}"/>\n'.format(idelement=idelement, idindex=idindex))
         pos = 0
-        for field in table.fields:
+        for field in fields:
             meta.write('    <field index="{index}" term="{field}"/>\n'.format(index=pos, field=field))
             pos += 1
         meta.write('  </{element}>\n'.format(element=element))
 
+    def write_stats(self, destpath: str):
+        destpath = os.path.join(destpath, STATS_NAME)
+        logger.debug(f"Writing statistics {destpath}")
+        with open(destpath, "w", encoding="utf-8") as stats:
+            self.generate_stats(stats)
+
+    def generate_stats(self, stats):
+        json.dump(self.profiles, stats, indent=2)
+
+    def generate_coverage(self) -> str:
+        if self.profiles is None:
+            return ''
+        extent = coverage(self.profiles)
+        if len(extent) == 0:
+            return ''
+        data = '    <coverage>\n'
+        box = extent.get('boundingBox')
+        if box is not None:
+            data += """      <geographicCoverage>
+        <geographicDescription>Bounding box of the data</geographicDescription>
+        <boundingCoordinates>
+          <westBoundingCoordinate>{west}</westBoundingCoordinate>
+          <eastBoundingCoordinate>{east}</eastBoundingCoordinate>
+          <northBoundingCoordinate>{north}</northBoundingCoordinate>
+          <southBoundingCoordinate>{south}</southBoundingCoordinate>
+        </boundingCoordinates>
+      </geographicCoverage>
+""".format(**box)
+        dates = extent.get('eventDate')
+        if dates is not None:
+            data += """      <temporalCoverage>
+        <rangeOfDates>
+          <beginDate>
+            <calendarDate>{min}</calendarDate>
+          </beginDate>
+          <endDate>
+            <calendarDate>{max}</calendarDate>
+          </endDate>
+        </rangeOfDates>
+      </temporalCoverage>
+""".format(**dates)
+        data += '    </coverage>\n'
+        return data
+
     def write_eml(self, destpath: str):
         destpath = os.path.join(destpath, "eml.xml")
         logger.debug(f"Writing metadata {destpath}")
-        with open(destpath, "w") as eml:
-            title = self.metadata.get('title', 'Title goes here')
-            creator = self.metadata.get('creator', 'Creator name')
-            pubdate = datetime.date.today().isoformat()
-            timestamp = datetime.datetime.now().isoformat()
-            data = """
+        with self.instrumentation.measure('write_eml'):
+            with open(destpath, "w") as eml:
+                self.generate_eml(eml)
+            count(bytes_written=os.path.getsize(destpath))
+
+    def generate_eml(self, eml):
+        title = self.metadata.get('title', 'Title goes here')
+        creator = self.metadata.get('creator', 'Creator name')
+        pubdate = datetime.date.today().isoformat()
+        timestamp = datetime.datetime.now().isoformat()
+        data = """
 <?xml version="1.0" encoding="utf-8"?>
 <eml:eml xmlns:d="eml://ecoinformatics.org/dataset-2.1.0" xmlns:eml="eml://ecoinformatics.org/eml-2.1.1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:dc="http://purl.org/dc/terms/" xsi:schemaLocation="eml://ecoinformatics.org/eml-2.1.1 http://rs.gbif.org/schema/eml-gbif-profile/1.1/eml-gbif-profile.xsd" system="ALA-Registry" scope="system" xml:lang="en">
   <dataset>
@@ -220,7 +1149,7 @@ class DwCA:
     <abstract>
       <para>Abstract</para>
     </abstract>
-  </dataset>
+{coverage}  </dataset>
   <additionalMetadata>
     <metadata>
       <gbif>
@@ -230,5 +1159,5 @@ class DwCA:
     </metadata>
   </additionalMetadata>
 </eml:eml>            
-            """.format(title=title, creator=creator, pubdate=pubdate, timestamp=timestamp)
-            eml.write(data)
+        """.format(title=title, creator=creator, pubdate=pubdate, timestamp=timestamp, coverage=self.generate_coverage())
+        eml.write(data)
@@ -0,0 +1,193 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Building many archives in a single run from a manifest of datasets.
+Datasets are built in a pool of worker processes, each of which loads the term and file rules once and
+then builds dataset after dataset. A failure in one dataset is recorded in its result and does not stop the others.
+"""
+
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+import logging
+
+from . import TableParameters, Table, DwCA, DEFAULT_COMPRESSION_LEVEL
+from .placement import COPY
+
+logger = logging.getLogger("dwca")
+
+"""The separator between file names in the files column of a CSV manifest"""
+FILE_SEPARATOR = ';'
+
+"""Result statuses"""
+OK = 'ok'
+INVALID = 'invalid'
+FAILED = 'failed'
+
+class Dataset:
+    """
+    A dataset to build: the output directory (or zip file), the source files, core first, and the metadata.
+    """
+    def __init__(self, output: str, files: List[str], title: str = None, creator: str = None):
+        self.output = output
+        self.files = files
+        self.title = title
+        self.creator = creator
+
+class BatchResult:
+    """
+    The outcome of building a dataset.
+    """
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+        self.status = None
+        self.tables = len(dataset.files)
+        self.seconds = 0.0
+        self.error = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == OK
+
+    def to_dict(self) -> dict:
+        return {'output': self.dataset.output, 'status': self.status, 'tables': self.tables, 'seconds': self.seconds, 'error': self.error}
+
+def _resolve(base: str, path: str) -> str:
+    return path if os.path.isabs(path) else os.path.join(base, path)
+
+def _dataset(base: str, entry: dict, where: str) -> Dataset:
+    output = entry.get('output')
+    files = entry.get('files')
+    if isinstance(files, str):
+        files = [f.strip() for f in files.split(FILE_SEPARATOR) if f.strip()]
+    if not output or not files:
+        raise ValueError(f"{where}: a dataset needs an output and at least one file")
+    return Dataset(_resolve(base, output), [_resolve(base, f) for f in files], entry.get('title') or None, entry.get('creator') or None)
+
+def read_manifest(path: str) -> List[Dataset]:
+    """
+    Read a manifest of datasets to build.
+
+    A JSON manifest is a list of objects with output, files (a list), title and creator.
+    Any other manifest is read as CSV with output, files, title and creator columns, with the files separated by semicolons.
+    Relative paths are relative to the directory holding the manifest.
+
+    :param path: The manifest file
+    :return: The datasets
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as src:
+            entries = json.load(src)
+        return [_dataset(base, entry, f"{path} entry {i + 1}") for i, entry in enumerate(entries)]
+    with open(path, encoding='utf-8-sig', newline='') as src:
+        reader = csv.DictReader(src)
+        return [_dataset(base, entry, f"{path} line {reader.line_num}") for entry in reader]
+
+def build_dataset(dataset: Dataset, defaults: TableParameters, zip: bool = False, compresslevel: int = DEFAULT_COMPRESSION_LEVEL,
+                  placement: str = COPY, force: bool = False, profile: bool = False, rewrite: bool = False,
+                  sniff: bool = False, validate: bool = False, checksums: List[str] = None) -> BatchResult:
+    """
+    Build a single dataset, catching any error.
+
+    :param dataset: The dataset
+    :param defaults: The default table parameters
+    :param zip: Write a zip file, rather than a directory
+    :param compresslevel: The zip compression level
+    :param placement: How tables are placed in an output directory
+    :param force: Ignore the build manifest of an output directory
+    :param profile: Profile the tables
+    :param rewrite: Rewrite the tables
+    :param sniff: Detect the encoding and dialect of each file
+    :param validate: Check the links between the core and extensions, and skip writing the dataset if there are problems
+    :param checksums: The algorithms used to compute checksums of the files as they are written, for checksum manifests
+    :return: The result
+    """
+    result = BatchResult(dataset)
+    start = time.perf_counter()
+    try:
+        dwca = DwCA(*[Table(f, defaults, sniff) for f in dataset.files])
+        if dataset.title is not None:
+            dwca.metadata['title'] = dataset.title
+        if dataset.creator is not None:
+            dwca.metadata['creator'] = dataset.creator
+        if validate:
+            report = dwca.validate()
+            if not report.valid:
+                result.status = INVALID
+                result.error = str(report)
+                return result
+        if zip:
+            output = dataset.output if dataset.output.endswith('.zip') else dataset.output.rstrip('/' + os.sep) + '.zip'
+            parent = os.path.dirname(output)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            dwca.write_zip(output, compresslevel, profile, rewrite, checksums=checksums)
+        else:
+            os.makedirs(dataset.output, exist_ok=True)
+            dwca.write(dataset.output, placement, force, profile, rewrite, checksums=checksums)
+        result.status = OK
+    except Exception as err:
+        logger.error(f"Error building {dataset.output}: {err}")
+        result.status = FAILED
+        result.error = str(err)
+    finally:
+        result.seconds = time.perf_counter() - start
+    return result
+
+def build_all(datasets: List[Dataset], defaults: TableParameters, workers: int = 1, **options) -> List[BatchResult]:
+    """
+    Build a list of datasets, in a pool of worker processes if there is more than one worker.
+
+    :param datasets: The datasets
+    :param defaults: The default table parameters
+    :param workers: The maximum number of datasets built at once
+    :param options: Options for build_dataset
+    :return: The results, in the same order as the datasets
+    """
+    if workers <= 1 or len(datasets) <= 1:
+        return [build_dataset(dataset, defaults, **options) for dataset in datasets]
+    with ProcessPoolExecutor(max_workers=min(workers, len(datasets))) as executor:
+        futures = [executor.submit(build_dataset, dataset, defaults, **options) for dataset in datasets]
+        results = []
+        for dataset, future in zip(datasets, futures):
+            try:
+                results.append(future.result())
+            except Exception as err:
+                # The worker itself failed, for example by running out of memory
+                logger.error(f"Error building {dataset.output}: {err}")
+                result = BatchResult(dataset)
+                result.status = FAILED
+                result.error = str(err) or type(err).__name__
+                results.append(result)
+        return results
+
+def summary(results: List[BatchResult]) -> str:
+    """
+    Format the results of a batch as a table.
+
+    :param results: The results
+    :return: The table, one line for each dataset and a line of totals
+    """
+    width = max([len('Output')] + [len(result.dataset.output) for result in results])
+    lines = [f"{'Output':{width}s} {'Status':8s} {'Tables':>6s} {'Seconds':>9s}  Error"]
+    for result in results:
+        error = (result.error or '').splitlines()[0] if result.error else ''
+        lines.append(f"{result.dataset.output:{width}s} {result.status:8s} {result.tables:6d} {result.seconds:9.2f}  {error}")
+    failed = sum(1 for result in results if not result.ok)
+    lines.append(f"{len(results)} datasets, {len(results) - failed} built, {failed} not built, {sum(result.seconds for result in results):.2f}s")
+    return '\n'.join(lines)
@@ -0,0 +1,244 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Checksums of the files in an archive, computed while the files are being written rather than by reading them again,
+and verification of an archive against its checksum manifest.
+There is a manifest for each algorithm, in the format used by sha256sum and md5sum, so mirrors can also check an
+archive with those tools.
+"""
+
+import hashlib
+import io
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+import logging
+
+from .instrument import count
+from .placement import COPY_BUFFER_SIZE
+from .validate import ValidationProblem, ValidationReport
+
+logger = logging.getLogger("dwca")
+
+SHA256 = 'sha256'
+MD5 = 'md5'
+
+"""The supported checksum algorithms"""
+CHECKSUM_ALGORITHMS = [SHA256, MD5]
+
+def checksum_name(algorithm: str) -> str:
+    """
+    The name of the checksum manifest for an algorithm, such as checksums.sha256.
+
+    :param algorithm: The algorithm
+    :return: The file name
+    """
+    return f"checksums.{algorithm}"
+
+class HashingWriter(io.BufferedIOBase):
+    """
+    A writable binary file object that hashes everything written to it on the way to another file object.
+    Closing the writer closes the destination.
+    """
+    def __init__(self, dest, algorithms: List[str]):
+        """
+        :param dest: The writable binary file object to pass the data on to
+        :param algorithms: The hashlib names of the algorithms to compute
+        """
+        super().__init__()
+        self.dest = dest
+        self.hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        for digest in self.hashes.values():
+            digest.update(data)
+        return self.dest.write(data)
+
+    def flush(self):
+        if not self.dest.closed:
+            self.dest.flush()
+
+    def close(self):
+        if not self.closed:
+            try:
+                self.dest.close()
+            finally:
+                super().close()
+
+    def digests(self) -> Dict[str, str]:
+        """
+        The hex digests of everything written so far, by algorithm.
+        """
+        return {algorithm: digest.hexdigest() for algorithm, digest in self.hashes.items()}
+
+def hashing(dest, algorithms: List[str]):
+    """
+    Wrap a destination in a HashingWriter, if there are any checksums to compute.
+
+    :param dest: The writable binary file object
+    :param algorithms: The algorithms, or None
+    :return: The wrapped destination, or the destination itself
+    """
+    return HashingWriter(dest, algorithms) if algorithms else dest
+
+def hashing_opener(open_file, algorithms: List[str], writers: Dict[str, HashingWriter]):
+    """
+    Wrap a function that opens named outputs, such as shards, so that each output is hashed as it is written.
+
+    :param open_file: A function that takes a name and returns a writable binary file object
+    :param algorithms: The algorithms, or None
+    :param writers: A dictionary that collects the writer for each name
+    :return: The wrapped function, or the function itself if there are no checksums to compute
+    """
+    if not algorithms:
+        return open_file
+    def open_hashed(name: str):
+        writers[name] = HashingWriter(open_file(name), algorithms)
+        return writers[name]
+    return open_hashed
+
+def hash_bytes(data: bytes, algorithms: List[str]) -> Dict[str, str]:
+    return {algorithm: hashlib.new(algorithm, data).hexdigest() for algorithm in algorithms}
+
+def hash_file(path: str, algorithms: List[str]) -> Dict[str, str]:
+    """
+    Hash the contents of a file with several algorithms in a single read.
+
+    :param path: The file
+    :param algorithms: The algorithms
+    :return: The hex digests, by algorithm
+    """
+    hashes = [hashlib.new(algorithm) for algorithm in algorithms]
+    size = 0
+    with open(path, 'rb') as src:
+        for chunk in iter(lambda: src.read(COPY_BUFFER_SIZE), b''):
+            for digest in hashes:
+                digest.update(chunk)
+            size += len(chunk)
+    count(bytes_read=size)
+    return {algorithm: digest.hexdigest() for algorithm, digest in zip(algorithms, hashes)}
+
+def hashing_copy(src: str, dest: str, algorithms: List[str]) -> Dict[str, str]:
+    """
+    Copy a file through user space, hashing it as it is copied.
+
+    :param src: The source file
+    :param dest: The destination file
+    :param algorithms: The algorithms
+    :return: The hex digests of the contents, by algorithm
+    """
+    if os.path.lexists(dest):
+        os.remove(dest)
+    with open(src, 'rb') as s, HashingWriter(open(dest, 'wb'), algorithms) as d:
+        shutil.copyfileobj(s, d, COPY_BUFFER_SIZE)
+    shutil.copymode(src, dest)
+    return d.digests()
+
+def format_checksums(checksums: Dict[str, Dict[str, str]], algorithm: str) -> str:
+    """
+    Format the checksum manifest for an algorithm.
+
+    :param checksums: The digests of each file, by file name and then algorithm
+    :param algorithm: The algorithm
+    :return: The manifest, one line of digest and file name for each file, sorted by name
+    """
+    return ''.join(f"{checksums[name][algorithm]}  {name}\n" for name in sorted(checksums.keys()))
+
+def write_checksums(destpath: str, checksums: Dict[str, Dict[str, str]], algorithms: List[str]):
+    """
+    Write a checksum manifest for each algorithm into an output directory.
+    Manifests for any other algorithms, left by earlier builds, are removed as they no longer describe the archive.
+
+    :param destpath: The output directory
+    :param checksums: The digests of each file, by file name and then algorithm
+    :param algorithms: The algorithms, or None to remove all manifests
+    """
+    algorithms = algorithms or []
+    for algorithm in CHECKSUM_ALGORITHMS:
+        path = os.path.join(destpath, checksum_name(algorithm))
+        if algorithm in algorithms:
+            logger.debug(f"Writing checksums {path}")
+            with open(path, 'w', encoding='utf-8', newline='\n') as dest:
+                dest.write(format_checksums(checksums, algorithm))
+        elif os.path.exists(path):
+            logger.info(f"Removing {checksum_name(algorithm)} from previous build")
+            os.remove(path)
+
+def read_checksums(path: str) -> List[tuple]:
+    """
+    Read a checksum manifest.
+
+    :param path: The manifest
+    :return: A list of (line number, file name, digest)
+    """
+    entries = []
+    with open(path, encoding='utf-8') as src:
+        for line, text in enumerate(src, 1):
+            text = text.rstrip('\r\n')
+            if not text or text.startswith('#'):
+                continue
+            digest, _, name = text.partition(' ')
+            # sha256sum marks files read in binary mode with a *
+            name = name[1:] if name[:1] in (' ', '*') else name
+            entries.append((line, name, digest.lower()))
+    return entries
+
+def verify_checksums(destpath: str, workers: int = 1) -> ValidationReport:
+    """
+    Check the files in an archive directory against its checksum manifests.
+    Each file is read once, however many algorithms it is listed under, and files are hashed in a pool of
+    worker processes if there is more than one worker.
+
+    :param destpath: The archive directory
+    :param workers: The maximum number of files hashed at once
+    :return: A report of missing files and mismatched checksums, with the manifest line numbers
+    :raise ValueError: if the directory has no checksum manifest
+    """
+    manifests = {algorithm: read_checksums(os.path.join(destpath, checksum_name(algorithm)))
+                 for algorithm in CHECKSUM_ALGORITHMS if os.path.exists(os.path.join(destpath, checksum_name(algorithm)))}
+    if len(manifests) == 0:
+        raise ValueError(f"No checksum manifest in {destpath}")
+    report = ValidationReport()
+    missing = {algorithm: ValidationProblem(checksum_name(algorithm), 'missing files') for algorithm in manifests.keys()}
+    mismatched = {algorithm: ValidationProblem(checksum_name(algorithm), 'checksum mismatches') for algorithm in manifests.keys()}
+    files: Dict[str, List[str]] = dict()
+    for algorithm, entries in manifests.items():
+        for line, name, digest in entries:
+            if os.path.isfile(os.path.join(destpath, name)):
+                files.setdefault(name, []).append(algorithm)
+            else:
+                logger.warning(f"{name} is missing")
+                missing[algorithm].add(line)
+    names = sorted(files.keys())
+    jobs = [(os.path.join(destpath, name), files[name]) for name in names]
+    if workers <= 1 or len(jobs) <= 1:
+        results = [hash_file(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            results = list(executor.map(hash_file, *zip(*jobs)))
+    digests = dict(zip(names, results))
+    for algorithm, entries in manifests.items():
+        for line, name, digest in entries:
+            if name in digests and digests[name][algorithm] != digest:
+                logger.warning(f"{name} does not match its {algorithm} checksum")
+                mismatched[algorithm].add(line)
+    for algorithm in manifests.keys():
+        report.add(missing[algorithm])
+        report.add(mismatched[algorithm])
+    logger.info(f"Checked {len(names)} files in {destpath}")
+    return report
@@ -0,0 +1,94 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Transparent reading of gzip, bzip2 and xz compressed source tables.
+Compressed tables are decompressed as they are streamed, rather than being inflated on disk first.
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+
+GZIP = 'gzip'
+BZIP2 = 'bzip2'
+XZ = 'xz'
+
+"""Lookup table mapping a file name suffix onto a compression"""
+SUFFIXES = {
+    '.gz': GZIP,
+    '.gzip': GZIP,
+    '.bz2': BZIP2,
+    '.xz': XZ
+}
+
+"""The magic bytes at the start of each kind of compressed file"""
+MAGIC = [
+    (b'\x1f\x8b', GZIP),
+    (b'\xfd7zXZ\x00', XZ)
+]
+
+_OPENERS = {
+    GZIP: gzip.open,
+    BZIP2: bz2.open,
+    XZ: lzma.open
+}
+
+def detect_compression(path: str) -> str:
+    """
+    Detect whether a file is compressed, from its suffix or the magic bytes at the start of the file.
+
+    :param path: The file
+    :return: The compression, or None for an uncompressed (or missing) file
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in SUFFIXES:
+        return SUFFIXES[suffix]
+    try:
+        with open(path, 'rb') as src:
+            head = src.read(6)
+    except OSError:
+        return None
+    for magic, compression in MAGIC:
+        if head.startswith(magic):
+            return compression
+    # The bzip2 magic is BZh followed by the block size, 1-9
+    if head[:3] == b'BZh' and head[3:4] in [b'%d' % size for size in range(1, 10)]:
+        return BZIP2
+    return None
+
+def inner_filename(filename: str, compression: str) -> str:
+    """
+    Get the name of the file inside a compressed file, by removing any compression suffix.
+
+    :param filename: The file name
+    :param compression: The compression of the file, if any
+    :return: The inner file name
+    """
+    base, suffix = os.path.splitext(filename)
+    if compression is not None and SUFFIXES.get(suffix.lower()) == compression:
+        return base
+    return filename
+
+def open_input(path: str, compression: str = None):
+    """
+    Open a file for reading as bytes, decompressing it if necessary.
+
+    :param path: The file
+    :param compression: The compression of the file, if any
+    :return: A binary file object
+    """
+    if compression is None:
+        return open(path, 'rb')
+    return _OPENERS[compression](path, 'rb')
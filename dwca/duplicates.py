@@ -0,0 +1,73 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Detection of duplicate values in a column, or of duplicated rows, in bounded memory.
+Values are hashed to 64-bit keys and sorted with their line numbers, so duplicates end up next to each other.
+"""
+
+from typing import List
+import logging
+
+from .rewrite import short_name
+from .sorting import ExternalSorter, key_hash, DEFAULT_SORT_LIMIT
+from .validate import ValidationProblem, ValidationReport
+
+logger = logging.getLogger("dwca")
+
+"""The separator used to join the values of a row before hashing, which is not expected in any value"""
+_ROW_SEPARATOR = '\x1f'
+
+def row_hash(row: List[str]) -> int:
+    """
+    Hash a whole row, with each value trimmed.
+
+    :param row: The row
+    :return: The hash
+    """
+    return key_hash(_ROW_SEPARATOR.join(value.strip() for value in row))
+
+def find_duplicates(table, field: str = None, limit: int = DEFAULT_SORT_LIMIT, report: ValidationReport = None) -> ValidationReport:
+    """
+    Find duplicate values of a field in a table, or duplicated rows.
+    Empty values are ignored. The first occurrence of a value is not counted as a duplicate, any later ones are.
+
+    :param table: The table, with mapped fields
+    :param field: The field to check, or None to check whole rows
+    :param limit: The maximum number of keys to sort in memory before spilling sorted runs to disk
+    :param report: The report to add problems to
+    :return: The report
+    """
+    if report is None:
+        report = ValidationReport()
+    column = table.fields.index(field) if field is not None else None
+    name = 'duplicate rows' if field is None else f"duplicate {short_name(field)} values"
+    duplicates = ValidationProblem(table.filename, name)
+    with ExternalSorter(limit) as sorter:
+        for line, row in table.records():
+            if column is None:
+                if any(value.strip() for value in row):
+                    sorter.add(row_hash(row), line)
+            else:
+                value = row[column].strip() if column < len(row) else ''
+                if value:
+                    sorter.add(key_hash(value), line)
+        if sorter.spilled:
+            logger.debug(f"Duplicate check of {table.filename} spilled to disk")
+        last = None
+        for key, line in sorter:
+            if key == last:
+                duplicates.add(line)
+            last = key
+    report.add(duplicates)
+    return report
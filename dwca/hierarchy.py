@@ -0,0 +1,176 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Checks on the event hierarchy formed by parentEventID.
+Events are held as parent row numbers and line numbers in arrays, rather than as python objects for each row.
+Parents are resolved by sorting the hashed ids and the hashed parent ids in bounded memory and merging them,
+then every event is visited once when following parents, so cycles and depths are found in linear time.
+"""
+
+from array import array
+from typing import Dict
+import logging
+
+from .sorting import ExternalSorter, key_hash, DEFAULT_SORT_LIMIT
+from .validate import ValidationProblem, ValidationReport
+
+logger = logging.getLogger("dwca")
+
+"""The event id and parent event id terms"""
+EVENT_ID = 'http://rs.tdwg.org/dwc/terms/eventID'
+PARENT_EVENT_ID = 'http://rs.tdwg.org/dwc/terms/parentEventID'
+
+"""The parent of an event with no parentEventID"""
+_ROOT = -1
+
+"""The parent of an event whose parentEventID is not an eventID"""
+_ORPHAN = -2
+
+"""Depth markers for events that have not been reached, are being followed, are in a cycle or descend from a cycle"""
+_UNKNOWN = -1
+_VISITING = -2
+_CYCLE = -3
+_BELOW_CYCLE = -4
+
+class EventHierarchy:
+    """
+    The shape of an event hierarchy: the number of events and roots, how many events are at each depth
+    and any problems found.
+    Roots, and events with a missing parent, are at depth 0.
+    """
+    def __init__(self, table: str):
+        self.table = table
+        self.events = 0
+        self.roots = 0
+        self.depths: Dict[int, int] = dict()
+        self.report = ValidationReport()
+
+    @property
+    def valid(self) -> bool:
+        return self.report.valid
+
+    @property
+    def max_depth(self) -> int:
+        return max(self.depths.keys()) if self.depths else None
+
+    def to_dict(self) -> dict:
+        return {
+            'events': self.events,
+            'roots': self.roots,
+            'depths': {str(depth): count for depth, count in sorted(self.depths.items())},
+            'problems': [str(problem) for problem in self.report.problems]
+        }
+
+    def __str__(self):
+        depths = ', '.join(f"{depth}: {count}" for depth, count in sorted(self.depths.items()))
+        return f"{self.table}: {self.events} events, {self.roots} roots, depths {{{depths}}}"
+
+def _load(table, id_column: int, parent_column: int, ids: ExternalSorter, parents: ExternalSorter) -> array:
+    """
+    Read the events, adding (id hash, row) pairs and (parent id hash, row) pairs to the sorters.
+
+    :return: The line number of each event row
+    """
+    lines = array('Q')
+    for line, row in table.records():
+        id = row[id_column].strip() if id_column < len(row) else ''
+        if not id:
+            continue
+        parent = row[parent_column].strip() if parent_column < len(row) else ''
+        ids.add(key_hash(id), len(lines))
+        if parent:
+            parents.add(key_hash(parent), len(lines))
+        lines.append(line)
+    return lines
+
+def _resolve(count: int, ids: ExternalSorter, parents: ExternalSorter) -> array:
+    """
+    Turn the hashed parent ids into row numbers, with _ROOT for no parent and _ORPHAN for a missing parent,
+    by merging the sorted parent ids against the sorted ids.
+    Where an eventID is duplicated the first row is used, as pairs with the same hash are sorted by row.
+    """
+    resolved = array('q', [_ROOT]) * count
+    events = iter(ids)
+    current, first = next(events, (None, None))
+    for hashed, row in parents:
+        # Stopping at the first pair with an id leaves first as its earliest row
+        while current is not None and current < hashed:
+            current, first = next(events, (None, None))
+        resolved[row] = first if current == hashed else _ORPHAN
+    return resolved
+
+def analyse_hierarchy(table, id_field: str = EVENT_ID, parent_field: str = PARENT_EVENT_ID, limit: int = DEFAULT_SORT_LIMIT) -> EventHierarchy:
+    """
+    Analyse the hierarchy of events in a table.
+    Reports parentEventIDs that do not match any eventID, events that are their own ancestors and
+    more than one root event.
+
+    :param table: The event table, with mapped fields
+    :param id_field: The event id field
+    :param parent_field: The parent event id field
+    :param limit: The maximum number of ids and parent ids, together, held in memory before sorted runs are spilled to disk
+    :return: The hierarchy
+    """
+    hierarchy = EventHierarchy(table.filename)
+    with ExternalSorter(max(limit // 2, 1)) as ids, ExternalSorter(max(limit // 2, 1)) as parents:
+        lines = _load(table, table.fields.index(id_field), table.fields.index(parent_field), ids, parents)
+        parent = _resolve(len(lines), ids, parents)
+    orphans = ValidationProblem(table.filename, 'orphan parentEventIDs')
+    cycles = ValidationProblem(table.filename, 'events in parentEventID cycles')
+    roots = ValidationProblem(table.filename, 'root events')
+    count = len(parent)
+    depth = array('l', [_UNKNOWN]) * count
+    path = array('q')
+    for start in range(count):
+        if depth[start] != _UNKNOWN:
+            continue
+        node = start
+        while depth[node] == _UNKNOWN:
+            p = parent[node]
+            if p < 0:
+                depth[node] = 0
+                if p == _ROOT:
+                    roots.add(lines[node])
+                else:
+                    orphans.add(lines[node])
+                break
+            depth[node] = _VISITING
+            path.append(node)
+            node = p
+        if depth[node] == _VISITING:
+            # The path has come back on itself: everything from node onwards is a cycle
+            while True:
+                member = path.pop()
+                depth[member] = _CYCLE
+                cycles.add(lines[member])
+                if member == node:
+                    break
+        base = depth[node]
+        while path:
+            member = path.pop()
+            if base < 0:
+                depth[member] = _BELOW_CYCLE
+            else:
+                base += 1
+                depth[member] = base
+    for d in depth:
+        if d >= 0:
+            hierarchy.depths[d] = hierarchy.depths.get(d, 0) + 1
+    hierarchy.events = count
+    hierarchy.roots = roots.count
+    hierarchy.report.add(orphans)
+    hierarchy.report.add(cycles)
+    if roots.count > 1:
+        hierarchy.report.add(roots)
+    return hierarchy
@@ -0,0 +1,154 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Lightweight measurement of the time, bytes and rows used by each stage of building an archive.
+
+Code doing the work calls count() to add to whichever measurement is active in the current process,
+so measurements taken in worker processes can be returned and recorded by the parent.
+The figures of a measurement are rolled up into the one enclosing it when it completes, so a stage such as
+write includes the bytes and rows of the per-table stages inside it.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, List
+import logging
+
+logger = logging.getLogger("dwca")
+
+class Measurement:
+    """
+    The wall time, bytes read and written and rows seen by a stage, optionally for a single table,
+    including those of any measurements nested in it.
+    """
+    def __init__(self, stage: str, table: str = None):
+        self.stage = stage
+        self.table = table
+        self.seconds = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.rows = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'stage': self.stage,
+            'table': self.table,
+            'seconds': self.seconds,
+            'bytesRead': self.bytes_read,
+            'bytesWritten': self.bytes_written,
+            'rows': self.rows
+        }
+
+    def __str__(self):
+        table = f" {self.table}" if self.table is not None else ''
+        return f"{self.stage}{table}: {self.seconds:.3f}s, {self.bytes_read} bytes read, {self.bytes_written} bytes written, {self.rows} rows"
+
+"""The measurements in progress in this process, innermost last"""
+_active: List[Measurement] = list()
+
+def count(bytes_read: int = 0, bytes_written: int = 0, rows: int = 0):
+    """
+    Add to the innermost active measurement, if there is one.
+    """
+    if _active:
+        measurement = _active[-1]
+        measurement.bytes_read += bytes_read
+        measurement.bytes_written += bytes_written
+        measurement.rows += rows
+
+@contextmanager
+def measuring(stage: str, table: str = None):
+    """
+    Make a measurement of the enclosed code.
+
+    :param stage: The stage name
+    :param table: The table file name, if the stage is for a single table
+    :return: The measurement, which is complete once the block exits
+    """
+    measurement = Measurement(stage, table)
+    _active.append(measurement)
+    start = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        measurement.seconds = time.perf_counter() - start
+        _active.remove(measurement)
+        roll_up(measurement)
+
+def roll_up(measurement: Measurement):
+    """
+    Add the figures of a completed measurement, which may have been made in a worker process, to the innermost active measurement.
+    """
+    count(measurement.bytes_read, measurement.bytes_written, measurement.rows)
+
+def log_hook(measurement: Measurement):
+    """A hook that logs each measurement"""
+    logger.debug(f"Measured {measurement}")
+
+class Instrumentation:
+    """
+    A collection of measurements, passed on to any hooks as they are recorded.
+    Hooks are callables taking a Measurement and can be used to send figures to an external metrics sink.
+    """
+    def __init__(self):
+        self.measurements: List[Measurement] = list()
+        self.hooks: List[Callable[[Measurement], None]] = list()
+
+    def add_hook(self, hook: Callable[[Measurement], None]):
+        self.hooks.append(hook)
+
+    def record(self, measurement: Measurement):
+        self.measurements.append(measurement)
+        for hook in self.hooks:
+            try:
+                hook(measurement)
+            except Exception as err:
+                logger.warning(f"Metrics hook {hook} failed: {err}")
+
+    @contextmanager
+    def measure(self, stage: str, table: str = None):
+        """
+        Measure the enclosed code and record the result.
+        """
+        measurement = None
+        try:
+            with measuring(stage, table) as measurement:
+                yield measurement
+        finally:
+            if measurement is not None:
+                self.record(measurement)
+
+    def report(self) -> dict:
+        """
+        Summarise the measurements, totalled by stage and by table.
+
+        :return: A JSON-able report
+        """
+        stages = dict()
+        tables = dict()
+        for measurement in self.measurements:
+            totals = [stages.setdefault(measurement.stage, Measurement(measurement.stage))]
+            if measurement.table is not None:
+                by_table = tables.setdefault(measurement.table, dict())
+                totals.append(by_table.setdefault(measurement.stage, Measurement(measurement.stage, measurement.table)))
+            for total in totals:
+                total.seconds += measurement.seconds
+                total.bytes_read += measurement.bytes_read
+                total.bytes_written += measurement.bytes_written
+                total.rows += measurement.rows
+        return {
+            'stages': {name: total.to_dict() for name, total in stages.items()},
+            'tables': {table: {name: total.to_dict() for name, total in by_table.items()} for table, by_table in tables.items()},
+            'measurements': [measurement.to_dict() for measurement in self.measurements]
+        }
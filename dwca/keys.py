@@ -0,0 +1,103 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Choose the field linking a core to its extensions by looking at the data.
+
+Each candidate field is scored by how unique its values are in the core and
+how many of the extension values can be found in the core.
+Both are estimated from a sample of rows using sketches, so memory stays bounded on very large tables.
+"""
+
+from itertools import islice
+from typing import List, Dict
+import logging
+
+from .sketch import HyperLogLog, BloomFilter
+from .sorting import key_hash
+
+logger = logging.getLogger("dwca")
+
+"""The default number of rows sampled from each table when scoring candidate key fields"""
+DEFAULT_KEY_SAMPLE = 1000000
+
+class KeyScore:
+    """
+    The evidence for a candidate key field.
+    """
+    def __init__(self, field: str):
+        self.field = field
+        self.rows = 0
+        self.values = 0
+        self.distinct = 0
+        self.containment: Dict[str, float] = dict()
+
+    @property
+    def uniqueness(self) -> float:
+        """The estimated fraction of core rows with a distinct, non-empty value"""
+        if self.rows == 0:
+            return 0.0
+        return min(self.distinct, self.values) / self.rows
+
+    @property
+    def score(self) -> float:
+        if len(self.containment) == 0:
+            return self.uniqueness
+        return self.uniqueness * sum(self.containment.values()) / len(self.containment)
+
+    def __str__(self):
+        contained = ', '.join(f"{name} {value:.1%}" for name, value in self.containment.items())
+        return f"{self.field}: score {self.score:.3f}, uniqueness {self.uniqueness:.1%} of {self.rows} core rows, contained {contained}"
+
+def score_fields(core, extensions, candidates: List[str], sample_size: int = DEFAULT_KEY_SAMPLE) -> List[KeyScore]:
+    """
+    Score candidate key fields.
+
+    The core is sampled for the distinct count (using a HyperLogLog) and the set of values (using a Bloom filter)
+    of each candidate. The extensions are then sampled to see what fraction of their values are in the core.
+    If the core is larger than the sample, containment is underestimated equally for every candidate.
+
+    :param core: The core table
+    :param extensions: The extension tables
+    :param candidates: The candidate fields, present in every table
+    :param sample_size: The maximum number of rows read from each table
+    :return: The scores, in candidate order
+    """
+    scores = [KeyScore(field) for field in candidates]
+    columns = [core.fields.index(field) for field in candidates]
+    sketches = [HyperLogLog() for field in candidates]
+    filters = [BloomFilter(sample_size) for field in candidates]
+    for line, row in islice(core.records(), sample_size):
+        for score, column, sketch, bloom in zip(scores, columns, sketches, filters):
+            score.rows += 1
+            value = row[column].strip() if column < len(row) else ''
+            if value:
+                hashed = key_hash(value)
+                score.values += 1
+                sketch.add(hashed)
+                bloom.add(hashed)
+    for score, sketch in zip(scores, sketches):
+        score.distinct = sketch.estimate()
+    for ext in extensions:
+        columns = [ext.fields.index(field) for field in candidates]
+        found = [0] * len(candidates)
+        rows = 0
+        for line, row in islice(ext.records(), sample_size):
+            rows += 1
+            for i, (column, bloom) in enumerate(zip(columns, filters)):
+                value = row[column].strip() if column < len(row) else ''
+                if value and key_hash(value) in bloom:
+                    found[i] += 1
+        for score, count in zip(scores, found):
+            score.containment[ext.filename] = count / rows if rows > 0 else 0.0
+    return scores
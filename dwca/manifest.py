@@ -0,0 +1,217 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+A build manifest kept in an output directory, so that unchanged tables can be skipped on the next build.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict
+import logging
+
+from .instrument import count
+from .placement import COPY_BUFFER_SIZE
+
+logger = logging.getLogger("dwca")
+
+"""The name of the manifest file in the output directory"""
+MANIFEST_NAME = '.dwca-manifest.json'
+
+"""The manifest format version"""
+_VERSION = 1
+
+def file_digest(path: str, algorithm: str = 'sha256') -> str:
+    """
+    Compute the hex digest of a file's contents.
+
+    :param path: The file
+    :param algorithm: The hashlib algorithm name
+    :return: The digest
+    """
+    with open(path, 'rb') as src:
+        return stream_digest([src], algorithm)
+
+def stream_digest(sources, algorithm: str = 'sha256') -> str:
+    """
+    Compute the hex digest of the contents of several binary file objects, one after the other.
+
+    :param sources: The file objects
+    :param algorithm: The hashlib algorithm name
+    :return: The digest
+    """
+    digest = hashlib.new(algorithm)
+    size = 0
+    for src in sources:
+        for chunk in iter(lambda: src.read(COPY_BUFFER_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    count(bytes_read=size)
+    return digest.hexdigest()
+
+def content_key(value) -> str:
+    """
+    Compute a key that changes whenever a JSON-able value changes.
+
+    :param value: The value
+    :return: A digest of the value
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def source_state(table, previous: dict = None) -> dict:
+    """
+    Describe the state of the source of a table, which may be a file, several files or an entry in a zip archive.
+    The source is only read for its content hash if it was hashed in the previous build and the size or modification time differ,
+    so that a source that has been touched but not changed is still recognised.
+    Otherwise the hash is carried over from the previous state, if there is one, or taken later as the source is copied.
+
+    :param table: The table
+    :param previous: The previously recorded state, if any
+    :return: The state of the source
+    """
+    size, mtime = table.source_stat()
+    state = {'source': table.source, 'size': size, 'mtime': mtime}
+    if previous is None or 'sha256' not in previous:
+        return state
+    # A zip archive read from a file object has no modification time, so it is always hashed
+    if mtime is not None and all(previous.get(k) == state[k] for k in state.keys()):
+        state['sha256'] = previous['sha256']
+    else:
+        state['sha256'] = source_digest(table)
+    return state
+
+def source_digest(table) -> str:
+    """
+    Compute the SHA-256 of the sources of a table as they are stored, one after the other: compressed files are not decompressed.
+
+    :param table: The table
+    :return: The hex digest
+    """
+    return stream_digest(_stored(table))
+
+def _stored(table):
+    for source in table.sources:
+        with table.open_binary(source) if table.archive is not None else open(source, 'rb') as src:
+            yield src
+
+class BuildManifest:
+    """
+    A record of the sources, parameters and fields used for each table in the last build of an output directory,
+    the chosen index field and keys for the inputs that went into meta.xml and eml.xml.
+    """
+    def __init__(self, destpath: str):
+        self.destpath = destpath
+        self.tables: Dict[str, dict] = dict()
+        self.index = None
+        self.meta = None
+        self.eml = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.destpath, MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, destpath: str):
+        manifest = cls(destpath)
+        if not os.path.exists(manifest.path):
+            return manifest
+        try:
+            with open(manifest.path, encoding='utf-8') as src:
+                data = json.load(src)
+            if data.get('version') == _VERSION:
+                manifest.tables = data.get('tables', dict())
+                manifest.index = data.get('index')
+                manifest.meta = data.get('meta')
+                manifest.eml = data.get('eml')
+        except (OSError, ValueError) as err:
+            logger.warning(f"Ignoring unreadable manifest {manifest.path}: {err}")
+        return manifest
+
+    def save(self):
+        temp = self.path + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as dest:
+            json.dump({'version': _VERSION, 'tables': self.tables, 'index': self.index, 'meta': self.meta, 'eml': self.eml}, dest, indent=2)
+        os.replace(temp, self.path)
+
+    def unchanged(self, table, state: dict, options: dict = None) -> bool:
+        """
+        Is a table the same as the last build?
+        The source, content and parameters must all match, the table must have been written with the same options
+        and the outputs must still exist.
+        The layout recorded for the table depends on the index field, so it is checked by the caller once that is known.
+
+        :param table: The table
+        :param state: The current source state
+        :param options: The options that affect how the table is written, such as the placement, rewriting and sharding
+        :return: True if the table does not need rebuilding
+        """
+        previous = self.tables.get(table.filename)
+        if previous is None:
+            return False
+        return previous['source'] == state['source'] and \
+            self._same_content(previous, state) and \
+            previous['params'] == table.params.to_dict() and \
+            previous.get('options') == options and \
+            all(os.path.exists(os.path.join(self.destpath, location)) for location in self._locations(table.filename, previous))
+
+    @staticmethod
+    def _same_content(previous: dict, state: dict) -> bool:
+        # A source without a content hash is the same if its size and modification time are
+        if 'sha256' in previous and 'sha256' in state:
+            return previous['sha256'] == state['sha256']
+        return state['mtime'] is not None and previous.get('size') == state['size'] and previous.get('mtime') == state['mtime']
+
+    @staticmethod
+    def _locations(filename: str, entry: dict):
+        return entry.get('locations') or [filename]
+
+    def _remove_outputs(self, filename: str, entry: dict, keep):
+        for location in self._locations(filename, entry):
+            output = os.path.join(self.destpath, location)
+            if location not in keep and os.path.lexists(output) and os.path.abspath(output) != entry['source']:
+                logger.info(f"Removing {location} from previous build")
+                os.remove(output)
+
+    def record(self, table, state: dict, profile: dict = None, options: dict = None, layout: dict = None):
+        previous = self.tables.get(table.filename)
+        if previous is not None:
+            # Remove any outputs, such as shards, that the table is no longer written to
+            self._remove_outputs(table.filename, previous, set(table.output_locations))
+        entry = dict(state)
+        entry['params'] = table.params.to_dict()
+        entry['fields'] = table.fields
+        entry['options'] = options
+        entry['layout'] = layout
+        if table.columns is not None:
+            entry['columns'] = table.columns
+        if table.locations is not None:
+            entry['locations'] = table.locations
+        if table.checksums is not None:
+            entry['checksums'] = table.checksums
+        if profile is not None:
+            entry['profile'] = profile
+        self.tables[table.filename] = entry
+
+    def remove_stale(self, tables):
+        """
+        Remove outputs from previous builds for tables that are no longer part of the archive.
+
+        :param tables: The current tables
+        """
+        current = set(table.filename for table in tables)
+        for filename in list(self.tables.keys()):
+            if filename in current:
+                continue
+            self._remove_outputs(filename, self.tables[filename], set())
+            del self.tables[filename]
@@ -0,0 +1,136 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Strategies for placing a source table into an output directory.
+Links and clones avoid copying the table contents when the source and destination are on the same filesystem.
+"""
+
+import errno
+import os
+import shutil
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger("dwca")
+
+"""The size of the buffer used when streaming table contents"""
+COPY_BUFFER_SIZE = 1024 * 1024
+
+AUTO = 'auto'
+COPY = 'copy'
+HARDLINK = 'hardlink'
+SYMLINK = 'symlink'
+REFLINK = 'reflink'
+
+"""The available placement strategies"""
+PLACEMENT_STRATEGIES = [AUTO, COPY, HARDLINK, SYMLINK, REFLINK]
+
+"""The linux FICLONE ioctl, used to create a copy-on-write clone of a file"""
+_FICLONE = 0x40049409
+
+def _remove(path: str):
+    if os.path.lexists(path):
+        os.remove(path)
+
+def hardlink(src: str, dest: str) -> str:
+    _remove(dest)
+    os.link(src, dest)
+    return HARDLINK
+
+def symlink(src: str, dest: str) -> str:
+    _remove(dest)
+    os.symlink(os.path.abspath(src), dest)
+    return SYMLINK
+
+def reflink(src: str, dest: str) -> str:
+    if fcntl is None or not hasattr(fcntl, 'ioctl'):
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform", dest)
+    _remove(dest)
+    with open(src, 'rb') as s, open(dest, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            _remove(dest)
+            raise
+    return REFLINK
+
+def kernel_copy(src: str, dest: str) -> str:
+    """
+    Copy a file without passing the contents through user space, using copy_file_range or sendfile.
+
+    :param src: The source file
+    :param dest: The destination file
+    :return: The name of the system call used
+    """
+    if hasattr(os, 'copy_file_range'):
+        call, name = os.copy_file_range, 'copy_file_range'
+    elif hasattr(os, 'sendfile'):
+        call, name = lambda s, d, n: os.sendfile(d, s, None, n), 'sendfile'
+    else:
+        raise OSError(errno.ENOSYS, "No kernel copy available on this platform", dest)
+    _remove(dest)
+    with open(src, 'rb') as s, open(dest, 'wb') as d:
+        try:
+            while call(s.fileno(), d.fileno(), COPY_BUFFER_SIZE * 16) > 0:
+                pass
+        except OSError:
+            d.close()
+            _remove(dest)
+            raise
+    shutil.copymode(src, dest)
+    return name
+
+def buffered_copy(src: str, dest: str) -> str:
+    _remove(dest)
+    with open(src, 'rb') as s, open(dest, 'wb') as d:
+        shutil.copyfileobj(s, d, COPY_BUFFER_SIZE)
+    shutil.copymode(src, dest)
+    return 'buffered copy'
+
+def _first_of(src: str, dest: str, *strategies) -> str:
+    for strategy in strategies[:-1]:
+        try:
+            return strategy(src, dest)
+        except OSError as err:
+            logger.debug(f"Unable to place {src} using {strategy.__name__}: {err}")
+    return strategies[-1](src, dest)
+
+def place_file(src: str, dest: str, strategy: str = COPY) -> str:
+    """
+    Place a source file at a destination.
+
+    The copy strategy makes an independent copy, using the kernel to copy the data where possible.
+    The auto strategy tries a hardlink, then a reflink and then falls back to a copy.
+
+    :param src: The source file
+    :param dest: The destination file
+    :param strategy: The placement strategy, one of PLACEMENT_STRATEGIES
+    :return: A description of the method actually used
+    """
+    if strategy == AUTO:
+        return _first_of(src, dest, hardlink, reflink, kernel_copy, buffered_copy)
+    if strategy == COPY:
+        return _first_of(src, dest, kernel_copy, buffered_copy)
+    if strategy == HARDLINK:
+        return hardlink(src, dest)
+    if strategy == SYMLINK:
+        return symlink(src, dest)
+    if strategy == REFLINK:
+        return reflink(src, dest)
+    raise ValueError(f"Unknown placement strategy {strategy}")
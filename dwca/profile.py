@@ -0,0 +1,204 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Single-pass column profiling of tables, with bounded memory.
+"""
+
+import datetime
+import re
+from typing import List, Dict
+import logging
+
+from .sketch import HyperLogLog
+from .sorting import key_hash
+
+logger = logging.getLogger("dwca")
+
+"""The name of the statistics file written alongside the metadata"""
+STATS_NAME = 'stats.json'
+
+"""The number of coordinate values parsed at a time"""
+NUMERIC_BATCH = 10000
+
+"""An ISO 8601 date, year-month or year, possibly without zero padding"""
+_DATE = re.compile(r'(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?')
+
+def _normalise_date(value: str) -> str:
+    """
+    Normalise the date part of an ISO 8601 date or date and time, dropping any time and zero padding the month and day
+    so that dates sort as strings.
+
+    :param value: The value
+    :return: The date as YYYY, YYYY-MM or YYYY-MM-DD, or None if the value is not a valid date
+    """
+    match = _DATE.fullmatch(re.split(r'[T ]', value, 1)[0])
+    if match is None:
+        return None
+    year, month, day = (int(part) if part is not None else None for part in match.groups())
+    try:
+        datetime.date(year, month or 1, day or 1)
+    except ValueError:
+        return None
+    return f"{year:04d}" + (f"-{month:02d}" if month is not None else '') + (f"-{day:02d}" if day is not None else '')
+
+def _term_name(field: str) -> str:
+    return field.rsplit('/', 1)[-1] if field is not None else None
+
+def _parse_floats(values: List[str]) -> List[float]:
+    try:
+        return list(map(float, values))
+    except ValueError:
+        parsed = []
+        for value in values:
+            try:
+                parsed.append(float(value))
+            except ValueError:
+                pass
+        return parsed
+
+class ColumnProfile:
+    """
+    The number of values, empty values and approximate distinct values in a column.
+    """
+    def __init__(self, field: str):
+        self.field = field
+        self.count = 0
+        self.nulls = 0
+        self.sketch = HyperLogLog()
+
+    def add(self, value: str):
+        self.count += 1
+        if not value:
+            self.nulls += 1
+        else:
+            self.sketch.add(key_hash(value))
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'nulls': self.nulls,
+            'nullRate': self.nulls / self.count if self.count > 0 else None,
+            'distinct': self.sketch.estimate()
+        }
+
+class TableProfile:
+    """
+    A profile of a table: per-column statistics, the range of event dates and the bounding box of the coordinates.
+    """
+    def __init__(self, filename: str, fields: List[str]):
+        self.filename = filename
+        self.rows = 0
+        self.columns = [ColumnProfile(field) for field in fields]
+        self.date_min = None
+        self.date_max = None
+        self.south = None
+        self.north = None
+        self.west = None
+        self.east = None
+
+    def add_dates(self, value: str):
+        for part in value.split('/'):
+            part = _normalise_date(part.strip())
+            if part is None:
+                continue
+            if self.date_min is None or part < self.date_min:
+                self.date_min = part
+            if self.date_max is None or part > self.date_max:
+                self.date_max = part
+
+    def add_latitudes(self, values: List[str]):
+        parsed = [v for v in _parse_floats(values) if -90.0 <= v <= 90.0]
+        if parsed:
+            self.south = min(parsed) if self.south is None else min(self.south, min(parsed))
+            self.north = max(parsed) if self.north is None else max(self.north, max(parsed))
+
+    def add_longitudes(self, values: List[str]):
+        parsed = [v for v in _parse_floats(values) if -180.0 <= v <= 180.0]
+        if parsed:
+            self.west = min(parsed) if self.west is None else min(self.west, min(parsed))
+            self.east = max(parsed) if self.east is None else max(self.east, max(parsed))
+
+    def to_dict(self) -> dict:
+        result = {
+            'rows': self.rows,
+            'columns': {column.field: column.to_dict() for column in self.columns}
+        }
+        if self.date_min is not None:
+            result['eventDate'] = {'min': self.date_min, 'max': self.date_max}
+        if self.south is not None and self.west is not None:
+            result['boundingBox'] = {'west': self.west, 'east': self.east, 'south': self.south, 'north': self.north}
+        return result
+
+def profile_table(table) -> TableProfile:
+    """
+    Profile a table in a single pass.
+
+    :param table: The table, with mapped fields
+    :return: The table profile
+    """
+    logger.debug(f"Profiling {table.filename}")
+    names = [_term_name(field) for field in table.fields]
+    date = names.index('eventDate') if 'eventDate' in names else None
+    latitude = names.index('decimalLatitude') if 'decimalLatitude' in names else None
+    longitude = names.index('decimalLongitude') if 'decimalLongitude' in names else None
+    profile = TableProfile(table.filename, table.fields)
+    columns = profile.columns
+    width = len(columns)
+    latitudes = []
+    longitudes = []
+    for line, row in table.records():
+        profile.rows += 1
+        for column, value in zip(columns, row):
+            column.add(value.strip())
+        for column in columns[len(row):width]:
+            column.add('')
+        if date is not None and date < len(row) and row[date]:
+            profile.add_dates(row[date])
+        if latitude is not None and longitude is not None and latitude < len(row) and longitude < len(row):
+            lat = row[latitude].strip()
+            lon = row[longitude].strip()
+            if lat and lon:
+                latitudes.append(lat)
+                longitudes.append(lon)
+                if len(latitudes) >= NUMERIC_BATCH:
+                    profile.add_latitudes(latitudes)
+                    profile.add_longitudes(longitudes)
+                    latitudes = []
+                    longitudes = []
+    profile.add_latitudes(latitudes)
+    profile.add_longitudes(longitudes)
+    return profile
+
+def coverage(profiles: Dict[str, dict]) -> dict:
+    """
+    Combine the date ranges and bounding boxes of a collection of table profiles.
+
+    :param profiles: The table profiles, as produced by TableProfile.to_dict
+    :return: A dictionary with an optional eventDate range and bounding box
+    """
+    result = dict()
+    for profile in profiles.values():
+        dates = profile.get('eventDate')
+        if dates is not None:
+            current = result.setdefault('eventDate', dict(dates))
+            current['min'] = min(current['min'], dates['min'])
+            current['max'] = max(current['max'], dates['max'])
+        box = profile.get('boundingBox')
+        if box is not None:
+            current = result.setdefault('boundingBox', dict(box))
+            current['west'] = min(current['west'], box['west'])
+            current['east'] = max(current['east'], box['east'])
+            current['south'] = min(current['south'], box['south'])
+            current['north'] = max(current['north'], box['north'])
+    return result
@@ -0,0 +1,372 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Reading existing archives.
+The table descriptions in meta.xml are parsed back into parameters and fields, and the core is joined to
+its extensions either by merging tables sorted on the id, or through an on-disk index of extension record offsets.
+"""
+
+import bisect
+import codecs
+import io
+import mmap
+import shutil
+import sys
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from array import array
+from typing import List
+import logging
+
+from .placement import COPY_BUFFER_SIZE
+from .sorting import ExternalSorter, key_hash, DEFAULT_SORT_LIMIT
+
+logger = logging.getLogger("dwca")
+
+"""The namespace of the Darwin Core text guidelines, used by meta.xml"""
+META_NAMESPACE = 'http://rs.tdwg.org/dwc/text/'
+
+"""The maximum number of extension records indexed in memory before the offset index spills to disk"""
+DEFAULT_JOIN_LIMIT = DEFAULT_SORT_LIMIT
+
+"""The number of index entries written to disk at a time"""
+_INDEX_CHUNK = 65536
+
+_PARAMETERS = ('rowType', 'encoding', 'fieldsTerminatedBy', 'linesTerminatedBy', 'fieldsEnclosedBy', 'ignoreHeaderLines')
+
+def _unescape(value: str) -> str:
+    value = value.replace('\\t', '\t')
+    value = value.replace('\\n', '\n')
+    value = value.replace('\\r', '\r')
+    return value
+
+class TableDescription:
+    """
+    The description of a core or extension table from meta.xml.
+    """
+    def __init__(self, core: bool, params: dict, locations: List[str], key: int, fields: List[str]):
+        """
+        :param core: True for the core, False for an extension
+        :param params: The table parameters given in the description, as keyword arguments for TableParameters
+        :param locations: The locations of the table files, relative to the archive
+        :param key: The column of the id (core) or coreid (extension), or None for no key
+        :param fields: The term for each column, with None for any column without a term
+        """
+        self.core = core
+        self.params = params
+        self.locations = locations
+        self.key = key
+        self.fields = fields
+
+def parse_meta(meta: bytes) -> List[TableDescription]:
+    """
+    Parse a meta.xml file into table descriptions.
+    An empty fieldsEnclosedBy is kept as an empty string, meaning the fields are not quoted.
+
+    :param meta: The contents of the meta.xml file
+    :return: The table descriptions, core first
+    """
+    root = ElementTree.fromstring(meta)
+    ns = {'dwc': META_NAMESPACE}
+    descriptions = []
+    for element in root.findall('dwc:core', ns) + root.findall('dwc:extension', ns):
+        core = element.tag == f"{{{META_NAMESPACE}}}core"
+        params = {name: _unescape(element.get(name)) for name in _PARAMETERS if element.get(name) is not None}
+        if 'ignoreHeaderLines' in params:
+            params['ignoreHeaderLines'] = int(params['ignoreHeaderLines'])
+        locations = [location.text.strip() for location in element.findall('dwc:files/dwc:location', ns)]
+        id = element.find('dwc:id' if core else 'dwc:coreid', ns)
+        key = int(id.get('index')) if id is not None and id.get('index') is not None else None
+        terms = dict()
+        for field in element.findall('dwc:field', ns):
+            if field.get('index') is not None:
+                terms[int(field.get('index'))] = field.get('term')
+        fields = [terms.get(i) for i in range(max(terms) + 1)] if terms else []
+        descriptions.append(TableDescription(core, params, locations, key, fields))
+    if len(descriptions) == 0 or not descriptions[0].core:
+        raise ValueError("meta.xml does not describe a core table")
+    return descriptions
+
+def _key(row: List[str], column: int) -> str:
+    return row[column].strip() if column < len(row) else ''
+
+def byte_order(encoding: str, head: bytes):
+    """
+    Find any byte order mark at the start of a table and the codec that decodes, and re-encodes, the text after it.
+    Unicode encodings that may have a byte order mark are given a codec of a fixed byte order, so that encoding
+    part of the text does not add a mark.
+
+    :param encoding: The encoding of the table
+    :param head: The first bytes of the table
+    :return: The byte order mark, or empty bytes, and the codec
+    """
+    name = codecs.lookup(encoding).name
+    if name in ('utf-8', 'utf-8-sig'):
+        return (codecs.BOM_UTF8, 'utf-8') if head.startswith(codecs.BOM_UTF8) else (b'', 'utf-8')
+    if name in ('utf-16', 'utf-32'):
+        for order in ('le', 'be'):
+            bom = getattr(codecs, f"BOM_{name.replace('-', '').upper()}_{order.upper()}")
+            if head.startswith(bom):
+                return bom, f"{name}-{order}"
+        # Without a mark, Python decodes in the native byte order
+        return b'', f"{name}-{'le' if sys.byteorder == 'little' else 'be'}"
+    return b'', name
+
+def _text_lines(src, codec: str):
+    """
+    Decode a binary stream into lines, each ending with its own \\n, \\r\\n or \\r, as the csv reader expects.
+    """
+    text = io.TextIOWrapper(src, encoding=codec, newline='')
+    try:
+        yield from text
+    finally:
+        # Leave the binary stream to its owner, unless it has already been closed
+        if not src.closed:
+            text.detach()
+
+class RawRecords:
+    """
+    Iterate through the data rows of a table along with the raw bytes of each record and the byte offset at which it starts.
+    The table is decoded with its encoding and split into lines at any line ending, so UTF-16 tables and tables
+    with \\r line endings are read correctly. The bytes of a record are found by encoding the lines the reader has
+    consumed again, which gives back the original bytes, so records with quoted line breaks are handled.
+    The raw bytes of any header lines, including any byte order mark, are available as header once iteration has started.
+    The records of a table in several parts are read in order, skipping the header lines of each part, and the offsets
+    are into the parts joined one after another.
+    """
+    def __init__(self, table):
+        self.table = table
+        self.header = None
+
+    def __iter__(self):
+        offset = 0
+        for source in self.table.sources:
+            pending = []
+            with self.table.open_binary(source) as src:
+                bom, codec = byte_order(self.table.params.encoding or 'utf-8', src.peek(4)[:4])
+                src.read(len(bom))
+                def lines():
+                    for line in _text_lines(src, codec):
+                        pending.append(line)
+                        yield line
+                reader = self.table.params.csv_reader(lines())
+                for i in range(self.table.params.ignoreHeaderLines or 0):
+                    next(reader, None)
+                header = bom + ''.join(pending).encode(codec)
+                if self.header is None:
+                    self.header = header
+                pending.clear()
+                offset += len(header)
+                for row in reader:
+                    data = ''.join(pending).encode(codec)
+                    pending.clear()
+                    yield offset, data, row
+                    offset += len(data)
+
+def record_offsets(table):
+    """
+    Iterate through the data rows of a table along with the byte offset at which each row starts.
+
+    :param table: The table
+    :return: An iterator of (offset, row) pairs
+    """
+    for offset, data, row in RawRecords(table):
+        yield offset, row
+
+def is_sorted(table, column: int) -> bool:
+    """
+    Check whether the key values in a table are in ascending order.
+    The scan stops at the first value out of order.
+
+    :param table: The table
+    :param column: The key column
+    :return: True if the table is sorted by the column
+    """
+    last = None
+    for line, row in table.records():
+        key = _key(row, column)
+        if last is not None and key < last:
+            logger.debug(f"{table.filename} is not sorted by column {column} at line {line}")
+            return False
+        last = key
+    return True
+
+class MergeJoin:
+    """
+    Join an extension sorted by coreid to a core sorted by id, reading the extension once alongside the core.
+    """
+    def __init__(self, table, column: int):
+        self.column = column
+        self.records = table.records()
+        self.pending = next(self.records, None)
+
+    def rows(self, key: str) -> List[List[str]]:
+        """
+        Get the extension rows for a core id. Ids must be requested in ascending order.
+
+        :param key: The core id
+        :return: The matching extension rows
+        """
+        result = []
+        while self.pending is not None and _key(self.pending[1], self.column) < key:
+            self.pending = next(self.records, None)
+        while self.pending is not None and _key(self.pending[1], self.column) == key:
+            result.append(self.pending[1])
+            self.pending = next(self.records, None)
+        return result
+
+    def close(self):
+        self.records.close()
+
+class _Entries:
+    """
+    A sequence view of the hashed keys in a flattened array of (key, offset) pairs, for bisect.
+    """
+    def __init__(self, entries):
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries) // 2
+
+    def __getitem__(self, i: int) -> int:
+        return self.entries[2 * i]
+
+class _MappedReader(io.RawIOBase):
+    """
+    A readable file object over a memory-mapped file, starting at an offset, so a record can be decoded in place.
+    """
+    def __init__(self, mapped: mmap.mmap, offset: int):
+        super().__init__()
+        self.mapped = mapped
+        self.position = offset
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.mapped[self.position:self.position + len(buffer)]
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+class OffsetIndex:
+    """
+    Join an extension in any order to the core through an index of the byte offset of each record, by hashed coreid.
+
+    The index is sorted in bounded memory and written to a temporary file, which is memory-mapped along with the
+    extension data, so lookups read only the matching records.
+    Extensions inside a zip archive, compressed or in several parts are extracted to a temporary file first, as they
+    cannot be read at an offset.
+    """
+    def __init__(self, table, column: int, limit: int = DEFAULT_JOIN_LIMIT, tempdir: str = None):
+        self.table = table
+        self.column = column
+        self.index = tempfile.TemporaryFile(dir=tempdir)
+        with ExternalSorter(limit, tempdir) as sorter:
+            for offset, row in record_offsets(table):
+                sorter.add(key_hash(_key(row, column)), offset)
+            buffer = array('Q')
+            for key, offset in sorter:
+                buffer.append(key)
+                buffer.append(offset)
+                if len(buffer) >= 2 * _INDEX_CHUNK:
+                    buffer.tofile(self.index)
+                    buffer = array('Q')
+            buffer.tofile(self.index)
+            self.index.flush()
+            logger.debug(f"Indexed {len(sorter)} records in {table.filename}")
+        if table.placeable:
+            self.data = open(table.path, 'rb')
+        else:
+            self.data = tempfile.TemporaryFile(dir=tempdir)
+            for source in table.sources:
+                with table.open_binary(source) as src:
+                    shutil.copyfileobj(src, self.data, COPY_BUFFER_SIZE)
+            self.data.flush()
+        self.index_map = self._map(self.index)
+        self.data_map = self._map(self.data)
+        # Records are decoded from their offsets, after any byte order mark
+        self.codec = byte_order(table.params.encoding or 'utf-8', self.data_map[:4] if self.data_map is not None else b'')[1]
+        self.entries = _Entries(memoryview(self.index_map).cast('Q') if self.index_map is not None else [])
+
+    @staticmethod
+    def _map(file):
+        file.seek(0, 2)
+        if file.tell() == 0:
+            return None
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read(self, offset: int) -> List[str]:
+        src = io.BufferedReader(_MappedReader(self.data_map, offset))
+        return next(self.table.params.csv_reader(_text_lines(src, self.codec)))
+
+    def rows(self, key: str) -> List[List[str]]:
+        """
+        Get the extension rows for a core id, in file order.
+
+        :param key: The core id
+        :return: The matching extension rows
+        """
+        hashed = key_hash(key)
+        pos = bisect.bisect_left(self.entries, hashed)
+        result = []
+        while pos < len(self.entries) and self.entries[pos] == hashed:
+            row = self._read(self.entries.entries[2 * pos + 1])
+            # Check the key itself, in case of a hash collision
+            if _key(row, self.column) == key:
+                result.append(row)
+            pos += 1
+        return result
+
+    def close(self):
+        if isinstance(self.entries.entries, memoryview):
+            self.entries.entries.release()
+        self.entries = _Entries([])
+        for mapped in (self.index_map, self.data_map):
+            if mapped is not None:
+                mapped.close()
+        self.index_map = None
+        self.data_map = None
+        self.index.close()
+        self.data.close()
+
+def star_join(core, core_column: int, extensions: list, merge: bool = None, limit: int = DEFAULT_JOIN_LIMIT, tempdir: str = None):
+    """
+    Iterate through the core rows, each with the extension rows that refer to it.
+
+    :param core: The core table
+    :param core_column: The id column of the core
+    :param extensions: A list of (table, coreid column) pairs
+    :param merge: Use a merge join for all the extensions; by default a merge join is used where the core and
+        the extension are both sorted by id, and an offset index otherwise
+    :param limit: The maximum number of extension records indexed in memory by an offset index
+    :param tempdir: The directory for temporary index files
+    :return: An iterator of (core row, {extension file name: [extension rows]}) pairs
+    """
+    core_sorted = merge if merge is not None else is_sorted(core, core_column)
+    joins = []
+    try:
+        for table, column in extensions:
+            if merge or (merge is None and core_sorted and is_sorted(table, column)):
+                logger.debug(f"Merge joining {table.filename}")
+                joins.append((table.filename, MergeJoin(table, column)))
+            else:
+                logger.debug(f"Index joining {table.filename}")
+                joins.append((table.filename, OffsetIndex(table, column, limit, tempdir)))
+        for line, row in core.records():
+            key = _key(row, core_column)
+            yield row, {filename: join.rows(key) for filename, join in joins}
+    finally:
+        for filename, join in joins:
+            join.close()
@@ -0,0 +1,85 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Rewriting tables into a single normalised dialect, rather than copying them as they are.
+Values are trimmed, the header is replaced by short term names and columns with no values are dropped.
+"""
+
+import io
+from typing import List, Set
+import logging
+
+logger = logging.getLogger("dwca")
+
+"""The number of rows written at a time"""
+REWRITE_BATCH = 4096
+
+def short_name(term: str) -> str:
+    """
+    Get the short name of a term, the part of the URI after the last / or #.
+
+    :param term: The term URI, or an unmapped column name
+    :return: The short name
+    """
+    return term[max(term.rfind('/'), term.rfind('#')) + 1:]
+
+def empty_columns(table, keep: Set[int] = frozenset()) -> Set[int]:
+    """
+    Find the columns of a table with no non-blank values.
+    The scan stops as soon as every column has a value.
+
+    :param table: The table
+    :param keep: Columns that are never reported as empty
+    :return: The empty columns
+    """
+    empty = set(range(len(table.fields))) - set(keep)
+    for line, row in table.records():
+        if not empty:
+            break
+        for column in [column for column in empty if column < len(row) and row[column].strip()]:
+            empty.discard(column)
+    return empty
+
+def rewrite_table(table, dest, params, keep: Set[int] = frozenset()) -> List[int]:
+    """
+    Rewrite a table in another dialect.
+    The header is replaced by the short names of the table's fields, values are trimmed and empty columns dropped.
+
+    :param table: The source table, with mapped fields
+    :param dest: A writable binary file object
+    :param params: The table parameters of the output
+    :param keep: Columns kept even if they are empty
+    :return: The source columns that were written, in order
+    """
+    empty = empty_columns(table, keep)
+    columns = [column for column in range(len(table.fields)) if column not in empty]
+    if empty:
+        logger.info(f"Dropping empty columns {[table.fields[column] for column in sorted(empty)]} from {table.filename}")
+    output = io.TextIOWrapper(dest, encoding=params.encoding, newline='', write_through=False)
+    try:
+        writer = params.csv_writer(output)
+        writer.writerow([short_name(table.fields[column] or '') for column in columns])
+        batch = []
+        for line, row in table.records():
+            width = len(row)
+            batch.append([row[column].strip() if column < width else '' for column in columns])
+            if len(batch) >= REWRITE_BATCH:
+                writer.writerows(batch)
+                batch = []
+        writer.writerows(batch)
+        output.flush()
+    finally:
+        # Leave the destination open for the caller
+        output.detach()
+    return columns
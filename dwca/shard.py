@@ -0,0 +1,152 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Splitting large tables into several files, so that they can be read in parallel.
+Tables are only split between records, and each shard repeats the header lines, so every shard is
+described by the same table parameters in meta.xml.
+"""
+
+import os
+import re
+from typing import List
+import logging
+
+from .reader import RawRecords
+from .sorting import key_hash
+
+logger = logging.getLogger("dwca")
+
+"""The pattern of shard file names, capturing the table file name without the shard number"""
+_SHARD_NAME = re.compile(r'(.*)-\d{5}(\.[^.]*)?')
+
+def shard_name(filename: str, index: int) -> str:
+    """
+    The file name of a shard of a table, such as occurrence-00001.csv.
+
+    :param filename: The table file name
+    :param index: The shard number
+    :return: The shard file name
+    """
+    base, ext = os.path.splitext(filename)
+    return f"{base}-{index:05d}{ext}"
+
+def sharded_name(names: List[str]) -> str:
+    """
+    The file name of the table that a list of shards were split from, such as occurrence.csv for occurrence-00000.csv
+    and occurrence-00001.csv.
+
+    :param names: The shard file names
+    :return: The table file name, or the first name if the names are not shards of a single table
+    """
+    matches = [_SHARD_NAME.fullmatch(name) for name in names]
+    if all(matches) and len(set(match.groups() for match in matches)) == 1:
+        return matches[0].group(1) + (matches[0].group(2) or '')
+    return names[0]
+
+class Sharding:
+    """
+    How tables are split into shards: either a new shard is started when the current one reaches a number of rows
+    or a size in bytes (whichever comes first), or rows are divided into a fixed number of shards by the hash of
+    their id or coreid, so that rows for the same core record end up in the same numbered shard of every table.
+    """
+    def __init__(self, rows: int = None, size: int = None, keys: int = None):
+        """
+        :param rows: The maximum number of rows in a shard
+        :param size: The maximum size of a shard in bytes; a single record larger than this gets a shard of its own
+        :param keys: The number of shards to divide rows into by key
+        """
+        if keys is not None and (rows is not None or size is not None):
+            raise ValueError("Shard either by rows and size or by key, not both")
+        if rows is None and size is None and keys is None:
+            raise ValueError("Shard by rows, size or key")
+        for name, value in (('rows', rows), ('size', size), ('keys', keys)):
+            if value is not None and value < 1:
+                raise ValueError(f"The shard {name} must be at least 1")
+        self.rows = rows
+        self.size = size
+        self.keys = keys
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    def __str__(self):
+        if self.keys is not None:
+            return f"Sharding(keys={self.keys})"
+        return f"Sharding(rows={self.rows}, size={self.size})"
+
+def _shard_sequential(records: RawRecords, open_shard, filename: str, sharding: Sharding) -> List[str]:
+    names = []
+    current = None
+    rows = 0
+    size = 0
+    try:
+        for offset, data, row in records:
+            if current is None or \
+                    (sharding.rows is not None and rows >= sharding.rows) or \
+                    (sharding.size is not None and rows > 0 and size + len(data) > sharding.size):
+                if current is not None:
+                    current.close()
+                names.append(shard_name(filename, len(names)))
+                current = open_shard(names[-1])
+                current.write(records.header)
+                rows = 0
+                size = len(records.header)
+            current.write(data)
+            rows += 1
+            size += len(data)
+    finally:
+        if current is not None:
+            current.close()
+    return names
+
+def _shard_keys(records: RawRecords, open_shard, filename: str, shards: int, key_column: int) -> List[str]:
+    outputs = [None] * shards
+    try:
+        for offset, data, row in records:
+            key = row[key_column].strip() if key_column < len(row) else ''
+            index = key_hash(key) % shards
+            if outputs[index] is None:
+                outputs[index] = open_shard(shard_name(filename, index))
+                outputs[index].write(records.header)
+            outputs[index].write(data)
+    finally:
+        for output in outputs:
+            if output is not None:
+                output.close()
+    return [shard_name(filename, index) for index in range(shards) if outputs[index] is not None]
+
+def shard_table(table, open_shard, sharding: Sharding, key_column: int = None) -> List[str]:
+    """
+    Split a table into shards, copying the raw bytes of each record.
+    Shards without any rows are not written, apart from a single header-only shard for an empty table.
+
+    :param table: The table
+    :param open_shard: A function that takes a shard file name and returns a writable binary file object
+    :param sharding: How to shard the table
+    :param key_column: The id or coreid column, needed when sharding by key
+    :return: The names of the shards written, in order
+    """
+    records = RawRecords(table)
+    if sharding.keys is not None:
+        if key_column is None:
+            raise ValueError(f"{table.filename} has no id or coreid to shard by")
+        names = _shard_keys(records, open_shard, table.filename, sharding.keys, key_column)
+    else:
+        names = _shard_sequential(records, open_shard, table.filename, sharding)
+    if len(names) == 0:
+        names.append(shard_name(table.filename, 0))
+        with open_shard(names[0]) as output:
+            output.write(records.header)
+    logger.debug(f"Split {table.filename} into {len(names)} shards")
+    return names
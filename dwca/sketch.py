@@ -0,0 +1,78 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Fixed-size probabilistic summaries of large streams of values.
+Values are added as the 64-bit hashes produced by dwca.sorting.key_hash.
+"""
+
+import math
+
+_MASK64 = (1 << 64) - 1
+
+class HyperLogLog:
+    """
+    A HyperLogLog cardinality estimator.
+    Uses 2^precision one-byte registers, with a standard error of about 1.04/sqrt(2^precision).
+    """
+    def __init__(self, precision: int = 12):
+        if precision < 4 or precision > 16:
+            raise ValueError(f"Precision {precision} is not between 4 and 16")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, hashed: int):
+        index = hashed >> (64 - self.precision)
+        rest = (hashed << self.precision) & _MASK64
+        rank = 64 - self.precision + 1 if rest == 0 else 64 - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Unable to merge sketches with different precisions")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros > 0:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+class BloomFilter:
+    """
+    A Bloom filter for set membership with no false negatives and a bounded rate of false positives.
+    """
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.bits / capacity * math.log(2))))
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, hashed: int):
+        # Double hashing, deriving the k positions from the two halves of the 64-bit hash
+        h1 = hashed & 0xffffffff
+        h2 = (hashed >> 32) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, hashed: int):
+        for pos in self._positions(hashed):
+            self.array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, hashed: int) -> bool:
+        return all(self.array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(hashed))
@@ -0,0 +1,107 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Detect the encoding and dialect of a table from a fixed-size sample at the start of the file.
+"""
+
+import codecs
+import csv
+import logging
+
+from .compression import open_input
+
+logger = logging.getLogger("dwca")
+
+"""The number of bytes read from the start of a file when sniffing"""
+DEFAULT_SAMPLE_SIZE = 65536
+
+"""The delimiters considered when sniffing"""
+DELIMITERS = ',\t;|'
+
+"""Byte order marks, longest first so that UTF-32 is not mistaken for UTF-16"""
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'UTF-32'),
+    (codecs.BOM_UTF32_BE, 'UTF-32'),
+    (codecs.BOM_UTF8, 'UTF-8'),
+    (codecs.BOM_UTF16_LE, 'UTF-16'),
+    (codecs.BOM_UTF16_BE, 'UTF-16')
+]
+
+def detect_encoding(sample: bytes):
+    """
+    Guess the encoding of a sample of bytes.
+
+    :param sample: The sample, which may end part-way through a character
+    :return: A (encoding, has BOM) pair
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding, True
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'UTF-8', False
+    except UnicodeDecodeError:
+        pass
+    if any(0x80 <= b <= 0x9f for b in sample):
+        return 'windows-1252', False
+    return 'ISO-8859-1', False
+
+def detect_line_terminator(text: str):
+    crlf = text.count('\r\n')
+    lf = text.count('\n') - crlf
+    cr = text.count('\r') - crlf
+    if crlf == 0 and lf == 0 and cr == 0:
+        return None
+    counts = [(crlf, '\r\n'), (lf, '\n'), (cr, '\r')]
+    return max(counts, key=lambda c: c[0])[1]
+
+def sniff(path: str, sample_size: int = DEFAULT_SAMPLE_SIZE, compression: str = None) -> dict:
+    """
+    Detect the encoding, delimiter, quote character and line terminator of a table.
+    Only the first sample_size bytes of the file (after any decompression) are read.
+
+    :param path: The table file
+    :param sample_size: The number of bytes to sample
+    :param compression: The compression of the file, if any
+    :return: A dictionary of the detected TableParameters values; anything that could not be detected is omitted
+    """
+    with open_input(path, compression) as src:
+        sample = src.read(sample_size)
+    return sniff_sample(sample, path)
+
+def sniff_sample(sample: bytes, name: str = 'sample') -> dict:
+    detected = dict()
+    if len(sample) == 0:
+        return detected
+    encoding, bom = detect_encoding(sample)
+    detected['encoding'] = encoding
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=False)
+    if text.startswith('\ufeff'):
+        text = text[1:]
+    terminator = detect_line_terminator(text)
+    if terminator is not None:
+        detected['linesTerminatedBy'] = terminator
+        # Only sniff complete lines
+        last = text.rfind(terminator)
+        if last > 0:
+            text = text[:last]
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=DELIMITERS)
+        detected['fieldsTerminatedBy'] = dialect.delimiter
+        if dialect.quotechar and dialect.quotechar in text:
+            detected['fieldsEnclosedBy'] = dialect.quotechar
+    except csv.Error as err:
+        logger.debug(f"Unable to detect the dialect of {name}: {err}")
+    logger.debug(f"Detected {detected} for {name}{' with a byte order mark' if bom else ''}")
+    return detected
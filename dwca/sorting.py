@@ -0,0 +1,148 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Compact hashing and bounded-memory sorting of keys.
+Keys are hashed to 64-bit integers and held in arrays, rather than as python strings,
+and sorted runs are spilled to disk when there are more keys than a configurable limit.
+"""
+
+import hashlib
+import heapq
+import tempfile
+from array import array
+from itertools import chain
+import logging
+
+logger = logging.getLogger("dwca")
+
+"""
+The approximate peak memory, in bytes, used by each entry held in memory by an ExternalSorter with payloads:
+16 bytes in the buffer array, and a 128-bit integer combining the key and payload, with its slot in a list, while
+the buffer is sorted. Entries without payloads take about 64 bytes.
+"""
+ENTRY_BYTES = 88
+
+"""The default memory budget for sorting, in bytes"""
+DEFAULT_SORT_MEMORY = 128 * 1024 * 1024
+
+"""The default maximum number of entries held in memory before spilling to disk, about 1.5 million for the default budget"""
+DEFAULT_SORT_LIMIT = DEFAULT_SORT_MEMORY // ENTRY_BYTES
+
+"""The number of entries read from a run on disk at a time"""
+_RUN_CHUNK = 65536
+
+_MASK = (1 << 64) - 1
+
+def key_hash(value: str) -> int:
+    """
+    Hash a key value to a 64-bit integer.
+    The hash is stable between runs and processes, unlike the built-in hash.
+
+    :param value: The key value
+    :return: The hash
+    """
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class ExternalSorter:
+    """
+    Sort (key, payload) pairs of unsigned 64-bit integers, or keys alone, in bounded memory.
+
+    Entries are buffered in an array until the limit is reached, at which point the buffer is
+    sorted and written to a temporary file as a run.
+    Python sorts lists of objects, so while the buffer is sorted each pair is held as a single integer,
+    key then payload, rather than as a tuple. The peak memory is about ENTRY_BYTES for each entry in the buffer.
+    Iterating through the sorter yields the entries in order, merging any runs on disk.
+    """
+    def __init__(self, limit: int = DEFAULT_SORT_LIMIT, tempdir: str = None, payloads: bool = True):
+        """
+        :param limit: The maximum number of entries held in memory
+        :param tempdir: The directory for runs spilled to disk
+        :param payloads: Sort (key, payload) pairs; if False, keys are sorted and yielded alone
+        """
+        self.limit = limit
+        self.tempdir = tempdir
+        self.width = 2 if payloads else 1
+        self.buffer = array('Q')
+        self.runs = []
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def spilled(self) -> bool:
+        return len(self.runs) > 0
+
+    def add(self, key: int, payload: int = 0):
+        self.buffer.append(key)
+        if self.width == 2:
+            self.buffer.append(payload)
+        self.count += 1
+        if len(self.buffer) >= self.width * self.limit:
+            self._spill()
+
+    def _sort_buffer(self):
+        if self.width == 1:
+            values = sorted(self.buffer)
+            self.buffer = None
+            self.buffer = array('Q', values)
+            return
+        values = [(key << 64) | payload for key, payload in zip(self.buffer[0::2], self.buffer[1::2])]
+        self.buffer = None
+        values.sort()
+        self.buffer = array('Q', chain.from_iterable((value >> 64, value & _MASK) for value in values))
+
+    def _entries(self, chunk: array):
+        if self.width == 1:
+            return iter(chunk)
+        return zip(chunk[0::2], chunk[1::2])
+
+    def _spill(self):
+        self._sort_buffer()
+        run = tempfile.TemporaryFile(dir=self.tempdir)
+        self.buffer.tofile(run)
+        run.flush()
+        self.runs.append(run)
+        logger.debug(f"Spilled run {len(self.runs)} of {len(self.buffer) // self.width} entries to disk")
+        self.buffer = array('Q')
+
+    def _read_run(self, run):
+        run.seek(0)
+        while True:
+            chunk = array('Q')
+            chunk.frombytes(run.read(_RUN_CHUNK * chunk.itemsize * self.width))
+            if len(chunk) == 0:
+                return
+            yield from self._entries(chunk)
+
+    def __iter__(self):
+        if not self.runs:
+            # Keep the sorted buffer, so that the sorter can be iterated more than once
+            self._sort_buffer()
+            return self._entries(self.buffer)
+        if len(self.buffer) > 0:
+            self._spill()
+        return heapq.merge(*[self._read_run(run) for run in self.runs])
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+        self.buffer = array('Q')
@@ -0,0 +1,174 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Split a denormalised flat file, where the event columns are repeated on every occurrence row,
+into an event core with occurrence and measurement or fact extensions.
+"""
+
+import csv
+import os
+import tempfile
+from typing import List
+import logging
+
+from . import TableParameters, Table, DwCA, _TERMS, _ROW_TYPES
+from .sorting import ExternalSorter, key_hash, DEFAULT_SORT_LIMIT
+
+logger = logging.getLogger("dwca")
+
+EVENT = 'http://rs.tdwg.org/dwc/terms/Event'
+OCCURRENCE = 'http://rs.tdwg.org/dwc/terms/Occurrence'
+MEASUREMENT_OR_FACT = 'http://rs.tdwg.org/dwc/terms/MeasurementOrFact'
+
+EVENT_ID = 'http://rs.tdwg.org/dwc/terms/eventID'
+OCCURRENCE_ID = 'http://rs.tdwg.org/dwc/terms/occurrenceID'
+
+"""The parameters of the files written by the splitter"""
+SPLIT_PARAMS = TableParameters(encoding='UTF-8', fieldsTerminatedBy=',', linesTerminatedBy='\n', fieldsEnclosedBy='"', ignoreHeaderLines=1)
+
+class _Deduplicator:
+    """
+    Write the first row seen for each key.
+
+    The hashes of seen keys are held in memory up to a limit.
+    After that, rows with new keys are spilled to a temporary file and
+    deduplicated at the end with an external sort, keeping their original order.
+    """
+    def __init__(self, writer, limit: int):
+        self.writer = writer
+        self.limit = limit
+        self.seen = set()
+        self.spill = None
+        self.spill_writer = None
+        self.sorter = None
+        self.sequence = 0
+        self.written = 0
+
+    def add(self, key: str, row: List[str]):
+        hashed = key_hash(key)
+        if hashed in self.seen:
+            return
+        if len(self.seen) < self.limit:
+            self.seen.add(hashed)
+            self.writer.writerow(row)
+            self.written += 1
+            return
+        if self.spill is None:
+            logger.debug(f"More than {self.limit} keys, spilling to disk")
+            self.spill = tempfile.TemporaryFile('w+', encoding='utf-8', newline='')
+            self.spill_writer = csv.writer(self.spill, lineterminator='\n')
+            self.sorter = ExternalSorter(self.limit)
+        self.spill_writer.writerow(row)
+        self.sorter.add(hashed, self.sequence)
+        self.sequence += 1
+
+    def finish(self):
+        if self.spill is None:
+            return
+        with self.sorter, ExternalSorter(self.limit, payloads=False) as keep:
+            last = None
+            for hashed, sequence in self.sorter:
+                if hashed != last:
+                    keep.add(sequence)
+                    last = hashed
+            wanted = iter(keep)
+            following = next(wanted, None)
+            self.spill.seek(0)
+            for sequence, row in enumerate(csv.reader(self.spill)):
+                if following is not None and sequence == following:
+                    self.writer.writerow(row)
+                    self.written += 1
+                    following = next(wanted, None)
+        self.spill.close()
+
+class _Output:
+    def __init__(self, path: str, header: List[str], columns: List[int], content: List[int], key: int = None, limit: int = DEFAULT_SORT_LIMIT):
+        self.path = path
+        self.columns = columns
+        self.content = content
+        self.key = key
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file, lineterminator='\n')
+        self.writer.writerow([header[i] for i in columns])
+        self.deduplicator = _Deduplicator(self.writer, limit) if key is not None else None
+        self.written = 0
+
+    @property
+    def rows(self) -> int:
+        return self.written + (self.deduplicator.written if self.deduplicator is not None else 0)
+
+    def add(self, row: List[str]):
+        if not any(i < len(row) and row[i].strip() for i in self.content):
+            return
+        values = [row[i] if i < len(row) else '' for i in self.columns]
+        if self.deduplicator is not None and self.key < len(row) and row[self.key].strip():
+            self.deduplicator.add(row[self.key].strip(), values)
+        else:
+            self.writer.writerow(values)
+            self.written += 1
+
+    def close(self):
+        if self.deduplicator is not None:
+            self.deduplicator.finish()
+        self.file.close()
+
+def split(source, destpath: str, defaultParams: TableParameters, limit: int = DEFAULT_SORT_LIMIT, workers: int = 1) -> DwCA:
+    """
+    Split a flat file into an event core and occurrence and measurement or fact extensions.
+
+    Each column is assigned to a row type using the terms table; columns without a row type go to the occurrences.
+    An occurrence is only written for a row that has a value in a column that is explicitly an occurrence term.
+    Events are deduplicated by eventID and, when there are measurements, occurrences by occurrenceID.
+    The file is read once, in a single streaming pass.
+
+    :param source: The flat file, either a path or a Table whose parameters (after any sniffing) are used as they are
+    :param destpath: The directory to write the split files to
+    :param defaultParams: The default parameters for reading a flat file given as a path, and for the split files
+    :param limit: The maximum number of keys held in memory per table before spilling to disk
+    :param workers: The number of workers for the resulting archive
+    :return: An archive made from the split files
+    """
+    if not isinstance(source, Table):
+        source = Table(source, defaultParams)
+    with source.open() as csvfile:
+        header = next(source.params.csv_reader(csvfile))
+    terms = [_TERMS.get(column, column) for column in header]
+    row_types = [_ROW_TYPES.get(term, OCCURRENCE) for term in terms]
+    if EVENT_ID not in terms:
+        raise ValueError(f"{source.filename} has no eventID column to split on")
+    event_id = terms.index(EVENT_ID)
+    occurrence_id = terms.index(OCCURRENCE_ID) if OCCURRENCE_ID in terms else None
+    events = [i for i, row_type in enumerate(row_types) if row_type == EVENT]
+    occurrences = [i for i, row_type in enumerate(row_types) if row_type == OCCURRENCE]
+    measurements = [i for i, row_type in enumerate(row_types) if row_type == MEASUREMENT_OR_FACT]
+    logger.debug(f"Splitting {source.filename} into {len(events)} event, {len(occurrences)} occurrence and {len(measurements)} measurement columns")
+    outputs = [_Output(os.path.join(destpath, 'event.csv'), header, events, events, event_id, limit)]
+    if occurrences:
+        key = occurrence_id if measurements and occurrence_id is not None else None
+        content = [i for i in occurrences if _ROW_TYPES.get(terms[i]) == OCCURRENCE] or occurrences
+        outputs.append(_Output(os.path.join(destpath, 'occurrence.csv'), header, [event_id] + occurrences, content, key, limit))
+    if measurements:
+        links = [event_id] + ([occurrence_id] if occurrence_id is not None else [])
+        outputs.append(_Output(os.path.join(destpath, 'measurementorfact.csv'), header, links + measurements, measurements))
+    try:
+        for line, row in source.records():
+            for output in outputs:
+                output.add(row)
+    finally:
+        for output in outputs:
+            output.close()
+    for output in outputs:
+        logger.info(f"Wrote {output.rows} rows to {output.path}")
+    params = SPLIT_PARAMS.merge(defaultParams)
+    return DwCA(*[Table(output.path, params) for output in outputs], workers=workers)
@@ -0,0 +1,166 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Generate synthetic event core archives of arbitrary size, for benchmarking.
+"""
+
+import csv
+import datetime
+import os
+import random
+from typing import List
+
+"""The base columns for each kind of table"""
+TABLE_COLUMNS = {
+    'event': ['eventID', 'parentEventID', 'eventType', 'eventDate', 'decimalLatitude', 'decimalLongitude', 'locality', 'eventRemarks'],
+    'occurrence': ['eventID', 'occurrenceID', 'basisOfRecord', 'scientificName', 'individualCount', 'occurrenceStatus', 'occurrenceRemarks'],
+    'measurementorfact': ['eventID', 'occurrenceID', 'measurementID', 'measurementType', 'measurementValue', 'measurementUnit', 'measurementRemarks'],
+    'multimedia': ['eventID', 'occurrenceID', 'type', 'format', 'identifier', 'title', 'description']
+}
+
+"""The number of rows in each kind of table, relative to the number of occurrences"""
+TABLE_RATIOS = {
+    'event': 0.1,
+    'occurrence': 1.0,
+    'measurementorfact': 2.0,
+    'multimedia': 0.25
+}
+
+_NAMES = ['Acacia longifolia', 'Eucalyptus regnans', 'Banksia serrata', 'Grevillea robusta', 'Callistemon citrinus', 'Hakea sericea']
+_PLACES = ['Mérimbula', 'Lake Eyre', 'Kosciuszko', 'Ōtautahi', 'Bégà', 'Alice Springs']
+_REMARKS = ['Observed at dawn', 'Windy, "light" rain', 'Sample taken, see notes', 'Multiple\nline remark', 'None']
+
+class _Generator:
+    def __init__(self, rows: int, events: int, delimiter: str, quoting: float, seed: int):
+        self.random = random.Random(seed)
+        self.rows = rows
+        self.events = max(1, events)
+        self.delimiter = delimiter
+        self.quoting = quoting
+        self.start = datetime.date(2000, 1, 1)
+
+    def text(self, values: List[str]) -> str:
+        # Values that need quoting contain the delimiter, a quote or a newline
+        if self.random.random() < self.quoting:
+            return self.random.choice(values) + self.delimiter + ' "extra"'
+        return self.random.choice(values).replace('\n', ' ').replace('"', '')
+
+    def event(self, i: int) -> List[str]:
+        return [
+            f"E{i}",
+            f"E{i // 10}" if i >= 10 else '',
+            'Survey' if i < 10 else 'Sample',
+            (self.start + datetime.timedelta(days=i % 7000)).isoformat(),
+            f"{-10.0 - self.random.random() * 30.0:.5f}",
+            f"{115.0 + self.random.random() * 35.0:.5f}",
+            self.text(_PLACES),
+            self.text(_REMARKS)
+        ]
+
+    def occurrence(self, i: int) -> List[str]:
+        return [
+            f"E{i % self.events}",
+            f"O{i}",
+            'HumanObservation',
+            self.random.choice(_NAMES),
+            str(self.random.randint(1, 50)),
+            'present',
+            self.text(_REMARKS)
+        ]
+
+    def measurementorfact(self, i: int) -> List[str]:
+        occurrence = i // 2
+        return [
+            f"E{occurrence % self.events}",
+            f"O{occurrence}",
+            f"M{i}",
+            self.random.choice(['height', 'weight', 'width']),
+            f"{self.random.random() * 100.0:.2f}",
+            self.random.choice(['cm', 'g', 'mm']),
+            self.text(_REMARKS)
+        ]
+
+    def multimedia(self, i: int) -> List[str]:
+        occurrence = i * 4
+        return [
+            f"E{occurrence % self.events}",
+            f"O{occurrence}",
+            'StillImage',
+            'image/jpeg',
+            f"https://example.org/images/{i}.jpg",
+            self.text(_NAMES),
+            self.text(_REMARKS)
+        ]
+
+def table_filename(kind: str, delimiter: str) -> str:
+    """
+    The file name for a kind of table, using a suffix that files.csv associates with the delimiter.
+    """
+    return kind + ('.txt' if delimiter == '\t' else '.csv')
+
+def generate_table(path: str, kind: str, rows: int, columns: int = 0, delimiter: str = ',', quoting: float = 0.0, encoding: str = 'UTF-8', events: int = None, seed: int = 0) -> int:
+    """
+    Write a synthetic table.
+
+    :param path: The file to write
+    :param kind: The kind of table, one of TABLE_COLUMNS
+    :param rows: The number of data rows
+    :param columns: The total number of columns; extra columns are added after the base columns
+    :param delimiter: The field delimiter
+    :param quoting: The fraction of free-text values that need quoting
+    :param encoding: The file encoding
+    :param events: The number of events that rows refer to
+    :param seed: The random seed
+    :return: The size of the resulting file in bytes
+    """
+    header = list(TABLE_COLUMNS[kind])
+    extra = max(0, columns - len(header))
+    header.extend(f"field{i + 1}" for i in range(extra))
+    events = events if events is not None else max(1, int(rows * TABLE_RATIOS['event']))
+    generator = _Generator(rows, events, delimiter, quoting, seed)
+    make_row = getattr(generator, kind)
+    with open(path, 'w', encoding=encoding, errors='replace', newline='') as dest:
+        writer = csv.writer(dest, delimiter=delimiter, quotechar='"', lineterminator='\n')
+        writer.writerow(header)
+        batch = []
+        for i in range(rows):
+            row = make_row(i)
+            if extra > 0:
+                row.extend(str(generator.random.randint(0, 99999)) for j in range(extra))
+            batch.append(row)
+            if len(batch) >= 10000:
+                writer.writerows(batch)
+                batch = []
+        writer.writerows(batch)
+    return os.path.getsize(path)
+
+def generate_archive(directory: str, rows: int, kinds: List[str] = None, columns: int = 0, delimiter: str = ',', quoting: float = 0.0, encoding: str = 'UTF-8', seed: int = 0) -> List[str]:
+    """
+    Write a synthetic event core and extensions.
+    The number of rows in each table is scaled from the number of occurrences using TABLE_RATIOS.
+
+    :param directory: The directory to write to
+    :param rows: The number of occurrence rows
+    :param kinds: The kinds of table, with the core first (defaults to all of them)
+    :return: The paths of the generated tables, in the same order as the kinds
+    """
+    kinds = kinds if kinds is not None else list(TABLE_COLUMNS.keys())
+    events = max(1, int(rows * TABLE_RATIOS['event']))
+    paths = []
+    for kind in kinds:
+        path = os.path.join(directory, table_filename(kind, delimiter))
+        count = max(1, int(rows * TABLE_RATIOS[kind]))
+        generate_table(path, kind, count, columns, delimiter, quoting, encoding, events, seed)
+        paths.append(path)
+    return paths
@@ -0,0 +1,204 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Referential integrity checks between the core id and the extension coreids.
+"""
+
+import bisect
+import os
+import tempfile
+from array import array
+from typing import List
+import logging
+
+from .sorting import ExternalSorter, key_hash, DEFAULT_SORT_LIMIT
+
+logger = logging.getLogger("dwca")
+
+"""The default maximum number of core ids to index in memory"""
+DEFAULT_INDEX_LIMIT = DEFAULT_SORT_LIMIT
+
+"""The number of example lines kept for each problem"""
+SAMPLE_SIZE = 10
+
+class ValidationProblem:
+    """
+    A problem found in a table, with the number of times it occurs and some example line numbers.
+    """
+    def __init__(self, table: str, problem: str):
+        self.table = table
+        self.problem = problem
+        self.count = 0
+        self.lines = []
+
+    def add(self, line: int):
+        self.count += 1
+        if len(self.lines) < SAMPLE_SIZE:
+            self.lines.append(line)
+
+    def __str__(self):
+        lines = ', '.join(str(line) for line in sorted(self.lines))
+        more = ', ...' if self.count > len(self.lines) else ''
+        return f"{self.table}: {self.count} {self.problem} (lines {lines}{more})"
+
+class ValidationReport:
+    """
+    The collected problems from validating an archive.
+    """
+    def __init__(self):
+        self.problems: List[ValidationProblem] = list()
+
+    def add(self, problem: ValidationProblem):
+        if problem.count > 0:
+            self.problems.append(problem)
+
+    def extend(self, other):
+        self.problems.extend(other.problems)
+
+    @property
+    def valid(self) -> bool:
+        return len(self.problems) == 0
+
+    def __str__(self):
+        if self.valid:
+            return "No problems found"
+        return '\n'.join(str(problem) for problem in self.problems)
+
+class KeyIndex:
+    """
+    An index of the distinct hashed key values in a core table.
+
+    Small indexes are held in memory as a sorted array of 64-bit hashes and searched directly.
+    Larger ones are written to a sorted file, which is merged against sorted extension keys.
+    """
+    def __init__(self, keys: array = None, path: str = None):
+        self.keys = keys
+        self.path = path
+
+    @property
+    def in_memory(self) -> bool:
+        return self.keys is not None
+
+    def __contains__(self, key: int) -> bool:
+        pos = bisect.bisect_left(self.keys, key)
+        return pos < len(self.keys) and self.keys[pos] == key
+
+    def __iter__(self):
+        if self.in_memory:
+            yield from self.keys
+            return
+        with open(self.path, 'rb') as index:
+            while True:
+                chunk = array('Q')
+                chunk.frombytes(index.read(65536 * chunk.itemsize))
+                if len(chunk) == 0:
+                    return
+                yield from chunk
+
+    def close(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+        self.keys = None
+
+def _keys(table, column: int):
+    for line, row in table.records():
+        yield line, row[column].strip() if column < len(row) else ''
+
+def index_core(table, field: str, limit: int = DEFAULT_INDEX_LIMIT, report: ValidationReport = None) -> KeyIndex:
+    """
+    Build an index of the id values of a core table, noting empty and duplicate ids.
+
+    :param table: The core table
+    :param field: The id field
+    :param limit: The maximum number of ids to hold in memory
+    :param report: The report to add problems to
+    :return: The resulting index
+    """
+    column = table.fields.index(field)
+    empty = ValidationProblem(table.filename, 'empty ids')
+    duplicates = ValidationProblem(table.filename, 'duplicate ids')
+    with ExternalSorter(limit) as sorter:
+        for line, key in _keys(table, column):
+            if not key:
+                empty.add(line)
+            else:
+                sorter.add(key_hash(key), line)
+        if sorter.spilled:
+            logger.debug(f"Core index for {table.filename} spilled to disk")
+            fd, path = tempfile.mkstemp(suffix='.idx')
+            index = KeyIndex(path=path)
+            keys = array('Q')
+            with os.fdopen(fd, 'wb') as out:
+                for key in _distinct(sorter, duplicates):
+                    keys.append(key)
+                    if len(keys) >= 65536:
+                        keys.tofile(out)
+                        keys = array('Q')
+                keys.tofile(out)
+        else:
+            index = KeyIndex(keys=array('Q', _distinct(sorter, duplicates)))
+    if report is not None:
+        report.add(empty)
+        report.add(duplicates)
+    return index
+
+def _distinct(pairs, duplicates: ValidationProblem):
+    last = None
+    for key, line in pairs:
+        if key == last:
+            duplicates.add(line)
+        else:
+            yield key
+            last = key
+
+def check_extension(table, field: str, index: KeyIndex, limit: int = DEFAULT_INDEX_LIMIT, report: ValidationReport = None):
+    """
+    Check that every coreid in an extension refers to an id in the core.
+
+    :param table: The extension table
+    :param field: The coreid field
+    :param index: The index of core ids
+    :param limit: The maximum number of coreids to hold in memory when merging against an on-disk index
+    :param report: The report to add problems to
+    :return: The report
+    """
+    column = table.fields.index(field)
+    if report is None:
+        report = ValidationReport()
+    empty = ValidationProblem(table.filename, 'empty coreids')
+    orphans = ValidationProblem(table.filename, 'orphan coreids')
+    if index.in_memory:
+        for line, key in _keys(table, column):
+            if not key:
+                empty.add(line)
+            elif key_hash(key) not in index:
+                orphans.add(line)
+    else:
+        with ExternalSorter(limit) as sorter:
+            for line, key in _keys(table, column):
+                if not key:
+                    empty.add(line)
+                else:
+                    sorter.add(key_hash(key), line)
+            core = iter(index)
+            current = next(core, None)
+            for key, line in sorter:
+                while current is not None and current < key:
+                    current = next(core, None)
+                if current != key:
+                    orphans.add(line)
+    report.add(empty)
+    report.add(orphans)
+    return report
@@ -0,0 +1,91 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from dwca import TableParameters
+from dwca.batch import Dataset, read_manifest, build_all, summary, OK, FAILED, INVALID
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        shutil.copy('event.csv', self.temp)
+        shutil.copy('occurrence.csv', self.temp)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def path(self, name):
+        return os.path.join(self.temp, name)
+
+    def testReadManifest1(self):
+        with open(self.path('datasets.csv'), 'w') as manifest:
+            manifest.write('output,files,title,creator\nout/a,event.csv; occurrence.csv,Dataset A,Someone\nout/b,occurrence.csv,,\n')
+        datasets = read_manifest(self.path('datasets.csv'))
+        self.assertEqual(2, len(datasets))
+        self.assertEqual(self.path('out/a'), datasets[0].output)
+        self.assertEqual([self.path('event.csv'), self.path('occurrence.csv')], datasets[0].files)
+        self.assertEqual('Dataset A', datasets[0].title)
+        self.assertIsNone(datasets[1].title)
+
+    def testReadManifest2(self):
+        with open(self.path('datasets.json'), 'w') as manifest:
+            json.dump([{'output': 'out/a', 'files': ['event.csv', 'occurrence.csv'], 'creator': 'Someone'}], manifest)
+        datasets = read_manifest(self.path('datasets.json'))
+        self.assertEqual([self.path('event.csv'), self.path('occurrence.csv')], datasets[0].files)
+        self.assertEqual('Someone', datasets[0].creator)
+        with open(self.path('datasets.json'), 'w') as manifest:
+            json.dump([{'output': 'out/a', 'files': []}], manifest)
+        with self.assertRaises(ValueError):
+            read_manifest(self.path('datasets.json'))
+
+    def testBuildAll1(self):
+        datasets = [
+            Dataset(self.path('out/a'), [self.path('event.csv'), self.path('occurrence.csv')], 'Dataset A'),
+            Dataset(self.path('out/b'), [self.path('missing.csv')]),
+            Dataset(self.path('out/c'), [self.path('occurrence.csv')])
+        ]
+        with self.assertLogs('dwca', 'ERROR'):
+            serial = build_all(datasets, DEFAULT_PARAMS, force=True)
+        # Errors in the worker processes are logged there, rather than here
+        parallel = build_all(datasets, DEFAULT_PARAMS, 2, force=True)
+        for results in (serial, parallel):
+            self.assertEqual([OK, FAILED, OK], [result.status for result in results])
+            self.assertIn('missing.csv', results[1].error)
+            self.assertTrue(os.path.exists(self.path('out/a/meta.xml')))
+            self.assertTrue(os.path.exists(self.path('out/c/occurrence.csv')))
+            with open(self.path('out/a/eml.xml')) as eml:
+                self.assertIn('Dataset A', eml.read())
+        table = summary(results)
+        self.assertIn(self.path('out/b'), table)
+        self.assertIn('3 datasets, 2 built, 1 not built', table)
+
+    def testBuildAll2(self):
+        with open(self.path('orphan.csv'), 'w') as orphans:
+            orphans.write('eventID,occurrenceID\n9,1\n')
+        datasets = [
+            Dataset(self.path('out/a'), [self.path('event.csv'), self.path('occurrence.csv')]),
+            Dataset(self.path('out/b'), [self.path('event.csv'), self.path('orphan.csv')])
+        ]
+        results = build_all(datasets, DEFAULT_PARAMS, zip=True, validate=True)
+        self.assertEqual([OK, INVALID], [result.status for result in results])
+        self.assertIn('orphan coreids', results[1].error)
+        self.assertTrue(zipfile.is_zipfile(self.path('out/a.zip')))
+        self.assertFalse(os.path.exists(self.path('out/b.zip')))
@@ -0,0 +1,132 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from dwca import TableParameters, Table, DwCA, Sharding
+from dwca.checksum import SHA256, MD5, HashingWriter, checksum_name, read_checksums, verify_checksums
+from dwca.placement import HARDLINK
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class ChecksumTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.output = os.path.join(self.temp, 'output')
+        os.mkdir(self.output)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def archive(self, compress=False):
+        shutil.copy('event.csv', self.temp)
+        if compress:
+            with open('occurrence.csv', 'rb') as src, gzip.open(os.path.join(self.temp, 'occurrence.csv.gz'), 'wb') as dest:
+                shutil.copyfileobj(src, dest)
+            occurrences = os.path.join(self.temp, 'occurrence.csv.gz')
+        else:
+            shutil.copy('occurrence.csv', self.temp)
+            occurrences = os.path.join(self.temp, 'occurrence.csv')
+        return DwCA(Table(os.path.join(self.temp, 'event.csv'), DEFAULT_PARAMS), Table(occurrences, DEFAULT_PARAMS))
+
+    def checksums(self, algorithm=SHA256):
+        return {name: digest for line, name, digest in read_checksums(os.path.join(self.output, checksum_name(algorithm)))}
+
+    def assertMatches(self, checksums, algorithm=SHA256):
+        for name, digest in checksums.items():
+            with open(os.path.join(self.output, name), 'rb') as src:
+                self.assertEqual(hashlib.new(algorithm, src.read()).hexdigest(), digest, name)
+
+    def testHashingWriter1(self):
+        dest = io.BytesIO()
+        writer = HashingWriter(dest, [SHA256, MD5])
+        writer.write(b'abc')
+        writer.write(b'def')
+        self.assertEqual(b'abcdef', dest.getvalue())
+        self.assertEqual({SHA256: sha256(b'abcdef'), MD5: hashlib.md5(b'abcdef').hexdigest()}, writer.digests())
+        writer.close()
+        self.assertTrue(dest.closed)
+
+    def testWrite1(self):
+        self.archive().write(self.output, checksums=[SHA256, MD5])
+        checksums = self.checksums()
+        self.assertEqual(['eml.xml', 'event.csv', 'meta.xml', 'occurrence.csv'], sorted(checksums.keys()))
+        self.assertMatches(checksums)
+        self.assertMatches(self.checksums(MD5), MD5)
+        self.assertTrue(verify_checksums(self.output).valid)
+
+    def testWriteCopy1(self):
+        self.archive().write(self.output)
+        # The sources are unchanged, so their hashes are known, but the copies are still hashed as they are made
+        with self.assertLogs('dwca', 'DEBUG') as logs:
+            self.archive().write(self.output, checksums=[SHA256])
+        self.assertIn('Placed event.csv at', '\n'.join(logs.output))
+        self.assertIn('using hashing copy', '\n'.join(logs.output))
+        self.assertMatches(self.checksums())
+
+    def testWrite2(self):
+        self.archive(True).write(self.output, HARDLINK, rewrite=True, sharding=Sharding(rows=2), checksums=[SHA256])
+        checksums = self.checksums()
+        self.assertIn('occurrence-00000.csv', checksums)
+        self.assertMatches(checksums)
+        with self.assertLogs('dwca', 'DEBUG') as logs:
+            self.archive(True).write(self.output, HARDLINK, rewrite=True, sharding=Sharding(rows=2), checksums=[SHA256])
+        self.assertIn('occurrence.csv is unchanged', '\n'.join(logs.output))
+        self.assertEqual(checksums.keys(), self.checksums().keys())
+        self.assertMatches(self.checksums())
+
+    def testWrite3(self):
+        self.archive().write(self.output, checksums=[SHA256, MD5])
+        self.archive().write(self.output)
+        self.assertFalse(os.path.exists(os.path.join(self.output, checksum_name(SHA256))))
+        self.assertFalse(os.path.exists(os.path.join(self.output, checksum_name(MD5))))
+
+    def testWriteZip1(self):
+        target = os.path.join(self.temp, 'test.zip')
+        self.archive(True).write_zip(target, profile=True, checksums=[SHA256])
+        with zipfile.ZipFile(target) as archive:
+            lines = archive.read(checksum_name(SHA256)).decode('utf-8').splitlines()
+            names = [line.split('  ', 1)[1] for line in lines]
+            self.assertEqual(['eml.xml', 'event.csv', 'meta.xml', 'occurrence.csv', 'stats.json'], names)
+            for line in lines:
+                digest, name = line.split('  ', 1)
+                self.assertEqual(sha256(archive.read(name)), digest, name)
+
+    def testVerify1(self):
+        self.archive().write(self.output, checksums=[SHA256, MD5])
+        with open(os.path.join(self.output, 'event.csv'), 'a') as dest:
+            dest.write('extra,row\n')
+        os.remove(os.path.join(self.output, 'eml.xml'))
+        report = verify_checksums(self.output, workers=2)
+        problems = {(problem.table, problem.problem): problem.count for problem in report.problems}
+        self.assertEqual({
+            ('checksums.sha256', 'missing files'): 1,
+            ('checksums.sha256', 'checksum mismatches'): 1,
+            ('checksums.md5', 'missing files'): 1,
+            ('checksums.md5', 'checksum mismatches'): 1
+        }, problems)
+        self.assertEqual([2], report.problems[1].lines)
+
+    def testVerify2(self):
+        with self.assertRaises(ValueError):
+            verify_checksums(self.output)
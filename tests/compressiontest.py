@@ -0,0 +1,96 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from dwca import TableParameters, Table, DwCA, HARDLINK
+from dwca.compression import GZIP, BZIP2, XZ, detect_compression, inner_filename
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+class CompressionTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        with open('occurrence.csv', 'rb') as src:
+            self.occurrences = src.read()
+        with open('event.csv', 'rb') as src:
+            self.events = src.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def compressed(self, name, module, data):
+        path = os.path.join(self.temp, name)
+        with module.open(path, 'wb') as dest:
+            dest.write(data)
+        return path
+
+    def testDetect1(self):
+        self.assertEqual(GZIP, detect_compression(self.compressed('occurrence.csv.gz', gzip, self.occurrences)))
+        self.assertEqual(BZIP2, detect_compression(self.compressed('occurrence.csv.bz2', bz2, self.occurrences)))
+        self.assertEqual(XZ, detect_compression(self.compressed('occurrence.csv.xz', lzma, self.occurrences)))
+        self.assertIsNone(detect_compression('occurrence.csv'))
+        self.assertIsNone(detect_compression(os.path.join(self.temp, 'missing.csv')))
+
+    def testDetect2(self):
+        self.assertEqual(GZIP, detect_compression(self.compressed('occurrence.dat', gzip, self.occurrences)))
+        self.assertEqual(BZIP2, detect_compression(self.compressed('occurrence.bin', bz2, self.occurrences)))
+        self.assertEqual(XZ, detect_compression(self.compressed('occurrence.raw', lzma, self.occurrences)))
+
+    def testInnerFilename1(self):
+        self.assertEqual('occurrence.csv', inner_filename('occurrence.csv.gz', GZIP))
+        self.assertEqual('occurrence.txt', inner_filename('occurrence.txt.bz2', BZIP2))
+        self.assertEqual('occurrence.dat', inner_filename('occurrence.dat', GZIP))
+        self.assertEqual('occurrence.csv', inner_filename('occurrence.csv', None))
+
+    def testTable1(self):
+        table = Table(self.compressed('occurrence.txt.xz', lzma, self.occurrences.replace(b',', b'\t')), DEFAULT_PARAMS)
+        self.assertEqual('occurrence.txt', table.filename)
+        self.assertEqual('\t', table.params.fieldsTerminatedBy)
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/Occurrence', table.params.rowType)
+        table.map_fields(False)
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/occurrenceID', table.fields[1])
+        self.assertEqual([['1', '1', 'Acacia longifolia']], [row for line, row in table.records()])
+
+    def testTable2(self):
+        table = Table(self.compressed('occurrence.gz', gzip, self.occurrences.replace(b',', b';')), DEFAULT_PARAMS, sniff=True)
+        self.assertEqual(';', table.params.fieldsTerminatedBy)
+
+    def testWrite1(self):
+        output = os.path.join(self.temp, 'output')
+        os.mkdir(output)
+        core = Table(self.compressed('event.csv.gz', gzip, self.events), DEFAULT_PARAMS)
+        ext = Table(self.compressed('occurrence.csv.bz2', bz2, self.occurrences), DEFAULT_PARAMS)
+        DwCA(core, ext).write(output, HARDLINK)
+        with open(os.path.join(output, 'event.csv'), 'rb') as events:
+            self.assertEqual(self.events, events.read())
+        with open(os.path.join(output, 'occurrence.csv'), 'rb') as occurrences:
+            self.assertEqual(self.occurrences, occurrences.read())
+        with open(os.path.join(output, 'meta.xml')) as meta:
+            self.assertIn('<location>occurrence.csv</location>', meta.read())
+
+    def testWriteZip1(self):
+        target = os.path.join(self.temp, 'test.zip')
+        core = Table(self.compressed('event.csv.gz', gzip, self.events), DEFAULT_PARAMS)
+        ext = Table(self.compressed('occurrence.csv.xz', lzma, self.occurrences), DEFAULT_PARAMS)
+        DwCA(core, ext).write_zip(target)
+        with zipfile.ZipFile(target) as archive:
+            self.assertEqual(self.events, archive.read('event.csv'))
+            self.assertEqual(self.occurrences, archive.read('occurrence.csv'))
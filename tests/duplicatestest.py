@@ -0,0 +1,69 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+from dwca import DwCA
+from dwca.duplicates import find_duplicates, row_hash
+from helpers import TableTestCase, problems
+
+EVENTS = """eventID,eventDate
+1,2021-09-11
+2,2021-09-12
+"""
+
+OCCURRENCES = """eventID,occurrenceID,scientificName
+1,1,Acacia longifolia
+1,2,Acacia dealbata
+2,1,Eucalyptus regnans
+,,
+2,3,Banksia serrata
+1, 2 ,Acacia dealbata
+2,1,Eucalyptus regnans
+"""
+
+class DuplicatesTest(TableTestCase):
+    def testRowHash1(self):
+        self.assertEqual(row_hash(['1', '2']), row_hash([' 1', '2 ']))
+        self.assertNotEqual(row_hash(['1', '2']), row_hash(['12', '']))
+
+    def testColumn1(self):
+        table = self.table('occurrence.csv', OCCURRENCES, core=False)
+        report = find_duplicates(table, 'http://rs.tdwg.org/dwc/terms/occurrenceID')
+        self.assertEqual({('occurrence.csv', 'duplicate occurrenceID values'): (3, [4, 7, 8])}, problems(report))
+
+    def testColumn2(self):
+        table = self.table('occurrence.csv', OCCURRENCES, core=False)
+        report = find_duplicates(table, 'http://rs.tdwg.org/dwc/terms/scientificName', limit=2)
+        self.assertEqual({('occurrence.csv', 'duplicate scientificName values'): (2, [7, 8])}, problems(report))
+
+    def testRows1(self):
+        table = self.table('occurrence.csv', OCCURRENCES, core=False)
+        report = find_duplicates(table)
+        self.assertEqual({('occurrence.csv', 'duplicate rows'): (2, [7, 8])}, problems(report))
+        self.assertTrue(find_duplicates(self.table('event.csv', EVENTS, core=False)).valid)
+
+    def testCheckDuplicates1(self):
+        dwca = DwCA(self.table('event.csv', EVENTS, core=False), self.table('occurrence.csv', OCCURRENCES, core=False))
+        self.assertEqual({('occurrence.csv', 'duplicate occurrenceID values'): (3, [4, 7, 8])}, problems(dwca.check_duplicates('occurrenceID')))
+        # The occurrences repeat eventID to link to the events, so only the events are checked
+        self.assertTrue(dwca.check_duplicates('eventID').valid)
+        self.assertEqual({('occurrence.csv', 'duplicate rows'): (2, [7, 8])}, problems(dwca.check_duplicates()))
+        with self.assertLogs('dwca', 'WARNING'):
+            self.assertTrue(dwca.check_duplicates('catalogNumber').valid)
+
+    def testCheckDuplicates2(self):
+        measurements = self.table('measurementorfact.csv', "occurrenceID,measurementID\n1,1\n1,2\n2,3\n", core=False)
+        dwca = DwCA(self.table('event.csv', EVENTS, core=False), self.table('occurrence.csv', OCCURRENCES, core=False), measurements)
+        self.assertEqual({('occurrence.csv', 'duplicate occurrenceID values'): (3, [4, 7, 8])}, problems(dwca.check_duplicates('occurrenceID')))
+        # Without a table of the term's row type, the core is checked
+        with self.assertLogs('dwca', 'WARNING'):
+            self.assertTrue(DwCA(self.table('event.csv', EVENTS, core=False), measurements).check_duplicates('occurrenceID').valid)
@@ -11,12 +11,14 @@
 #  implied. See the License for the specific language governing
 #  rights and limitations under the License.
 
+import io
 import shutil
 import unittest
 import tempfile
 import os
+import zipfile
 
-from dwca import TableParameters, Table, DwCA
+from dwca import TableParameters, Table, DwCA, DwCAError
 
 DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
 
@@ -75,3 +77,71 @@ class DwCATest(unittest.TestCase):
         self.assertTrue(os.path.exists(os.path.join(temp, 'meta.xml')))
         self.assertTrue(os.path.exists(os.path.join(temp, 'eml.xml')))
         shutil.rmtree(temp)
+
+    def testWriteZip1(self):
+        table1 = Table('event.csv', DEFAULT_PARAMS)
+        table2 = Table('occurrence.csv', DEFAULT_PARAMS)
+        dwca = DwCA(table1, table2)
+        temp = tempfile.mkdtemp()
+        target = os.path.join(temp, 'dwca.zip')
+        dwca.write_zip(target)
+        with zipfile.ZipFile(target) as archive:
+            self.assertEqual(['event.csv', 'occurrence.csv', 'meta.xml', 'eml.xml'], archive.namelist())
+            with open('event.csv', 'rb') as src:
+                self.assertEqual(src.read(), archive.read('event.csv'))
+            self.assertIn(b'<location>occurrence.csv</location>', archive.read('meta.xml'))
+        self.assertEqual(['dwca.zip'], os.listdir(temp))
+        shutil.rmtree(temp)
+
+    def testWriteZip2(self):
+        table1 = Table('event.csv', DEFAULT_PARAMS)
+        dwca = DwCA(table1)
+        buffer = io.BytesIO()
+        dwca.write_zip(buffer, 0)
+        with zipfile.ZipFile(buffer) as archive:
+            self.assertEqual(['event.csv', 'meta.xml', 'eml.xml'], archive.namelist())
+
+    def testWrite3(self):
+        table1 = Table('event.csv', DEFAULT_PARAMS)
+        table2 = Table('occurrence.csv', DEFAULT_PARAMS)
+        dwca = DwCA(table1, table2, workers=2)
+        temp = tempfile.mkdtemp()
+        dwca.write(temp)
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/occurrenceID', table2.fields[1])
+        with open(os.path.join(temp, 'meta.xml')) as meta:
+            contents = meta.read()
+        self.assertLess(contents.index('event.csv'), contents.index('occurrence.csv'))
+        self.assertTrue(os.path.exists(os.path.join(temp, 'occurrence.csv')))
+        shutil.rmtree(temp)
+
+    def testWriteError1(self):
+        table1 = Table('event.csv', DEFAULT_PARAMS)
+        table2 = Table('missing_occurrence.csv', DEFAULT_PARAMS)
+        for workers in (1, 2):
+            dwca = DwCA(table1, table2, workers=workers)
+            temp = tempfile.mkdtemp()
+            with self.assertRaises(DwCAError) as context:
+                dwca.write(temp)
+            self.assertEqual('missing_occurrence.csv', context.exception.table)
+            shutil.rmtree(temp)
+
+    def testFindIndexField3(self):
+        temp = tempfile.mkdtemp()
+        with open(os.path.join(temp, 'occurrence.csv'), 'w') as occurrences:
+            occurrences.write('eventID,occurrenceID,scientificName\n')
+            for i in range(20):
+                occurrences.write(f"{i // 5},{i},Acacia longifolia\n")
+        with open(os.path.join(temp, 'measurement.csv'), 'w') as measurements:
+            measurements.write('eventID,occurrenceID,measurementType,measurementValue\n')
+            for i in range(20):
+                measurements.write(f"{i // 5},{i},height,{i * 10}\n")
+        table1 = Table(os.path.join(temp, 'occurrence.csv'), DEFAULT_PARAMS)
+        table2 = Table(os.path.join(temp, 'measurement.csv'), DEFAULT_PARAMS)
+        table1.map_fields(True)
+        table2.map_fields(False)
+        dwca = DwCA(table1, table2)
+        with self.assertLogs('dwca', 'INFO') as logs:
+            index = dwca.find_index_field()
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/occurrenceID', index)
+        self.assertIn('Chose index field http://rs.tdwg.org/dwc/terms/occurrenceID', logs.output[0])
+        shutil.rmtree(temp)
@@ -0,0 +1,58 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+"""
+Helpers shared by the tests that write small tables of their own.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dwca import TableParameters, Table
+from dwca.validate import ValidationReport
+
+class TableTestCase(unittest.TestCase):
+    """
+    A test case with a temporary directory to write tables into.
+    The parameters and encoding of the tables can be changed by a subclass.
+    """
+    params = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+    encoding = 'utf-8'
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def table(self, name, contents, core=None):
+        """
+        Write a table into the temporary directory.
+
+        :param core: Map the fields of the table as the core (True) or an extension (False), or None to leave them unmapped
+        """
+        path = os.path.join(self.temp, name)
+        with open(path, 'w', encoding=self.encoding, newline='') as f:
+            f.write(contents)
+        table = Table(path, self.params)
+        if core is not None:
+            table.map_fields(core)
+        return table
+
+def problems(report: ValidationReport) -> dict:
+    """
+    The problems in a report, as the count and sorted line numbers by table and problem.
+    """
+    return {(p.table, p.problem): (p.count, sorted(p.lines)) for p in report.problems}
@@ -0,0 +1,89 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+from dwca import TableParameters, Table, DwCA
+from dwca.hierarchy import analyse_hierarchy
+from helpers import TableTestCase, problems
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+EVENTS = """eventID,parentEventID,eventDate
+1,,2021-09-11
+2,1,2021-09-11
+3,2,2021-09-12
+4,2,2021-09-12
+5,9,2021-09-13
+6,5,2021-09-13
+7,8,2021-09-14
+8,7,2021-09-14
+10,8,2021-09-14
+11,11,2021-09-15
+12,,2021-09-15
+,1,2021-09-16
+"""
+
+class HierarchyTest(TableTestCase):
+    def testHierarchy1(self):
+        hierarchy = analyse_hierarchy(self.table('event.csv', "eventID,parentEventID\n1,\n2,1\n3,2\n", core=True))
+        self.assertTrue(hierarchy.valid)
+        self.assertEqual(3, hierarchy.events)
+        self.assertEqual(1, hierarchy.roots)
+        self.assertEqual({0: 1, 1: 1, 2: 1}, hierarchy.depths)
+        self.assertEqual(2, hierarchy.max_depth)
+
+    def testHierarchy2(self):
+        hierarchy = analyse_hierarchy(self.table('event.csv', EVENTS, core=True))
+        self.assertFalse(hierarchy.valid)
+        self.assertEqual(11, hierarchy.events)
+        self.assertEqual(2, hierarchy.roots)
+        self.assertEqual({
+            ('event.csv', 'orphan parentEventIDs'): (1, [6]),
+            ('event.csv', 'events in parentEventID cycles'): (3, [8, 9, 11]),
+            ('event.csv', 'root events'): (2, [2, 12])
+        }, problems(hierarchy.report))
+        # Events in or below a cycle have no depth, an event with a missing parent is at depth 0
+        self.assertEqual({0: 3, 1: 2, 2: 2}, hierarchy.depths)
+
+    def testHierarchy4(self):
+        # Sorted runs spilled to disk give the same result
+        hierarchy = analyse_hierarchy(self.table('event.csv', EVENTS, core=True), limit=2)
+        self.assertEqual({
+            ('event.csv', 'orphan parentEventIDs'): (1, [6]),
+            ('event.csv', 'events in parentEventID cycles'): (3, [8, 9, 11]),
+            ('event.csv', 'root events'): (2, [2, 12])
+        }, problems(hierarchy.report))
+        self.assertEqual({0: 3, 1: 2, 2: 2}, hierarchy.depths)
+
+    def testHierarchy5(self):
+        # A duplicated eventID resolves to its first row
+        hierarchy = analyse_hierarchy(self.table('event.csv', "eventID,parentEventID\n1,\n2,1\n2,3\n3,2\n", core=True), limit=1)
+        self.assertEqual({0: 1, 1: 1, 2: 1, 3: 1}, hierarchy.depths)
+
+    def testHierarchy3(self):
+        lines = ["eventID,parentEventID"] + [f"{i},{i - 1 if i > 0 else ''}" for i in range(5000)]
+        hierarchy = analyse_hierarchy(self.table('event.csv', '\n'.join(lines) + '\n', core=True))
+        self.assertTrue(hierarchy.valid)
+        self.assertEqual(4999, hierarchy.max_depth)
+
+    def testValidate1(self):
+        dwca = DwCA(self.table('event.csv', EVENTS, core=True))
+        report = dwca.validate(hierarchy=True)
+        self.assertIn(('event.csv', 'events in parentEventID cycles'), problems(report))
+        self.assertNotIn(('event.csv', 'events in parentEventID cycles'), problems(dwca.validate()))
+
+    def testAnalyseHierarchy1(self):
+        dwca = DwCA(Table('event.csv', DEFAULT_PARAMS), Table('occurrence.csv', DEFAULT_PARAMS))
+        hierarchy = dwca.analyse_hierarchy()
+        self.assertTrue(hierarchy.valid)
+        self.assertEqual({0: 1, 1: 1}, hierarchy.depths)
+        self.assertIsNone(DwCA(Table('occurrence.csv', DEFAULT_PARAMS)).analyse_hierarchy())
@@ -0,0 +1,70 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dwca import TableParameters, Table, DwCA
+from dwca.instrument import Instrumentation, count
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+class InstrumentTest(unittest.TestCase):
+    def testMeasure1(self):
+        instrumentation = Instrumentation()
+        seen = []
+        instrumentation.add_hook(seen.append)
+        with instrumentation.measure('outer'):
+            with instrumentation.measure('inner', 'event.csv'):
+                count(bytes_read=10, rows=2)
+            count(bytes_written=5)
+        with instrumentation.measure('inner', 'event.csv'):
+            count(bytes_read=1, rows=1)
+        self.assertEqual(['inner', 'outer', 'inner'], [m.stage for m in seen])
+        report = instrumentation.report()
+        self.assertEqual(11, report['stages']['inner']['bytesRead'])
+        self.assertEqual(3, report['stages']['inner']['rows'])
+        self.assertEqual(5, report['stages']['outer']['bytesWritten'])
+        # The inner measurement is rolled up into the outer one
+        self.assertEqual(10, report['stages']['outer']['bytesRead'])
+        self.assertEqual(2, report['stages']['outer']['rows'])
+        self.assertEqual(3, report['tables']['event.csv']['inner']['rows'])
+        self.assertEqual(3, len(report['measurements']))
+
+    def testHook1(self):
+        instrumentation = Instrumentation()
+        def broken(measurement):
+            raise ValueError('Unavailable')
+        instrumentation.add_hook(broken)
+        with self.assertLogs('dwca', 'WARNING'):
+            with instrumentation.measure('stage'):
+                pass
+        self.assertEqual(1, len(instrumentation.measurements))
+
+    def testWrite1(self):
+        for workers in (1, 2):
+            dwca = DwCA(Table('event.csv', DEFAULT_PARAMS), Table('occurrence.csv', DEFAULT_PARAMS), workers=workers)
+            temp = tempfile.mkdtemp()
+            dwca.write(temp, profile=True)
+            report = dwca.instrumentation.report()
+            for stage in ('write', 'map_fields', 'write_table', 'write_meta', 'write_eml', 'profile'):
+                self.assertIn(stage, report['stages'])
+            self.assertEqual(os.path.getsize('event.csv'), report['tables']['event.csv']['write_table']['bytesWritten'])
+            self.assertEqual(2, report['tables']['event.csv']['profile']['rows'])
+            self.assertEqual(1, report['tables']['occurrence.csv']['profile']['rows'])
+            self.assertEqual(os.path.getsize(os.path.join(temp, 'meta.xml')), report['stages']['write_meta']['bytesWritten'])
+            self.assertLessEqual(os.path.getsize('event.csv') + os.path.getsize('occurrence.csv'), report['stages']['write']['bytesWritten'])
+            self.assertLessEqual(report['stages']['profile']['rows'], report['stages']['write']['rows'])
+            shutil.rmtree(temp)
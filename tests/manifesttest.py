@@ -0,0 +1,124 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from dwca import TableParameters, Table, DwCA
+from dwca.manifest import BuildManifest, MANIFEST_NAME
+from dwca.placement import COPY, HARDLINK
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp, 'source')
+        self.output = os.path.join(self.temp, 'output')
+        os.mkdir(self.source)
+        os.mkdir(self.output)
+        shutil.copy('event.csv', self.source)
+        shutil.copy('occurrence.csv', self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def build(self, *names, force=False, placement=COPY):
+        tables = [Table(os.path.join(self.source, name), DEFAULT_PARAMS) for name in names]
+        with self.assertLogs('dwca', 'DEBUG') as logs:
+            DwCA(*tables).write(self.output, placement, force=force)
+        return '\n'.join(logs.output)
+
+    def testBuild1(self):
+        self.build('event.csv', 'occurrence.csv')
+        manifest = BuildManifest.load(self.output)
+        self.assertEqual({'event.csv', 'occurrence.csv'}, set(manifest.tables.keys()))
+        self.assertEqual(os.path.getsize('event.csv'), manifest.tables['event.csv']['size'])
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/eventID', manifest.tables['event.csv']['fields'][0])
+        self.assertIsNotNone(manifest.meta)
+        self.assertIsNotNone(manifest.eml)
+
+    def testBuild2(self):
+        self.build('event.csv', 'occurrence.csv')
+        logs = self.build('event.csv', 'occurrence.csv')
+        self.assertIn('event.csv is unchanged', logs)
+        self.assertIn('occurrence.csv is unchanged', logs)
+        self.assertNotIn('Writing metafile', logs)
+        self.assertNotIn('Writing metadata', logs)
+
+    def testBuild3(self):
+        self.build('event.csv', 'occurrence.csv')
+        with open(os.path.join(self.source, 'occurrence.csv'), 'a') as occurrences:
+            occurrences.write('\n2,2,Acacia dealbata')
+        logs = self.build('event.csv', 'occurrence.csv')
+        self.assertIn('event.csv is unchanged', logs)
+        self.assertNotIn('occurrence.csv is unchanged', logs)
+        self.assertNotIn('Writing metafile', logs)
+        with open(os.path.join(self.output, 'occurrence.csv')) as occurrences:
+            self.assertIn('Acacia dealbata', occurrences.read())
+
+    def testBuild4(self):
+        self.build('event.csv', 'occurrence.csv')
+        logs = self.build('event.csv', 'occurrence.csv', force=True)
+        self.assertNotIn('unchanged', logs)
+        self.assertIn('Writing metafile', logs)
+
+    def testBuild5(self):
+        self.build('event.csv', 'occurrence.csv')
+        logs = self.build('event.csv')
+        self.assertIn('Writing metafile', logs)
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'occurrence.csv')))
+        self.assertTrue(os.path.exists(os.path.join(self.source, 'occurrence.csv')))
+        self.assertEqual(['event.csv'], list(BuildManifest.load(self.output).tables.keys()))
+
+    def testBuild6(self):
+        self.build('event.csv', 'occurrence.csv')
+        os.remove(os.path.join(self.output, 'eml.xml'))
+        with open(os.path.join(self.output, MANIFEST_NAME), 'w') as manifest:
+            manifest.write('Not JSON')
+        logs = self.build('event.csv', 'occurrence.csv')
+        self.assertNotIn('unchanged', logs)
+        self.assertTrue(os.path.exists(os.path.join(self.output, 'eml.xml')))
+
+    def testBuild7(self):
+        logs = self.build('event.csv', 'occurrence.csv')
+        # The sources are hashed as they are copied, rather than read beforehand
+        self.assertIn('using hashing copy', logs)
+        with open('event.csv', 'rb') as events:
+            self.assertEqual(hashlib.sha256(events.read()).hexdigest(), BuildManifest.load(self.output).tables['event.csv']['sha256'])
+        # A source that has been touched is hashed again and found to be the same
+        os.utime(os.path.join(self.source, 'event.csv'), ns=(0, 0))
+        logs = self.build('event.csv', 'occurrence.csv')
+        self.assertIn('event.csv is unchanged', logs)
+        self.assertEqual(0, BuildManifest.load(self.output).tables['event.csv']['mtime'])
+
+    def testBuild8(self):
+        self.build('event.csv', 'occurrence.csv', placement=HARDLINK)
+        # Linked sources are not read, so they are compared by size and modification time
+        self.assertNotIn('sha256', BuildManifest.load(self.output).tables['event.csv'])
+        logs = self.build('event.csv', 'occurrence.csv', placement=HARDLINK)
+        self.assertIn('event.csv is unchanged', logs)
+        with open(os.path.join(self.source, 'occurrence.csv'), 'a') as occurrences:
+            occurrences.write('\n2,2,Acacia dealbata')
+        logs = self.build('event.csv', 'occurrence.csv', placement=HARDLINK)
+        self.assertNotIn('occurrence.csv is unchanged', logs)
+
+    def testBuild9(self):
+        self.build('event.csv', 'occurrence.csv', placement=HARDLINK)
+        # A change of placement strategy rebuilds the tables, so the links are replaced by copies
+        logs = self.build('event.csv', 'occurrence.csv')
+        self.assertNotIn('event.csv is unchanged', logs)
+        self.assertFalse(os.path.samefile(os.path.join(self.source, 'event.csv'), os.path.join(self.output, 'event.csv')))
@@ -0,0 +1,92 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dwca import TableParameters, Table, DwCA
+from dwca.placement import place_file
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+class PlacementTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.src = os.path.join(self.temp, 'event.csv')
+        shutil.copy('event.csv', self.src)
+        self.dest = os.path.join(self.temp, 'out.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def assertContents(self, dest=None):
+        with open(self.src, 'rb') as s, open(dest or self.dest, 'rb') as d:
+            self.assertEqual(s.read(), d.read())
+
+    def testCopy1(self):
+        method = place_file(self.src, self.dest, 'copy')
+        self.assertIn(method, ['copy_file_range', 'sendfile', 'buffered copy'])
+        self.assertContents()
+        self.assertFalse(os.path.samefile(self.src, self.dest))
+
+    def testHardlink1(self):
+        self.assertEqual('hardlink', place_file(self.src, self.dest, 'hardlink'))
+        self.assertContents()
+        self.assertTrue(os.path.samefile(self.src, self.dest))
+
+    def testSymlink1(self):
+        self.assertEqual('symlink', place_file(self.src, self.dest, 'symlink'))
+        self.assertContents()
+        self.assertTrue(os.path.islink(self.dest))
+
+    def testAuto1(self):
+        with open(self.dest, 'w') as d:
+            d.write('Old contents')
+        self.assertEqual('hardlink', place_file(self.src, self.dest, 'auto'))
+        self.assertContents()
+
+    def testUnknown1(self):
+        with self.assertRaises(ValueError):
+            place_file(self.src, self.dest, 'teleport')
+
+    def testWrite1(self):
+        table1 = Table(self.src, DEFAULT_PARAMS)
+        dwca = DwCA(table1)
+        output = os.path.join(self.temp, 'dwca')
+        os.mkdir(output)
+        dwca.write(output, 'hardlink')
+        self.assertTrue(os.path.samefile(self.src, os.path.join(output, 'event.csv')))
+        self.assertTrue(os.path.exists(os.path.join(output, 'meta.xml')))
+
+    def testWrite2(self):
+        output = os.path.join(self.temp, 'dwca')
+        os.mkdir(output)
+        for placement in ('symlink', 'hardlink'):
+            DwCA(Table(self.src, DEFAULT_PARAMS)).write(output, placement, force=True)
+            # A link left by the last build is replaced by an independent copy
+            DwCA(Table(self.src, DEFAULT_PARAMS)).write(output, 'copy', force=True)
+            placed = os.path.join(output, 'event.csv')
+            self.assertFalse(os.path.islink(placed))
+            self.assertFalse(os.path.samefile(self.src, placed))
+
+    def testWriteTable1(self):
+        table = Table(self.src, DEFAULT_PARAMS)
+        output = os.path.join(self.temp, 'dwca')
+        os.mkdir(output)
+        # Nothing needs the digest of the source, so the copy is not made through user space to hash it
+        with self.assertLogs('dwca', 'INFO') as logs:
+            DwCA(table).write_table(table, output)
+        self.assertNotIn('hashing copy', '\n'.join(logs.output))
+        self.assertContents(os.path.join(output, 'event.csv'))
@@ -0,0 +1,93 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from dwca import TableParameters, Table, DwCA
+from dwca.profile import TableProfile, coverage
+from dwca.sketch import HyperLogLog, BloomFilter
+from dwca.sorting import key_hash
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+class ProfileTest(unittest.TestCase):
+    def testHyperLogLog1(self):
+        sketch = HyperLogLog()
+        for i in range(20000):
+            sketch.add(key_hash(str(i % 10000)))
+        self.assertAlmostEqual(10000, sketch.estimate(), delta=500)
+
+    def testHyperLogLog2(self):
+        one = HyperLogLog()
+        two = HyperLogLog()
+        for i in range(50):
+            one.add(key_hash(str(i)))
+            two.add(key_hash(str(i + 25)))
+        one.merge(two)
+        self.assertAlmostEqual(75, one.estimate(), delta=3)
+
+    def testProfile1(self):
+        table = Table('event.csv', DEFAULT_PARAMS)
+        profile = table.profile().to_dict()
+        self.assertEqual(2, profile['rows'])
+        event_id = profile['columns']['http://rs.tdwg.org/dwc/terms/eventID']
+        self.assertEqual(2, event_id['count'])
+        self.assertEqual(0, event_id['nulls'])
+        self.assertEqual(2, event_id['distinct'])
+        parent_id = profile['columns']['http://rs.tdwg.org/dwc/terms/parentEventID']
+        self.assertEqual(1, parent_id['nulls'])
+        self.assertEqual(0.5, parent_id['nullRate'])
+        self.assertEqual({'min': '2021-09-11', 'max': '2021-09-11'}, profile['eventDate'])
+        self.assertEqual({'west': 139.556, 'east': 139.5568, 'south': -35.4346, 'north': -35.434}, profile['boundingBox'])
+
+    def testDates1(self):
+        profile = TableProfile('event.csv', [])
+        for value in ['12345', '2021-09-11T10:00:00+10:00', '2020-3-5', '2020-03-10/2020-04', '2020-13-01', 'unknown']:
+            profile.add_dates(value)
+        self.assertEqual(('2020-03-05', '2021-09-11'), (profile.date_min, profile.date_max))
+
+    def testCoverage1(self):
+        extent = coverage({
+            'event.csv': {'eventDate': {'min': '2020-01-01', 'max': '2020-02-03'}, 'boundingBox': {'west': 140.0, 'east': 141.0, 'south': -30.0, 'north': -29.0}},
+            'occurrence.csv': {'boundingBox': {'west': 139.0, 'east': 140.5, 'south': -31.0, 'north': -30.0}},
+            'measurement.csv': {}
+        })
+        self.assertEqual({'min': '2020-01-01', 'max': '2020-02-03'}, extent['eventDate'])
+        self.assertEqual({'west': 139.0, 'east': 141.0, 'south': -31.0, 'north': -29.0}, extent['boundingBox'])
+
+    def testWrite1(self):
+        dwca = DwCA(Table('event.csv', DEFAULT_PARAMS), Table('occurrence.csv', DEFAULT_PARAMS))
+        temp = tempfile.mkdtemp()
+        dwca.write(temp, profile=True)
+        with open(os.path.join(temp, 'eml.xml')) as eml:
+            contents = eml.read()
+        self.assertIn('<westBoundingCoordinate>139.556</westBoundingCoordinate>', contents)
+        self.assertIn('<calendarDate>2021-09-11</calendarDate>', contents)
+        with open(os.path.join(temp, 'stats.json')) as stats:
+            profiles = json.load(stats)
+        self.assertEqual(['event.csv', 'occurrence.csv'], list(profiles.keys()))
+        self.assertEqual(1, profiles['occurrence.csv']['rows'])
+        shutil.rmtree(temp)
+
+    def testBloomFilter1(self):
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(key_hash(str(i)))
+        for i in range(1000):
+            self.assertIn(key_hash(str(i)), bloom)
+        false_positives = sum(1 for i in range(1000, 11000) if key_hash(str(i)) in bloom)
+        self.assertLess(false_positives, 300)
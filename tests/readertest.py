@@ -0,0 +1,180 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import os
+
+from dwca import TableParameters, Table, DwCA, Sharding
+from dwca.reader import parse_meta, record_offsets, is_sorted, OffsetIndex
+from helpers import TableTestCase
+
+EVENTS = """eventID,eventDate
+1,2021-09-11
+2,2021-09-12
+3,2021-09-13
+"""
+
+OCCURRENCES = """eventID,occurrenceID,scientificName,occurrenceRemarks
+3,1,Acacia longifolia,
+1,2,Acacia dealbata,"Two
+lines"
+3,3,Eucalyptus regnans,
+4,4,Banksia serrata,
+1,5,Banksia integrifolia,
+"""
+
+META = """<archive xmlns="http://rs.tdwg.org/dwc/text/" metadata="eml.xml">
+  <core rowType="http://rs.tdwg.org/dwc/terms/Event" encoding="UTF-8" fieldsTerminatedBy="\\t" linesTerminatedBy="\\n" fieldsEnclosedBy="" ignoreHeaderLines="0">
+    <files>
+      <location>events.txt</location>
+    </files>
+    <id index="0"/>
+    <field index="1" term="http://rs.tdwg.org/dwc/terms/eventDate"/>
+  </core>
+</archive>"""
+
+class ReaderTest(TableTestCase):
+    def archive(self):
+        return DwCA(self.table('event.csv', EVENTS), self.table('occurrence.csv', OCCURRENCES))
+
+    def joined(self, dwca, **kwargs):
+        return [(row[0], [ext[1] for ext in extensions['occurrence.csv']]) for row, extensions in dwca.star(**kwargs)]
+
+    def testParseMeta1(self):
+        descriptions = parse_meta(META.encode('utf-8'))
+        self.assertEqual(1, len(descriptions))
+        core = descriptions[0]
+        self.assertTrue(core.core)
+        self.assertEqual('\t', core.params['fieldsTerminatedBy'])
+        self.assertEqual('', core.params['fieldsEnclosedBy'])
+        self.assertEqual(0, core.params['ignoreHeaderLines'])
+        self.assertEqual(['events.txt'], core.locations)
+        self.assertEqual(0, core.key)
+        self.assertEqual([None, 'http://rs.tdwg.org/dwc/terms/eventDate'], core.fields)
+
+    def testRecordOffsets1(self):
+        table = self.table('occurrence.csv', OCCURRENCES)
+        with open(table.path, 'rb') as f:
+            data = f.read()
+        offsets = list(record_offsets(table))
+        self.assertEqual(5, len(offsets))
+        self.assertEqual(['1', '2', 'Acacia dealbata', 'Two\nlines'], offsets[1][1])
+        for offset, row in offsets:
+            self.assertTrue(data[offset:].startswith(row[0].encode('utf-8')))
+
+    def testRecordOffsets2(self):
+        # UTF-16 with a byte order mark and \r line endings, including one inside a quoted value
+        data = OCCURRENCES.replace('\n', '\r').encode('utf-16')
+        path = os.path.join(self.temp, 'occurrence.csv')
+        with open(path, 'wb') as f:
+            f.write(data)
+        table = Table(path, TableParameters(encoding='UTF-16', linesTerminatedBy='\r'))
+        offsets = list(record_offsets(table))
+        self.assertEqual(5, len(offsets))
+        self.assertEqual(['1', '2', 'Acacia dealbata', 'Two\rlines'], offsets[1][1])
+        for offset, row in offsets:
+            self.assertTrue(data[offset:].startswith(row[0].encode('utf-16-le')))
+        index = OffsetIndex(table, 0, limit=2)
+        try:
+            self.assertEqual([['1', '2', 'Acacia dealbata', 'Two\rlines'], ['1', '5', 'Banksia integrifolia', '']], index.rows('1'))
+        finally:
+            index.close()
+
+    def testIsSorted1(self):
+        self.assertTrue(is_sorted(self.table('event.csv', EVENTS), 0))
+        self.assertFalse(is_sorted(self.table('occurrence.csv', OCCURRENCES), 0))
+
+    def testStar1(self):
+        expected = [('1', ['2', '5']), ('2', []), ('3', ['1', '3'])]
+        self.assertEqual(expected, self.joined(self.archive()))
+        self.assertEqual(expected, self.joined(self.archive(), limit=2))
+
+    def testStar2(self):
+        sorted_occurrences = "eventID,occurrenceID\n1,2\n1,5\n3,1\n3,3\n4,4\n"
+        dwca = DwCA(self.table('event.csv', EVENTS), self.table('occurrence.csv', sorted_occurrences))
+        expected = [('1', ['2', '5']), ('2', []), ('3', ['1', '3'])]
+        self.assertEqual(expected, self.joined(dwca))
+        self.assertEqual(expected, self.joined(dwca, merge=True))
+        self.assertEqual(expected, self.joined(dwca, merge=False))
+
+    def testOpen1(self):
+        destpath = os.path.join(self.temp, 'out')
+        os.mkdir(destpath)
+        dwca = self.archive()
+        dwca.metadata['title'] = 'Test archive'
+        dwca.write(destpath)
+        opened = DwCA.open(destpath)
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/eventID', opened.index)
+        self.assertEqual('Test archive', opened.metadata['title'])
+        self.assertEqual(dwca.core.fields, opened.core.fields)
+        self.assertEqual('"', opened.core.params.fieldsEnclosedBy)
+        self.assertEqual(1, opened.core.params.ignoreHeaderLines)
+        self.assertEqual([('1', ['2', '5']), ('2', []), ('3', ['1', '3'])], self.joined(opened))
+
+    def testOpen2(self):
+        target = os.path.join(self.temp, 'test.zip')
+        self.archive().write_zip(target)
+        opened = DwCA.open(target)
+        self.assertEqual(target, opened.core.archive)
+        self.assertEqual(3, len(list(opened.core.records())))
+        self.assertEqual([('1', ['2', '5']), ('2', []), ('3', ['1', '3'])], self.joined(opened))
+
+    def testOpenSharded1(self):
+        destpath = os.path.join(self.temp, 'out')
+        os.mkdir(destpath)
+        self.archive().write(destpath, sharding=Sharding(rows=2))
+        target = os.path.join(self.temp, 'test.zip')
+        self.archive().write_zip(target, sharding=Sharding(rows=2))
+        for source in (destpath, target):
+            opened = DwCA.open(source)
+            self.assertEqual(['event.csv', 'occurrence.csv'], [table.filename for table in opened.tables])
+            self.assertEqual(3, len(opened.extensions[0].sources))
+            # Line numbers run on from one shard to the next, and the header of each shard is skipped
+            self.assertEqual([2, 4, 6, 7, 9], [line for line, row in opened.extensions[0].records()])
+            self.assertEqual([('1', ['2', '5']), ('2', []), ('3', ['1', '3'])], self.joined(opened))
+            self.assertEqual([('1', ['2', '5']), ('2', []), ('3', ['1', '3'])], self.joined(opened, merge=False))
+
+    def testWriteOpened1(self):
+        target = os.path.join(self.temp, 'test.zip')
+        self.archive().write_zip(target)
+        sharded = os.path.join(self.temp, 'sharded')
+        os.mkdir(sharded)
+        self.archive().write(sharded, sharding=Sharding(rows=2))
+        for i, source in enumerate((target, sharded)):
+            destpath = os.path.join(self.temp, f"out{i}")
+            os.mkdir(destpath)
+            DwCA.open(source).write(destpath, checksums=['sha256'])
+            rezipped = os.path.join(self.temp, f"out{i}.zip")
+            DwCA.open(source).write_zip(rezipped)
+            for written in (destpath, rezipped):
+                opened = DwCA.open(written)
+                self.assertEqual(3, len(list(opened.core.records())))
+                self.assertEqual([('1', ['2', '5']), ('2', []), ('3', ['1', '3'])], self.joined(opened))
+            # Tables in several parts are written to a file for each part
+            self.assertEqual(3 if source == sharded else 1, len(DwCA.open(destpath).extensions[0].sources))
+            if source == target:
+                with open(os.path.join(destpath, 'event.csv'), encoding='utf-8', newline='') as events:
+                    self.assertEqual(EVENTS, events.read())
+            # A second build finds the tables unchanged
+            with self.assertLogs('dwca', 'DEBUG') as logs:
+                DwCA.open(source).write(destpath, checksums=['sha256'])
+            self.assertIn('occurrence.csv is unchanged since the last build', '\n'.join(logs.output))
+
+    def testOpen3(self):
+        with open(os.path.join(self.temp, 'meta.xml'), 'w') as meta:
+            meta.write(META)
+        with open(os.path.join(self.temp, 'events.txt'), 'w') as events:
+            events.write('1\t"2021-09-11\n2\t2021-09-12\n')
+        opened = DwCA.open(self.temp)
+        self.assertEqual(dict(), opened.metadata)
+        self.assertIsNone(opened.index)
+        self.assertEqual([['1', '"2021-09-11'], ['2', '2021-09-12']], [row for row, extensions in opened.star()])
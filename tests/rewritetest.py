@@ -0,0 +1,101 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import io
+import os
+import zipfile
+
+from dwca import TableParameters, Table, DwCA
+from dwca.rewrite import short_name, empty_columns, rewrite_table
+from helpers import TableTestCase
+
+SOURCE_PARAMS = TableParameters(encoding='ISO-8859-1', fieldsTerminatedBy='\t', linesTerminatedBy='\r\n', fieldsEnclosedBy='"', ignoreHeaderLines=1)
+
+EVENTS = "eventID\teventRemarks\teventDate\r\n 1 \tCafé, \"bar\"\t\r\n2\t\t\r\n"
+
+OCCURRENCES = "eventID\toccurrenceID\tscientificName\r\n1\t1\tAcacia longifolia \r\n2\t2\t\r\n"
+
+class RewriteTest(TableTestCase):
+    params = SOURCE_PARAMS
+    encoding = 'ISO-8859-1'
+
+    def setUp(self):
+        super().setUp()
+        self.output = os.path.join(self.temp, 'output')
+        os.mkdir(self.output)
+
+    def archive(self):
+        return DwCA(self.table('event.txt', EVENTS), self.table('occurrence.txt', OCCURRENCES))
+
+    def testShortName1(self):
+        self.assertEqual('eventID', short_name('http://rs.tdwg.org/dwc/terms/eventID'))
+        self.assertEqual('type', short_name('http://purl.org/dc/terms#type'))
+        self.assertEqual('custom', short_name('custom'))
+
+    def testEmptyColumns1(self):
+        table = self.table('event.txt', EVENTS)
+        table.map_fields(True)
+        self.assertEqual({2}, empty_columns(table))
+        self.assertEqual(set(), empty_columns(table, {2}))
+
+    def testRewriteTable1(self):
+        table = self.table('event.txt', EVENTS)
+        table.map_fields(True)
+        dest = io.BytesIO()
+        columns = rewrite_table(table, dest, TableParameters(encoding='UTF-8', fieldsTerminatedBy=',', linesTerminatedBy='\n', fieldsEnclosedBy='"'))
+        self.assertEqual([0, 1], columns)
+        self.assertEqual('eventID,eventRemarks\n1,"Café, ""bar"""\n2,\n', dest.getvalue().decode('utf-8'))
+
+    def testWrite1(self):
+        dwca = self.archive()
+        dwca.write(self.output, rewrite=True)
+        with open(os.path.join(self.output, 'event.txt'), encoding='utf-8', newline='') as events:
+            self.assertEqual('eventID,eventRemarks\n1,"Café, ""bar"""\n2,\n', events.read())
+        with open(os.path.join(self.output, 'occurrence.txt'), encoding='utf-8', newline='') as occurrences:
+            self.assertEqual('eventID,occurrenceID,scientificName\n1,1,Acacia longifolia\n2,2,\n', occurrences.read())
+        opened = DwCA.open(self.output)
+        self.assertEqual('UTF-8', opened.core.params.encoding)
+        self.assertEqual(',', opened.core.params.fieldsTerminatedBy)
+        self.assertEqual('\n', opened.core.params.linesTerminatedBy)
+        self.assertEqual(['http://rs.tdwg.org/dwc/terms/eventID', 'http://rs.tdwg.org/dwc/terms/eventRemarks'], opened.core.fields)
+        self.assertEqual([['1', 'Café, "bar"'], ['2', '']], [row for line, row in opened.core.records()])
+
+    def testWrite2(self):
+        self.archive().write(self.output)
+        with self.assertLogs('dwca', 'DEBUG') as logs:
+            self.archive().write(self.output, rewrite=True)
+        self.assertNotIn('event.txt is unchanged', '\n'.join(logs.output))
+        self.assertIn('Rewrote event.txt', '\n'.join(logs.output))
+        with self.assertLogs('dwca', 'DEBUG') as logs:
+            self.archive().write(self.output, rewrite=True)
+        self.assertIn('event.txt is unchanged', '\n'.join(logs.output))
+        self.assertEqual(2, len(DwCA.open(self.output).core.fields))
+
+    def testWrite3(self):
+        path = os.path.join(self.output, 'event.txt')
+        with open(path, 'w', encoding='ISO-8859-1', newline='') as f:
+            f.write(EVENTS)
+        DwCA(Table(path, SOURCE_PARAMS)).write(self.output, rewrite=True)
+        with open(path, encoding='utf-8', newline='') as events:
+            self.assertEqual('eventID,eventRemarks\n1,"Café, ""bar"""\n2,\n', events.read())
+        self.assertFalse(os.path.exists(path + '.tmp'))
+        self.assertEqual(2, len(DwCA.open(self.output).core.fields))
+
+    def testWriteZip1(self):
+        target = os.path.join(self.temp, 'test.zip')
+        self.archive().write_zip(target, rewrite=True)
+        with zipfile.ZipFile(target) as archive:
+            self.assertEqual(b'eventID,eventRemarks\n1,"Caf\xc3\xa9, ""bar"""\n2,\n', archive.read('event.txt'))
+        opened = DwCA.open(target)
+        self.assertEqual(['http://rs.tdwg.org/dwc/terms/eventID', 'http://rs.tdwg.org/dwc/terms/eventRemarks'], opened.core.fields)
+        self.assertEqual(0, opened.core.key)
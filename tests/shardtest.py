@@ -0,0 +1,193 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import io
+import os
+import zipfile
+
+from dwca import TableParameters, Table, DwCA, Sharding
+from dwca.reader import parse_meta
+from dwca.shard import shard_name, shard_table, sharded_name
+from helpers import TableTestCase
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+EVENTS = """eventID,eventDate
+1,2021-09-11
+2,2021-09-12
+3,2021-09-13
+"""
+
+OCCURRENCES = """eventID,occurrenceID,occurrenceRemarks
+1,1,"Two
+lines"
+2,2,
+3,3,"Three
+more
+lines"
+1,4,
+2,5,
+"""
+
+class _Shard(io.BytesIO):
+    def close(self):
+        pass
+
+class ShardTest(TableTestCase):
+    def archive(self):
+        return DwCA(self.table('event.csv', EVENTS), self.table('occurrence.csv', OCCURRENCES))
+
+    def shard(self, table, sharding, key_column=None):
+        shards = dict()
+        def open_shard(name):
+            shards[name] = _Shard()
+            return shards[name]
+        names = shard_table(table, open_shard, sharding, key_column)
+        self.assertEqual(names, sorted(shards.keys()))
+        return {name: shards[name].getvalue().decode('utf-8') for name in names}
+
+    def testShardName1(self):
+        self.assertEqual('occurrence-00000.csv', shard_name('occurrence.csv', 0))
+        self.assertEqual('occurrence-00012', shard_name('occurrence', 12))
+
+    def testShardedName1(self):
+        self.assertEqual('occurrence.csv', sharded_name(['occurrence-00000.csv', 'occurrence-00001.csv']))
+        self.assertEqual('occurrence', sharded_name(['occurrence-00000', 'occurrence-00012']))
+        self.assertEqual('occurrence-1.csv', sharded_name(['occurrence-1.csv', 'occurrence-2.csv']))
+        self.assertEqual('event-00000.csv', sharded_name(['event-00000.csv', 'occurrence-00001.csv']))
+
+    def testSharding1(self):
+        with self.assertRaises(ValueError):
+            Sharding()
+        with self.assertRaises(ValueError):
+            Sharding(rows=10, keys=4)
+        with self.assertRaises(ValueError):
+            Sharding(rows=0)
+
+    def testShardRows1(self):
+        shards = self.shard(self.table('occurrence.csv', OCCURRENCES), Sharding(rows=2))
+        self.assertEqual(['occurrence-00000.csv', 'occurrence-00001.csv', 'occurrence-00002.csv'], list(shards.keys()))
+        self.assertEqual('eventID,occurrenceID,occurrenceRemarks\n1,1,"Two\nlines"\n2,2,\n', shards['occurrence-00000.csv'])
+        self.assertEqual('eventID,occurrenceID,occurrenceRemarks\n3,3,"Three\nmore\nlines"\n1,4,\n', shards['occurrence-00001.csv'])
+        self.assertEqual('eventID,occurrenceID,occurrenceRemarks\n2,5,\n', shards['occurrence-00002.csv'])
+
+    def testShardSize1(self):
+        shards = self.shard(self.table('occurrence.csv', OCCURRENCES), Sharding(size=60))
+        self.assertEqual(3, len(shards))
+        self.assertEqual('eventID,occurrenceID,occurrenceRemarks\n1,1,"Two\nlines"\n2,2,\n', shards['occurrence-00000.csv'])
+        # A record that would take a shard over the size starts a new one
+        self.assertEqual('eventID,occurrenceID,occurrenceRemarks\n3,3,"Three\nmore\nlines"\n', shards['occurrence-00001.csv'])
+        self.assertEqual('eventID,occurrenceID,occurrenceRemarks\n1,4,\n2,5,\n', shards['occurrence-00002.csv'])
+        body = ''.join(shard.split('\n', 1)[1] for shard in shards.values())
+        self.assertEqual(OCCURRENCES.split('\n', 1)[1], body)
+
+    def testShardRows2(self):
+        # UTF-16 with a byte order mark and \r line endings, including some inside quoted values
+        path = os.path.join(self.temp, 'occurrence.csv')
+        with open(path, 'wb') as f:
+            f.write(OCCURRENCES.replace('\n', '\r').encode('utf-16'))
+        table = Table(path, TableParameters(encoding='UTF-16', linesTerminatedBy='\r'))
+        shards = dict()
+        def open_shard(name):
+            shards[name] = _Shard()
+            return shards[name]
+        shard_table(table, open_shard, Sharding(rows=2))
+        self.assertEqual(3, len(shards))
+        header = 'eventID,occurrenceID,occurrenceRemarks\r'
+        self.assertEqual(header + '3,3,"Three\rmore\rlines"\r1,4,\r', shards['occurrence-00001.csv'].getvalue().decode('utf-16'))
+        self.assertEqual(header + '2,5,\r', shards['occurrence-00002.csv'].getvalue().decode('utf-16'))
+
+    def testShardSize2(self):
+        shards = self.shard(self.table('occurrence.csv', "eventID\n"), Sharding(size=10))
+        self.assertEqual({'occurrence-00000.csv': 'eventID\n'}, shards)
+
+    def testShardKeys1(self):
+        events = self.shard(self.table('event.csv', EVENTS), Sharding(keys=8), 0)
+        occurrences = self.shard(self.table('occurrence.csv', OCCURRENCES), Sharding(keys=8), 0)
+        self.assertGreater(len(events), 1)
+        for name, shard in occurrences.items():
+            # Every occurrence is in the shard with the same number as its event
+            ids = set(line.split(',')[0] for line in events[name.replace('occurrence', 'event')].split('\n')[1:] if line)
+            for line in shard.split('\n')[1:]:
+                if line[:1].isdigit():
+                    self.assertIn(line.split(',')[0], ids)
+        self.assertEqual(5, sum(len([line for line in shard.split('\n')[1:] if line[:1].isdigit()]) for shard in occurrences.values()))
+        with self.assertRaises(ValueError):
+            self.shard(self.table('event.csv', EVENTS), Sharding(keys=8))
+
+    def testWrite1(self):
+        output = os.path.join(self.temp, 'output')
+        os.mkdir(output)
+        self.archive().write(output, sharding=Sharding(rows=2))
+        self.assertTrue(os.path.exists(os.path.join(output, 'event-00001.csv')))
+        self.assertFalse(os.path.exists(os.path.join(output, 'event.csv')))
+        with open(os.path.join(output, 'meta.xml'), 'rb') as meta:
+            descriptions = parse_meta(meta.read())
+        self.assertEqual(['event-00000.csv', 'event-00001.csv'], descriptions[0].locations)
+        self.assertEqual(['occurrence-00000.csv', 'occurrence-00001.csv', 'occurrence-00002.csv'], descriptions[1].locations)
+        with self.assertLogs('dwca', 'DEBUG') as logs:
+            self.archive().write(output, sharding=Sharding(rows=2))
+        self.assertIn('event.csv is unchanged', '\n'.join(logs.output))
+        self.archive().write(output)
+        self.assertEqual(['eml.xml', 'event.csv', 'meta.xml', 'occurrence.csv'], sorted(name for name in os.listdir(output) if not name.startswith('.')))
+
+    def testWrite2(self):
+        output = os.path.join(self.temp, 'output')
+        os.mkdir(output)
+        self.archive().write(output, rewrite=True, sharding=Sharding(keys=2))
+        with open(os.path.join(output, 'meta.xml'), 'rb') as meta:
+            descriptions = parse_meta(meta.read())
+        self.assertEqual(2, len(descriptions[0].fields))
+        rows = 0
+        for location in descriptions[1].locations:
+            with open(os.path.join(output, location)) as shard:
+                lines = shard.read().split('\n')
+            self.assertEqual('eventID,occurrenceID,occurrenceRemarks', lines[0])
+            rows += len([line for line in lines[1:] if line[:1].isdigit()])
+        self.assertEqual(5, rows)
+
+    def testWrite3(self):
+        output = os.path.join(self.temp, 'output')
+        os.mkdir(output)
+        core = "eventID,occurrenceID\n1,1\n1,2\n2,3\n2,4\n"
+        self.table('occurrence.csv', core)
+        self.table('measurementorfact.csv', "eventID,occurrenceID,measurementType\n1,1,height\n2,3,height\n")
+        DwCA(self.table('occurrence.csv', core), Table(os.path.join(self.temp, 'measurementorfact.csv'), DEFAULT_PARAMS)).write(output, sharding=Sharding(keys=4))
+        self.assertEqual({'id': '1', 'coreid': '1'}, self.meta_keys(output))
+        # Without occurrenceID in the extension the index field becomes eventID, so the unchanged core is sharded again
+        self.table('measurementorfact.csv', "eventID,measurementType\n1,height\n2,height\n")
+        with self.assertLogs('dwca', 'INFO') as logs:
+            DwCA(Table(os.path.join(self.temp, 'occurrence.csv'), DEFAULT_PARAMS), Table(os.path.join(self.temp, 'measurementorfact.csv'), DEFAULT_PARAMS)).write(output, sharding=Sharding(keys=4))
+        self.assertIn('occurrence.csv is unchanged, but the index field', '\n'.join(logs.output))
+        self.assertEqual({'id': '0', 'coreid': '0'}, self.meta_keys(output))
+        with open(os.path.join(output, 'meta.xml'), 'rb') as meta:
+            descriptions = parse_meta(meta.read())
+        for location in descriptions[1].locations:
+            # Every measurement is in the occurrence shard with the same number as its event
+            with open(os.path.join(output, location)) as ext_file, open(os.path.join(output, location.replace('measurementorfact', 'occurrence'))) as core_file:
+                events = set(line.split(',')[0] for line in core_file.read().split('\n')[1:] if line)
+                self.assertTrue(set(line.split(',')[0] for line in ext_file.read().split('\n')[1:] if line) <= events)
+
+    def meta_keys(self, output):
+        with open(os.path.join(output, 'meta.xml'), 'rb') as meta:
+            descriptions = parse_meta(meta.read())
+        return {'id': str(descriptions[0].key), 'coreid': str(descriptions[1].key)}
+
+    def testWriteZip1(self):
+        target = os.path.join(self.temp, 'test.zip')
+        self.archive().write_zip(target, sharding=Sharding(rows=4))
+        with zipfile.ZipFile(target) as archive:
+            self.assertEqual({'event-00000.csv', 'occurrence-00000.csv', 'occurrence-00001.csv', 'meta.xml', 'eml.xml'}, set(archive.namelist()))
+            descriptions = parse_meta(archive.read('meta.xml'))
+            self.assertEqual(['occurrence-00000.csv', 'occurrence-00001.csv'], descriptions[1].locations)
+            self.assertEqual(b'eventID,occurrenceID,occurrenceRemarks\n2,5,\n', archive.read('occurrence-00001.csv'))
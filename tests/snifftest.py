@@ -0,0 +1,78 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import codecs
+import os
+import shutil
+import tempfile
+import unittest
+
+from dwca import TableParameters, Table
+from dwca.sniff import sniff, sniff_sample
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+class SniffTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def file(self, name, contents: bytes):
+        path = os.path.join(self.temp, name)
+        with open(path, 'wb') as f:
+            f.write(contents)
+        return path
+
+    def testSniff1(self):
+        detected = sniff('event.csv')
+        self.assertEqual('UTF-8', detected['encoding'])
+        self.assertEqual(',', detected['fieldsTerminatedBy'])
+        self.assertEqual('\n', detected['linesTerminatedBy'])
+
+    def testSniff2(self):
+        detected = sniff_sample('eventID\teventDate\r\n1\t2021-09-11\r\n2\t"2021-09-12"\r\n'.encode('utf-16'))
+        self.assertEqual('UTF-16', detected['encoding'])
+        self.assertEqual('\t', detected['fieldsTerminatedBy'])
+        self.assertEqual('\r\n', detected['linesTerminatedBy'])
+        self.assertEqual('"', detected['fieldsEnclosedBy'])
+
+    def testSniff3(self):
+        detected = sniff_sample('eventID;locality\n1;Mérimbula\n2;Bégà\n'.encode('latin-1'))
+        self.assertEqual('ISO-8859-1', detected['encoding'])
+        self.assertEqual(';', detected['fieldsTerminatedBy'])
+
+    def testSniff4(self):
+        path = self.file('big.csv', b'eventID,eventDate\n' + b'1,2021-09-11\n' * 1000 + b'\xff\xfe\xfa')
+        detected = sniff(path, 1024)
+        self.assertEqual('UTF-8', detected['encoding'])
+
+    def testTable1(self):
+        path = self.file('events.txt', codecs.BOM_UTF8 + 'eventID,eventDate,locality\n1,2021-09-11,Pétrie\n'.encode('utf-8'))
+        plain = Table(path, DEFAULT_PARAMS)
+        self.assertEqual('\t', plain.params.fieldsTerminatedBy)
+        table = Table(path, DEFAULT_PARAMS, sniff=True)
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/Event', table.params.rowType)
+        self.assertEqual(',', table.params.fieldsTerminatedBy)
+        self.assertEqual(1, table.params.ignoreHeaderLines)
+        table.map_fields(True)
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/eventID', table.fields[0])
+        self.assertEqual([(2, ['1', '2021-09-11', 'Pétrie'])], list(table.records()))
+
+    def testTable2(self):
+        path = self.file('occurrence.csv', 'occurrenceID,scientificName\r\n1,Acacia sp. Pétrie\r\n'.encode('latin-1'))
+        table = Table(path, DEFAULT_PARAMS, sniff=True)
+        self.assertEqual('ISO-8859-1', table.params.encoding)
+        self.assertEqual('\r\n', table.params.linesTerminatedBy)
+        self.assertEqual([(2, ['1', 'Acacia sp. Pétrie'])], list(table.records()))
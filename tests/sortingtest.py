@@ -0,0 +1,52 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import random
+import unittest
+
+from dwca.sorting import ExternalSorter, key_hash
+
+class SortingTest(unittest.TestCase):
+    def testKeyHash1(self):
+        self.assertEqual(key_hash('eventID'), key_hash('eventID'))
+        self.assertNotEqual(key_hash('1'), key_hash('2'))
+        self.assertLess(key_hash('occurrenceID'), 2 ** 64)
+
+    def testSort1(self):
+        values = [(random.getrandbits(64), i) for i in range(100)]
+        with ExternalSorter() as sorter:
+            for key, payload in values:
+                sorter.add(key, payload)
+            self.assertFalse(sorter.spilled)
+            self.assertEqual(sorted(values), list(sorter))
+            self.assertEqual(sorted(values), list(sorter))
+
+    def testSort2(self):
+        values = [(random.getrandbits(64), i) for i in range(1000)]
+        with ExternalSorter(limit=64) as sorter:
+            for key, payload in values:
+                sorter.add(key, payload)
+            self.assertTrue(sorter.spilled)
+            self.assertEqual(1000, len(sorter))
+            self.assertEqual(sorted(values), list(sorter))
+            self.assertEqual(sorted(values), list(sorter))
+
+    def testSortKeys1(self):
+        keys = [random.getrandbits(64) for i in range(1000)]
+        for limit in (2000, 64):
+            with ExternalSorter(limit=limit, payloads=False) as sorter:
+                for key in keys:
+                    sorter.add(key)
+                self.assertEqual(limit < 1000, sorter.spilled)
+                self.assertEqual(sorted(keys), list(sorter))
+                self.assertEqual(sorted(keys), list(sorter))
@@ -0,0 +1,106 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from dwca import TableParameters, Table
+from dwca.split import split
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+FLAT = """eventID,eventDate,decimalLatitude,decimalLongitude,basisOfRecord,occurrenceID,scientificName,measurementType,measurementValue
+1,2021-09-11,-35.1,139.5,HumanObservation,1,Acacia longifolia,height,10
+1,2021-09-11,-35.1,139.5,HumanObservation,1,Acacia longifolia,width,4
+1,2021-09-11,-35.1,139.5,HumanObservation,2,Acacia dealbata,height,12
+2,2021-09-12,-35.2,139.6,HumanObservation,3,Banksia serrata,,
+3,2021-09-13,-35.3,139.7,HumanObservation,,,,
+2,2021-09-12,-35.2,139.6,HumanObservation,4,Hakea sericea,height,3
+4,2021-09-14,-35.4,139.8,HumanObservation,5,Acacia longifolia,height,7
+"""
+
+class SplitTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.flat = os.path.join(self.temp, 'survey.csv')
+        with open(self.flat, 'w') as flat:
+            flat.write(FLAT)
+        self.output = os.path.join(self.temp, 'output')
+        os.mkdir(self.output)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def read(self, name):
+        with open(os.path.join(self.output, name), newline='') as src:
+            return list(csv.reader(src))
+
+    def check(self, dwca):
+        self.assertEqual(['event.csv', 'occurrence.csv', 'measurementorfact.csv'], [table.filename for table in dwca.tables])
+        self.assertEqual([
+            ['eventID', 'eventDate', 'decimalLatitude', 'decimalLongitude'],
+            ['1', '2021-09-11', '-35.1', '139.5'],
+            ['2', '2021-09-12', '-35.2', '139.6'],
+            ['3', '2021-09-13', '-35.3', '139.7'],
+            ['4', '2021-09-14', '-35.4', '139.8']
+        ], self.read('event.csv'))
+        self.assertEqual([
+            ['eventID', 'basisOfRecord', 'occurrenceID', 'scientificName'],
+            ['1', 'HumanObservation', '1', 'Acacia longifolia'],
+            ['1', 'HumanObservation', '2', 'Acacia dealbata'],
+            ['2', 'HumanObservation', '3', 'Banksia serrata'],
+            ['2', 'HumanObservation', '4', 'Hakea sericea'],
+            ['4', 'HumanObservation', '5', 'Acacia longifolia']
+        ], self.read('occurrence.csv'))
+        self.assertEqual([
+            ['eventID', 'occurrenceID', 'measurementType', 'measurementValue'],
+            ['1', '1', 'height', '10'],
+            ['1', '1', 'width', '4'],
+            ['1', '2', 'height', '12'],
+            ['2', '4', 'height', '3'],
+            ['4', '5', 'height', '7']
+        ], self.read('measurementorfact.csv'))
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/Event', dwca.core.params.rowType)
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/MeasurementOrFact', dwca.extensions[1].params.rowType)
+
+    def testSplit1(self):
+        dwca = split(self.flat, self.output, DEFAULT_PARAMS)
+        self.check(dwca)
+        self.assertTrue(dwca.validate().valid)
+
+    def testSplit2(self):
+        dwca = split(self.flat, self.output, DEFAULT_PARAMS, limit=1)
+        self.check(dwca)
+
+    def testSplit3(self):
+        dwca = split(self.flat, self.output, DEFAULT_PARAMS)
+        dwca.write(self.output)
+        self.assertTrue(os.path.exists(os.path.join(self.output, 'meta.xml')))
+        self.assertEqual(5, len(self.read('event.csv')))
+
+    def testSplitSniffed1(self):
+        # The sniffed comma separation is used, not the tab separation of the rule for .txt files
+        flat = os.path.join(self.temp, 'survey.txt')
+        shutil.copy(self.flat, flat)
+        table = Table(flat, DEFAULT_PARAMS, sniff=True)
+        self.assertEqual(',', table.params.fieldsTerminatedBy)
+        self.check(split(table, self.output, DEFAULT_PARAMS))
+
+    def testSplit4(self):
+        with open(self.flat, 'w') as flat:
+            flat.write('occurrenceID,scientificName\n1,Acacia longifolia\n')
+        with self.assertRaises(ValueError):
+            split(self.flat, self.output, DEFAULT_PARAMS)
@@ -0,0 +1,56 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dwca import TableParameters, Table, DwCA
+from dwca.synthetic import generate_table, generate_archive
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+class SyntheticTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def testTable1(self):
+        path = os.path.join(self.temp, 'occurrence.csv')
+        generate_table(path, 'occurrence', 100, columns=10, quoting=0.5)
+        table = Table(path, DEFAULT_PARAMS)
+        table.map_fields(False)
+        self.assertEqual(10, len(table.fields))
+        self.assertEqual('http://rs.tdwg.org/dwc/terms/occurrenceID', table.fields[1])
+        self.assertEqual('field3', table.fields[9])
+        rows = [row for line, row in table.records()]
+        self.assertEqual(100, len(rows))
+        self.assertTrue(all(len(row) == 10 for row in rows))
+        self.assertTrue(any(',' in row[6] for row in rows))
+
+    def testTable2(self):
+        path = os.path.join(self.temp, 'event.txt')
+        generate_table(path, 'event', 50, delimiter='\t', encoding='ISO-8859-1', seed=3)
+        table = Table(path, TableParameters(encoding='ISO-8859-1', linesTerminatedBy='\n'))
+        rows = [row for line, row in table.records()]
+        self.assertEqual(50, len(rows))
+        self.assertEqual('E0', rows[0][0])
+
+    def testArchive1(self):
+        paths = generate_archive(self.temp, 200, quoting=0.1)
+        self.assertEqual(['event.csv', 'occurrence.csv', 'measurementorfact.csv', 'multimedia.csv'], [os.path.basename(path) for path in paths])
+        dwca = DwCA(*[Table(path, DEFAULT_PARAMS) for path in paths])
+        self.assertTrue(dwca.validate().valid)
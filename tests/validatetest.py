@@ -0,0 +1,74 @@
+#  Copyright (c) 2022. Atlas of Living Australia.
+#  All Rights Reserved.
+#
+#  The contents of this file are subject to the Mozilla Public
+#  License Version 1.1 (the "License"); you may not use this file
+#  except in compliance with the License. You may obtain a copy of
+#  the License at http://www.mozilla.org/MPL/
+#
+#  Software distributed under the License is distributed on an "AS  IS" basis,
+#  WITHOUT WARRANTY OF ANY KIND, either express or
+#  implied. See the License for the specific language governing
+#  rights and limitations under the License.
+
+from dwca import TableParameters, Table, DwCA
+from helpers import TableTestCase, problems
+
+DEFAULT_PARAMS = TableParameters(encoding='UTF-8', linesTerminatedBy='\n')
+
+EVENTS = """eventID,eventDate
+1,2021-09-11
+2,2021-09-12
+2,2021-09-13
+,2021-09-14
+3,2021-09-15
+"""
+
+OCCURRENCES = """eventID,occurrenceID,scientificName
+1,1,Acacia longifolia
+3,2,Acacia dealbata
+4,3,Eucalyptus regnans
+,4,Banksia serrata
+5,5,Banksia integrifolia
+"""
+
+class ValidateTest(TableTestCase):
+    def testValidate1(self):
+        dwca = DwCA(Table('event.csv', DEFAULT_PARAMS), Table('occurrence.csv', DEFAULT_PARAMS))
+        report = dwca.validate()
+        self.assertTrue(report.valid)
+
+    def testValidate2(self):
+        dwca = DwCA(self.table('event.csv', EVENTS), self.table('occurrence.csv', OCCURRENCES))
+        report = dwca.validate()
+        self.assertFalse(report.valid)
+        self.assertEqual({
+            ('event.csv', 'empty ids'): (1, [5]),
+            ('event.csv', 'duplicate ids'): (1, [4]),
+            ('occurrence.csv', 'empty coreids'): (1, [5]),
+            ('occurrence.csv', 'orphan coreids'): (2, [4, 6])
+        }, problems(report))
+
+    def testValidate3(self):
+        dwca = DwCA(self.table('event.csv', EVENTS), self.table('occurrence.csv', OCCURRENCES))
+        report = dwca.validate(index_limit=2)
+        self.assertEqual({
+            ('event.csv', 'empty ids'): (1, [5]),
+            ('event.csv', 'duplicate ids'): (1, [4]),
+            ('occurrence.csv', 'empty coreids'): (1, [5]),
+            ('occurrence.csv', 'orphan coreids'): (2, [4, 6])
+        }, problems(report))
+
+    def testValidate4(self):
+        events = self.table('event.csv', EVENTS)
+        dwca = DwCA(events, self.table('occurrence.csv', OCCURRENCES), self.table('occurrence_copy.csv', OCCURRENCES), workers=2)
+        for limit in (2, 100):
+            report = dwca.validate(index_limit=limit)
+            self.assertEqual({
+                ('event.csv', 'empty ids'): (1, [5]),
+                ('event.csv', 'duplicate ids'): (1, [4]),
+                ('occurrence.csv', 'empty coreids'): (1, [5]),
+                ('occurrence.csv', 'orphan coreids'): (2, [4, 6]),
+                ('occurrence_copy.csv', 'empty coreids'): (1, [5]),
+                ('occurrence_copy.csv', 'orphan coreids'): (2, [4, 6])
+            }, problems(report))